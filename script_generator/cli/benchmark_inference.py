@@ -0,0 +1,109 @@
+import argparse
+import subprocess
+import time
+
+import numpy as np
+
+from script_generator.constants import YOLO_BATCH_SIZE, YOLO_CONF, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS
+from script_generator.debug.logger import log
+from script_generator.object_detection.data_classes.detections import Detections
+from script_generator.object_detection.util.compare import compare_records
+from script_generator.object_detection.util.data import find_model, load_yolo_model
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine
+from script_generator.state.app_state import AppState
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
+
+
+def read_frames(state, count):
+    cmd, frame_size, _, _ = get_ffmpeg_read_cmd(state, state.frame_start)
+    width, height = get_cropped_dimensions(state.video_info)
+    frames = []
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while len(frames) < count:
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            if read_into(process.stdout, frame) < frame_size:
+                break
+            frames.append(frame)
+    finally:
+        process.terminate()
+        process.wait()
+    return frames
+
+
+def benchmark(predict, frames):
+    """
+    Runs the frames in batches of YOLO_BATCH_SIZE, the first batch warms up and isn't timed.
+    :return: (Detections per frame, seconds of the timed batches, timed frames)
+    """
+    batches = [frames[i:i + YOLO_BATCH_SIZE] for i in range(0, len(frames), YOLO_BATCH_SIZE)]
+    detections = predict(batches[0])
+    start = time.perf_counter()
+    for batch in batches[1:]:
+        detections += predict(batch)
+    return detections, time.perf_counter() - start, len(frames) - len(batches[0])
+
+
+def to_records(detections):
+    # Track ids don't matter for the comparison
+    records = []
+    for frame_pos, d in enumerate(detections):
+        records += Detections(d.xywh, d.cls, d.conf, ids=np.zeros(len(d), dtype=np.int64)).to_records(frame_pos)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the onnxruntime inference engine against the ultralytics model on the frames of a video: detection speed (without tracking) and how well the boxes agree."
+    )
+    parser.add_argument("video_path", type=str, help="Video to take the frames from.")
+    parser.add_argument("--model", type=str, help="The .onnx model (default: the first .onnx model in the models directory).")
+    parser.add_argument("--frames", type=int, default=YOLO_BATCH_SIZE * 5, help=f"Frames to run (default {YOLO_BATCH_SIZE * 5}), the first batch is a warm-up.")
+    parser.add_argument("--intra-op-threads", type=int, default=ONNX_INTRA_OP_THREADS, help="onnxruntime threads within an operator (0: onnxruntime decides).")
+    parser.add_argument("--inter-op-threads", type=int, default=ONNX_INTER_OP_THREADS, help="onnxruntime threads across operators (0: sequential).")
+    parser.add_argument("--iou", type=float, default=0.5, help="Minimum IoU for two boxes of the same class to match (default 0.5).")
+    args = parser.parse_args()
+
+    try:
+        model_path = args.model or find_model(".onnx")
+        if not model_path:
+            log.error("No .onnx model found in the models directory")
+            return
+
+        state = AppState()
+        state.video_path = args.video_path
+        state.video_reader = "FFmpeg"
+        state.set_video_info()
+        frames = read_frames(state, max(args.frames, YOLO_BATCH_SIZE * 2))
+        log.info(f"Decoded {len(frames)} frames of {args.video_path}")
+
+        model = load_yolo_model(model_path)
+
+        def predict_ultralytics(batch):
+            # Fixed batch models need a full batch, inference doesn't modify the frames
+            padded = batch + [batch[-1]] * (YOLO_BATCH_SIZE - len(batch))
+            results = model.predict(padded, conf=YOLO_CONF, verbose=False)
+            return [Detections.from_yolo_result(result) for result in results[:len(batch)]]
+
+        engine = OnnxYoloEngine(model_path, args.intra_op_threads, args.inter_op_threads)
+
+        results = {}
+        for name, predict in (("ultralytics", predict_ultralytics), ("onnxruntime", engine.predict)):
+            detections, seconds, timed = benchmark(predict, frames)
+            results[name] = detections
+            log.info(f"{name:<12}: {timed} frames in {seconds:.2f} s | {timed / seconds:.1f} fps | {seconds / timed * 1000:.1f} ms per frame")
+
+        report = compare_records(to_records(results["ultralytics"]), to_records(results["onnxruntime"]), args.iou)
+        r = report["all"]
+        log.info(
+            f"Agreement with ultralytics: {report['reference_boxes']} boxes, recall {report['recall'] * 100:.1f} %, "
+            f"precision {r['precision'] * 100:.1f} %, mean IoU {r['mean_iou']:.3f}"
+        )
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+
+from script_generator.constants import YOLO_BATCH_SIZE, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, VALID_MODEL_PRECISIONS
+from script_generator.cli.benchmark_inference import read_frames, benchmark, to_records
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.compare import compare_records
+from script_generator.object_detection.util.data import find_model, get_model_variant_path
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine
+from script_generator.state.app_state import AppState
+from script_generator.utils.file import get_output_file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fp32, fp16 and int8 variants of an .onnx model (see quantize_models) with the onnxruntime engine on the frames of a reference clip: detection speed and how well the boxes of each variant agree with the fp32 model. Writes a JSON report."
+    )
+    parser.add_argument("video_path", type=str, help="Reference clip to take the frames from.")
+    parser.add_argument("--model", type=str, help="The fp32 .onnx model (default: the first .onnx model in the models directory).")
+    parser.add_argument("--frames", type=int, default=YOLO_BATCH_SIZE * 10, help=f"Frames to run (default {YOLO_BATCH_SIZE * 10}), the first batch is a warm-up.")
+    parser.add_argument("--intra-op-threads", type=int, default=ONNX_INTRA_OP_THREADS, help="onnxruntime threads within an operator (0: onnxruntime decides).")
+    parser.add_argument("--inter-op-threads", type=int, default=ONNX_INTER_OP_THREADS, help="onnxruntime threads across operators (0: sequential).")
+    parser.add_argument("--iou", type=float, default=0.5, help="Minimum IoU for two boxes of the same class to match (default 0.5).")
+    parser.add_argument("--output", type=str, help="Report path (default: model_variants.json in the output folder of the video).")
+    args = parser.parse_args()
+
+    try:
+        model_path = args.model or find_model(".onnx")
+        if not model_path:
+            log.error("No .onnx model found in the models directory")
+            return
+
+        variants = [(p, get_model_variant_path(model_path, p)) for p in VALID_MODEL_PRECISIONS]
+        variants = [(p, path) for p, path in variants if os.path.exists(path)]
+        if not variants or variants[0][0] != "fp32":
+            log.error(f"The fp32 model {get_model_variant_path(model_path, 'fp32')} is needed as the reference")
+            return
+        if len(variants) < 2:
+            log.warn(f"No fp16 or int8 variant of {model_path} found, make them with script_generator.cli.quantize_models")
+
+        state = AppState()
+        state.video_path = args.video_path
+        state.video_reader = "FFmpeg"
+        state.set_video_info()
+        frames = read_frames(state, max(args.frames, YOLO_BATCH_SIZE * 2))
+        log.info(f"Decoded {len(frames)} frames of {args.video_path}")
+
+        report = {"video": args.video_path, "frames": len(frames), "iou_threshold": args.iou, "variants": {}}
+        reference = None
+        for precision, path in variants:
+            engine = OnnxYoloEngine(path, args.intra_op_threads, args.inter_op_threads)
+            detections, seconds, timed = benchmark(engine.predict, frames)
+            records = to_records(detections)
+            # The fp32 variant comes first and is the reference of the others
+            reference = records if reference is None else reference
+
+            agreement = compare_records(reference, records, args.iou)
+            report["variants"][precision] = {
+                "model": path,
+                "size_mb": round(os.path.getsize(path) / 1024 / 1024, 1),
+                "fps": round(timed / seconds, 1),
+                "ms_per_frame": round(seconds / timed * 1000, 2),
+                "boxes": len(records),
+                "recall": round(agreement["recall"], 4),
+                "precision": round(agreement["all"]["precision"], 4),
+                "mean_iou": round(agreement["all"]["mean_iou"], 4),
+            }
+
+        fp32_fps = report["variants"]["fp32"]["fps"]
+        for precision, result in report["variants"].items():
+            result["speedup"] = round(result["fps"] / fp32_fps, 2)
+            log.info(
+                f"{precision:<5}: {result['fps']:>7.1f} fps ({result['speedup']:.2f}x) | recall {result['recall'] * 100:.1f} % | "
+                f"precision {result['precision'] * 100:.1f} % | mean IoU {result['mean_iou']:.3f} | {result['size_mb']} MB"
+            )
+
+        output_path = args.output or get_output_file_path(args.video_path, ".json", "model_variants")[0]
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        log.info(f"Saved the comparison report to {output_path}")
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
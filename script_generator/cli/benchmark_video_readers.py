@@ -0,0 +1,105 @@
+import argparse
+import random
+import subprocess
+import time
+
+import numpy as np
+
+from script_generator.debug.logger import log
+from script_generator.state.app_state import AppState
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg, VideoReaderPyAV
+from script_generator.video.util.frame_buffers import read_into
+
+
+def benchmark_pipe(state, frames, out):
+    cmd, frame_size, _, _ = get_ffmpeg_read_cmd(state, 0)
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    first = None
+    read = 0
+    try:
+        while read < frames and read_into(process.stdout, out) == frame_size:
+            if first is None:
+                first = out.copy()
+            read += 1
+    finally:
+        process.terminate()
+        process.wait()
+    return read, time.perf_counter() - start, first
+
+
+def benchmark_pyav(state, frames, out):
+    from script_generator.video.ffmpeg.pyav_reader import PyAVFrameReader
+
+    start = time.perf_counter()
+    reader = PyAVFrameReader(state.video_info, "PyAV", 0)
+    first = None
+    read = 0
+    try:
+        while read < frames and reader.read_into(out) is not None:
+            if first is None:
+                first = out.copy()
+            read += 1
+    finally:
+        reader.close()
+    return read, time.perf_counter() - start, first
+
+
+def benchmark_seeks(reader, targets):
+    """
+    :return: Seconds per seek, including reading the target frame.
+    """
+    start = time.perf_counter()
+    for target in targets:
+        reader.set_frame(target)
+        reader.read()
+    seconds = (time.perf_counter() - start) / len(targets)
+    reader.release()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the FFmpeg pipe reader against the in-process PyAV reader on the same video: sequential decode speed (same filter graph) and random seek latency."
+    )
+    parser.add_argument("video_path", type=str, help="Video to decode.")
+    parser.add_argument("--frames", type=int, default=1000, help="Frames to decode sequentially (default 1000).")
+    parser.add_argument("--seeks", type=int, default=20, help="Random seeks to time (default 20).")
+    parser.add_argument("--keep-hwaccel", action="store_true", help="Let the pipe reader use the configured hardware acceleration, PyAV always decodes in software.")
+    args = parser.parse_args()
+
+    try:
+        state = AppState()
+        state.video_path = args.video_path
+        state.video_reader = "FFmpeg"
+        if not args.keep_hwaccel:
+            state.ffmpeg_hwaccel = None
+        state.set_video_info()
+        video = state.video_info
+        width, height = get_cropped_dimensions(video)
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+        results = {}
+        for name, benchmark in (("FFmpeg pipe", benchmark_pipe), ("PyAV", benchmark_pyav)):
+            read, seconds, first = benchmark(state, args.frames, out)
+            results[name] = first
+            log.info(f"{name:<12}: {read} frames in {seconds:.2f} s | {read / seconds:.1f} fps (including startup)")
+
+        if all(frame is not None for frame in results.values()):
+            diff = np.abs(results["FFmpeg pipe"].astype(np.int16) - results["PyAV"].astype(np.int16)).mean()
+            log.info(f"Mean absolute pixel difference of the first frame: {diff:.2f}")
+
+        rng = random.Random(0)
+        targets = [rng.randrange(0, max(1, video.total_frames - 1)) for _ in range(args.seeks)]
+        pipe_seek = benchmark_seeks(VideoReaderFFmpeg(state), targets)
+        state.video_reader = "PyAV"
+        pyav_seek = benchmark_seeks(VideoReaderPyAV(state), targets)
+        log.info(f"Random seek + read: FFmpeg pipe {pipe_seek * 1000:.0f} ms | PyAV {pyav_seek * 1000:.0f} ms")
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.compare import compare_records
+from script_generator.utils.msgpack_utils import load_msgpack_json
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two raw YOLO output files (rawyolo.msgpack) of the same video, e.g. a strided detection run against a full rate run."
+    )
+    parser.add_argument(
+        "reference_path",
+        type=str,
+        help="Raw YOLO file that is considered correct."
+    )
+    parser.add_argument(
+        "candidate_path",
+        type=str,
+        help="Raw YOLO file to compare against the reference."
+    )
+    parser.add_argument(
+        "--iou",
+        type=float,
+        default=0.5,
+        help="Minimum IoU for two boxes of the same class to match (default 0.5)."
+    )
+    args = parser.parse_args()
+
+    try:
+        reference = load_msgpack_json(args.reference_path)["data"]
+        candidate = load_msgpack_json(args.candidate_path)["data"]
+        report = compare_records(reference, candidate, args.iou)
+
+        log.info(f"Reference boxes: {report['reference_boxes']}, recall: {report['recall'] * 100:.1f} %")
+        for kind in ("all", "detected", "synthetic"):
+            r = report[kind]
+            log.info(
+                f"{kind.capitalize():<10}: {r['boxes']:>8} boxes | precision {r['precision'] * 100:.1f} % | "
+                f"mean IoU {r['mean_iou']:.3f}"
+            )
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,9 @@ from script_generator.cli.shared.common_args import (
 )
 from script_generator.constants import OUTPUT_PATH
 from script_generator.debug.logger import log
+from script_generator.cli.shared.generate_funscript import generate_funscript_cli
 from script_generator.funscript.util.check_existing_funscript import check_existing_funscript
+from script_generator.scripts.analyze_videos_batched import analyze_videos_batched, has_raw_yolo_output
 from script_generator.utils.file import get_video_files
 from script_generator.utils.terminal import open_new_terminal
 
@@ -48,6 +50,12 @@ def main():
         default=2,
         help="Number of subprocesses to run in parallel. If you have beefy hardware 4 seems to be the sweet spot but technically your VRAM is the limit."
     )
+    parser.add_argument(
+        "--batch-videos",
+        type=int,
+        default=None,
+        help="Run in this process instead of a terminal per video: decode this many videos at the same time and share one model and its inference batches between them. Ignores --num-workers."
+    )
     add_shared_generate_funscript_args(parser)
 
     args = parser.parse_args()
@@ -157,6 +165,10 @@ def main():
             log.info("No files need new funscript generation.")
             return
 
+        if args.batch_videos:
+            run_batched(state, to_process, args)
+            return
+
         tasks = deque(to_process)
 
         log.info(f"Starting batch generation with up to {args.num_workers} parallel subprocesses.")
@@ -228,6 +240,28 @@ def main():
         log.error(f"An error occurred: {e}", exc_info=True)
 
 
+def run_batched(state, video_paths, args):
+    """
+    Runs the object detection of all videos in this process with a single model, then generates the funscripts one
+    by one from the raw yolo output.
+    """
+    start = time.time()
+    to_detect = [v for v in video_paths if not (args.reuse_yolo and has_raw_yolo_output(v))]
+    log.info(f"Starting batched object detection of {len(to_detect)} video(s), {args.batch_videos} at a time.")
+    detected = set(analyze_videos_batched(state, to_detect, args.batch_videos))
+
+    state.use_existing_raw_yolo = True
+    for video_path in video_paths:
+        if video_path in to_detect and video_path not in detected:
+            log.warning(f"[Failed] {video_path} (object detection failed)")
+            continue
+        state.video_path = video_path
+        generate_funscript_cli(state)
+        log.info(f"[Done] {video_path}")
+
+    log.info(f"All funscript generation tasks completed in {str(timedelta(seconds=int(time.time() - start)))}.")
+
+
 def run_task(video_path, args):
     """
     Runs the funscript generation for one video in a new terminal window.
@@ -241,7 +275,7 @@ def run_task(video_path, args):
     # Define the arguments relevant to process_file
     process_file_args = {
         "reuse_yolo", "copy_funscript", "frame_start", "frame_end",
-        "video_reader", "save_debug_file", "boost_enabled",
+        "video_reader", "pipeline_mode", "segments", "stage_replicas", "detection_stride", "frame_store", "scout", "inference_engine", "onnx_intra_op_threads", "onnx_inter_op_threads", "model_precision", "memory_budget", "save_debug_file", "boost_enabled",
         "boost_up_percent", "boost_down_percent", "threshold_enabled",
         "threshold_low", "threshold_high", "vw_simplification_enabled",
         "vw_factor", "rounding"
@@ -0,0 +1,56 @@
+import argparse
+import os
+
+from script_generator.constants import MODELS_PATH, QUANTIZE_CALIBRATION_FRAMES, VALID_MODEL_PRECISIONS
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.quantization import sample_calibration_frames, quantize_int8, convert_fp16
+from script_generator.state.app_state import AppState
+from script_generator.utils.file import get_video_files
+
+
+def find_base_onnx_models():
+    """The fp32 .onnx models in the models directory, without the variants made from them."""
+    return [
+        os.path.join(MODELS_PATH, filename) for filename in sorted(os.listdir(MODELS_PATH))
+        if filename.endswith(".onnx") and not any(filename.endswith(f".{p}.onnx") for p in VALID_MODEL_PRECISIONS)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Make int8 and fp16 variants of the .onnx models in the models directory. Select them with --model-precision, compare them first with benchmark_model_variants."
+    )
+    parser.add_argument("--models", type=str, nargs="+", help="The .onnx models to convert (default: all .onnx models in the models directory).")
+    parser.add_argument("--precisions", type=str, nargs="+", choices=["int8", "fp16"], default=["int8", "fp16"], help="Variants to make (default: int8 fp16).")
+    parser.add_argument("--calibration-videos", type=str, nargs="+", help="Videos (or folders) to sample the static int8 calibration frames from. Without them the int8 model is quantized dynamically.")
+    parser.add_argument("--calibration-frames", type=int, default=QUANTIZE_CALIBRATION_FRAMES, help=f"Calibration frames sampled across the videos (default {QUANTIZE_CALIBRATION_FRAMES}).")
+    args = parser.parse_args()
+
+    try:
+        model_paths = args.models or find_base_onnx_models()
+        if not model_paths:
+            log.error("No .onnx model found in the models directory")
+            return
+
+        frames = None
+        if "int8" in args.precisions and args.calibration_videos:
+            video_paths = []
+            for path in args.calibration_videos:
+                video_paths += get_video_files(path) if os.path.isdir(path) else [path]
+            state = AppState()
+            state.video_reader = "FFmpeg"
+            frames = sample_calibration_frames(state, video_paths, args.calibration_frames)
+
+        for model_path in model_paths:
+            if "int8" in args.precisions:
+                quantize_int8(model_path, frames)
+            if "fp16" in args.precisions:
+                convert_fp16(model_path)
+    except ImportError as e:
+        log.error(f"Missing dependency: {e} (pip install onnx onnxruntime onnxconverter-common)")
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
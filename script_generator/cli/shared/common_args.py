@@ -1,8 +1,9 @@
 import argparse
 import os
 
-from script_generator.constants import VALID_VIDEO_READERS
+from script_generator.constants import VALID_VIDEO_READERS, VALID_PIPELINE_MODES, VALID_INFERENCE_ENGINES, VALID_MODEL_PRECISIONS
 from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import select_model_variant
 from script_generator.state.app_state import AppState
 from ultralytics import settings
 
@@ -39,6 +40,64 @@ def add_shared_generate_funscript_args(parser: argparse.ArgumentParser) -> None:
         type=str,
         help=f"Video reader to use. Valid options: {', '.join(VALID_VIDEO_READERS)}."
     )
+    parser.add_argument(
+        "--pipeline-mode",
+        type=str,
+        choices=VALID_PIPELINE_MODES,
+        help="Run the object detection stages as threads (default) or each in its own process. Processes avoid GIL contention on CPU inference."
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        help="Split the video into this many frame ranges and run object detection on them in parallel. Each segment loads its own model."
+    )
+    parser.add_argument(
+        "--stage-replicas",
+        type=str,
+        help="Worker threads per pipeline stage, e.g. 'opengl=2'. Only stages that support it are replicated. Stages: decode, opengl, remap, yolo, tracking, analysis."
+    )
+    parser.add_argument(
+        "--detection-stride",
+        type=int,
+        help="Run object detection on every n-th frame only and interpolate the boxes of the frames in between (default 1). A stride of 2 or 3 on 60 fps video roughly halves the inference time."
+    )
+    parser.add_argument(
+        "--frame-store",
+        action="store_true",
+        help="Store the decoded and projected frames of the video on the first run and read them on later runs. Makes reruns with another model only cost inference."
+    )
+    parser.add_argument(
+        "--scout",
+        action="store_true",
+        help="Run object detection on the keyframes first and analyze only the time ranges around the keyframes with a penis or glans at full rate. Skips intros and scenes without action."
+    )
+    parser.add_argument(
+        "--inference-engine",
+        type=str,
+        choices=VALID_INFERENCE_ENGINES,
+        help="Run the YOLO model with ultralytics (default) or directly in onnxruntime. onnxruntime needs an .onnx model and has less overhead on CPU inference."
+    )
+    parser.add_argument(
+        "--onnx-intra-op-threads",
+        type=int,
+        help="onnxruntime engine: threads used within an operator (default 0, onnxruntime decides)."
+    )
+    parser.add_argument(
+        "--onnx-inter-op-threads",
+        type=int,
+        help="onnxruntime engine: threads that run independent operators in parallel (default 0, sequential)."
+    )
+    parser.add_argument(
+        "--model-precision",
+        type=str,
+        choices=VALID_MODEL_PRECISIONS,
+        help="Use the fp16 or int8 variant of the configured .onnx model (made with the quantize_models command). Check its agreement with benchmark_model_variants first."
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        help="RAM in MB the decoded frames in the pipeline may use (default 128). Lower it to run several jobs on one machine."
+    )
     parser.add_argument(
         "--save-debug-file",
         action="store_true",
@@ -139,6 +198,28 @@ def build_app_state_from_args(args: argparse.Namespace, provided_args: set) -> A
         state.frame_end = args.frame_end
     if "video_reader" in provided_args:
         state.video_reader = args.video_reader
+    if "pipeline_mode" in provided_args:
+        state.pipeline_mode = args.pipeline_mode
+    if "segments" in provided_args:
+        state.detection_segments = max(1, args.segments)
+    if "stage_replicas" in provided_args:
+        state.stage_replicas = parse_stage_replicas(args.stage_replicas)
+    if "detection_stride" in provided_args:
+        state.detection_stride = max(1, args.detection_stride)
+    if "frame_store" in provided_args:
+        state.use_frame_store = args.frame_store
+    if "scout" in provided_args:
+        state.scout_keyframes = args.scout
+    if "inference_engine" in provided_args:
+        state.inference_engine = args.inference_engine
+    if "onnx_intra_op_threads" in provided_args:
+        state.onnx_intra_op_threads = max(0, args.onnx_intra_op_threads)
+    if "onnx_inter_op_threads" in provided_args:
+        state.onnx_inter_op_threads = max(0, args.onnx_inter_op_threads)
+    if "model_precision" in provided_args:
+        state.yolo_model_path = select_model_variant(state.yolo_model_path, args.model_precision)
+    if "memory_budget" in provided_args:
+        state.queue_memory_budget_mb = args.memory_budget
     if "save_debug_file" in provided_args:
         state.save_debug_file = args.save_debug_file
 
@@ -169,3 +250,19 @@ def build_app_state_from_args(args: argparse.Namespace, provided_args: set) -> A
     state.set_is_cli(True)
 
     return state
+
+
+def parse_stage_replicas(value: str) -> dict[str, int]:
+    """
+    Parse 'name=count,name=count' into {name: count}.
+    """
+    replicas = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, count = part.partition("=")
+        try:
+            replicas[name.strip()] = max(1, int(count))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid stage replicas '{part}', expected name=count")
+    return replicas
@@ -15,28 +15,46 @@ CONFIG_VERSION = 1
 
 RENDER_RESOLUTION = 640
 TEXTURE_RESOLUTION = RENDER_RESOLUTION * 1.3  # Texture size that is used to texture the opengl sphere
-YOLO_BATCH_SIZE = 1 if platform.system() == "Darwin" else 30  # Mac doesn't support batching. Note TensorRT (.engine) and .onnx is compiled for a batch size of 30
-YOLO_PERSIST = True  # Big impact on performance but also improves tracking
+YOLO_BATCH_SIZE = 1 if platform.system() == "Darwin" else 30  # Mac doesn't support batching. Note TensorRT (.engine) and .onnx is compiled for a batch size of 30. Start size of the adaptive batching of dynamic batch models (.pt, dynamic .onnx with the onnxruntime engine)
+YOLO_MAX_BATCH_SIZE = 1 if platform.system() == "Darwin" else 128  # Largest batch the adaptive batching tries, it's also bound by the memory budget
+YOLO_WARM_UP = True  # Run a dummy batch after loading the model in the background, moves the slow first inference (CUDA/TensorRT initialization, predictor setup) out of the pipeline
+YOLO_MAX_BATCH_LATENCY_SECONDS = 2.0  # The adaptive batching makes batches smaller when one takes longer than this
 
 ##################################################################################################
 # ADVANCED
 ##################################################################################################
 
 YOLO_CONF = 0.3
+YOLO_IOU = 0.7  # NMS IoU threshold of the onnxruntime engine, same as the ultralytics default
+YOLO_MAX_DET = 300  # Most boxes per frame of the onnxruntime engine, same as the ultralytics default
+ONNX_INTRA_OP_THREADS = 0  # Threads of the onnxruntime engine within an operator, 0 lets onnxruntime decide (physical cores)
+ONNX_INTER_OP_THREADS = 0  # Threads of the onnxruntime engine that run independent operators in parallel, 0 runs them in sequence
+ONNX_MODEL_PRECISION = "fp32"  # Variant of the .onnx model picked for CPU inference: fp32 (the downloaded model), fp16 or int8 (made with the quantize_models command). Falls back to fp32 when the variant doesn't exist
+QUANTIZE_CALIBRATION_FRAMES = 210  # Frames sampled from the calibration videos for static int8 quantization, a multiple of the batch of 30 the .onnx models are exported with (fixed batch models drop a partial last batch)
 VR_TO_2D_PITCH = -21  # The dataset is trained on -25
+CHECKPOINT_INTERVAL_SECONDS = 60  # How often the object detection results are flushed to disk, an interrupted run resumes from the last checkpoint
+SEGMENT_OVERLAP_SECONDS = 2  # Overlap between segments when analyzing a video in parallel segments, used to stitch the track ids
+SCOUT_CLASSES = ["penis", "glans"]  # A keyframe of the scouting pass is relevant when one of these classes is detected on it
+SCOUT_MARGIN_SECONDS = 3  # Extra seconds analyzed around a relevant range of the scouting pass, also warms up the tracker
+SCOUT_MIN_GAP_SECONDS = 10  # Irrelevant gaps between relevant ranges shorter than this are analyzed anyway, restarting the pipeline costs more
+SEEK_RESTART_COST_FRAMES = 30  # Estimated cost of restarting the ffmpeg reader on a seek, in decoded frames. Seeks closer than this (after the nearest keyframe) decode forward instead
+VIDEO_INFO_COUNT_FRAMES = False  # Count the frames of videos without a frame count in their header (demuxes the whole file once, the result is cached) instead of estimating them from duration * fps
+FRAME_STORE_CRF = 0  # Quality of the frame store (--frame-store), 0 is lossless and gives the same detections as the source. Higher values (e.g. 10) make the store a lot smaller but change the frames slightly
+REMAP_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))  # Default threads of the CPU projection stage (FFmpeg + CPU remap), override with --stage-replicas remap=n
+DECODE_CHUNK_MIN_SECONDS = 2  # Minimum length of the chunks parallel decoders (--stage-replicas decode=n) work on, every chunk restarts ffmpeg at a keyframe
 UPDATE_PROGRESS_INTERVAL = 0.2  # Updates progress in the console and in gui
 STEP_SIZE = 120  # Define custom colormap based on Lucife's heatmapColors | Speed step size for color transitions
-QUEUE_MAXSIZE = 100  # Bounded queue size to avoid memory blow-up as raw frames consume a lot of memory, does not increase performance
+QUEUE_MEMORY_BUDGET_MB = 128  # Hard ceiling on the RAM used by raw frames (~1.2 MB each) in the pipeline, shared by the queues between the stages based on their speed. Lower it to run several jobs on one machine, a higher value does not increase performance
 
 ##################################################################################################
 # DEV
 ##################################################################################################
 
-# when enabled the queue will be processed one by one (use it on (QUEUE_MAXSIZE / frame rate) seconds longer videos or less)
-# raw frames take a lot of memory (RAM) so don't set the queue to high
+# when enabled the queue will be processed one by one (use it on (QUEUE_MEMORY_BUDGET_MB / 1.2 / frame rate) seconds longer videos or less)
+# raw frames take a lot of memory (RAM) so don't set the budget to high
 SEQUENTIAL_MODE = False
 if SEQUENTIAL_MODE:
-    QUEUE_MAXSIZE = 3000
+    QUEUE_MEMORY_BUDGET_MB = 3600
 
 ##################################################################################################
 # DEFAULT CONFIG
@@ -61,7 +79,11 @@ DEFAULT_CONFIG = {
 
 RUN_POSE_MODEL = False
 YOLO_POSE_MODEL = None  # YOLO("models/yolo11n-pose.mlpackage", task="pose") #TODO pose model?
-VALID_VIDEO_READERS = ["FFmpeg", "FFmpeg + OpenGL (Windows)"]
+VALID_VIDEO_READERS = ["FFmpeg", "FFmpeg + OpenGL (Windows)", "FFmpeg + CPU remap", "PyAV"]
+PROJECTION_STAGE_READERS = ["FFmpeg + OpenGL (Windows)", "FFmpeg + CPU remap"]  # FFmpeg only scales and crops VR frames, a pipeline stage projects them
+VALID_PIPELINE_MODES = ["threads", "processes"]
+VALID_INFERENCE_ENGINES = ["ultralytics", "onnxruntime"]  # onnxruntime runs .onnx models directly, without the ultralytics wrapper
+VALID_MODEL_PRECISIONS = ["fp32", "fp16", "int8"]  # fp16 and int8 are variants of the .onnx models, see get_model_variant_path
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv"}
 
 ##################################################################################################
@@ -151,6 +173,7 @@ MODEL_FILENAMES = [
 LOGO = os.path.join(PROJECT_PATH, "resources", "logo.png")
 ICON = os.path.join(PROJECT_PATH, "resources", "icon.ico")
 CONFIG_FILE_PATH = os.path.join(PROJECT_PATH, "config.json")
+CACHE_PATH = os.path.join(OUTPUT_PATH, "cache")  # Probe results shared by all videos and processes
 
 ##################################################################################################
 # DEBUG VIDEO
@@ -160,6 +183,9 @@ FUNSCRIPT_BUFFER_SIZE = 500
 
 GAUGE_WIDTH, GAUGE_HEIGHT = 12, 100
 
+DEBUG_FRAME_CACHE_MB = 512  # Decoded frames (~1.2 MB each) the debug player keeps for stepping back and forth without restarting FFmpeg
+DEBUG_FRAME_CACHE_BEHIND = 0.5  # Share of the frame cache that is kept behind the playhead, the rest is read ahead
+
 ##################################################################################################
 # KEY CODES
 ##################################################################################################
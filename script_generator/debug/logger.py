@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 import sys
 from datetime import datetime
@@ -25,12 +26,16 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 log_path = os.path.join(project_root, "logs")
 ensure_path_exists(log_path)
 
+# Pipeline stages running in child processes log to their own file instead of truncating the main log
+process_name = multiprocessing.current_process().name
+log_suffix = "" if process_name == "MainProcess" else f"_{process_name}_{os.getpid()}"
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s|%(levelname)s|%(name)s|%(message)s",
     handlers=[
         logging.FileHandler(
-            os.path.join(log_path, f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"), mode="w", encoding='utf-8'),
+            os.path.join(log_path, f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}{log_suffix}.log"), mode="w", encoding='utf-8'),
         ColorizedStreamHandler(sys.stdout)
     ]
 )
@@ -0,0 +1,177 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from functools import cache
+from time import perf_counter_ns
+
+from script_generator.debug.logger import log_od
+from script_generator.utils.file import get_output_file_path
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask, STAGE_NAMES, STAGE_COUNT
+
+HISTOGRAM_MIN_SECONDS = 1e-5  # Latencies below this end up in the first bucket
+HISTOGRAM_GROWTH = 1.1  # Bucket width ratio, percentiles are reported as the bucket upper bound (at most 10 % high)
+MAX_QUEUE_SAMPLES = 1000  # Queue samples kept, when full every other one is dropped and sampling halves its rate
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """
+        Log-scale latency histogram, constant memory no matter how many frames are recorded.
+        """
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = 0 if seconds <= HISTOGRAM_MIN_SECONDS else int(math.log(seconds / HISTOGRAM_MIN_SECONDS, HISTOGRAM_GROWTH)) + 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        :param p: Percentile between 0 and 100.
+        :return: Upper bound of the bucket the percentile falls in (in seconds), capped by the largest seen value.
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** index)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class PipelineProfiler:
+    def __init__(self):
+        """
+        Collects per stage latencies, queue occupancy over time and throughput while the pipeline runs. These are the
+        run statistics, memory use does not depend on the number of frames.
+        Frames are recorded by the last stage of the pipeline, queues are sampled by the progress logger.
+        """
+        self.start_time = time.time()
+        self.stages = {}
+        self.queue_depths = []
+        self._queue_sample_every = 1  # Keep every n-th sample, doubles whenever the samples are thinned out
+        self._queue_sample_calls = 0
+        self.throughput = Counter()  # Completed frames per second since the start
+        self.info = {}
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def record_task(self, durations, entered_ns=None):
+        """
+        Records all the stage durations of a finished frame and counts it for the throughput.
+
+        :param durations: Duration per stage id in ns (AnalyzeFrameTask.durations), 0 for stages the frame skipped.
+        :param entered_ns: perf_counter_ns timestamp the frame entered the pipeline, used for the end to end latency
+        (including the time spent waiting in queues).
+        """
+        now = time.time()
+        for stage_id, duration_ns in enumerate(durations):
+            if duration_ns:
+                self.record(STAGE_NAMES[stage_id], duration_ns / 1e9)
+
+        if entered_ns:
+            self.record("End to end", (perf_counter_ns() - entered_ns) / 1e9)
+
+        with self._lock:
+            self.frames += 1
+            self.throughput[int(now - self.start_time)] += 1
+
+    def get_stage_totals(self):
+        """
+        :return: {stage: total seconds} over all recorded frames.
+        """
+        with self._lock:
+            return {stage: histogram.total for stage, histogram in self.stages.items() if stage in STAGE_NAMES}
+
+    def sample_queues(self, depths):
+        """
+        Keeps at most MAX_QUEUE_SAMPLES evenly spaced samples over the whole run.
+
+        :param depths: {queue name: number of items}
+        """
+        with self._lock:
+            self._queue_sample_calls += 1
+            if (self._queue_sample_calls - 1) % self._queue_sample_every:
+                return
+            self.queue_depths.append({"t": round(time.time() - self.start_time, 3), **depths})
+            if len(self.queue_depths) >= MAX_QUEUE_SAMPLES:
+                self.queue_depths = self.queue_depths[::2]
+                self._queue_sample_every *= 2
+
+    def set_info(self, key, value):
+        """
+        Adds a run level value (setting, timing, ...) to the profile.
+        """
+        with self._lock:
+            self.info[key] = value
+
+    def to_dict(self):
+        with self._lock:
+            seconds = max(self.throughput) + 1 if self.throughput else 0
+            return {
+                "info": dict(self.info),
+                "stages": {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+                "throughput_fps": [self.throughput.get(second, 0) for second in range(seconds)],
+                "queue_depths": list(self.queue_depths),
+            }
+
+
+@cache
+def measure_task_overhead_ns(iterations=10000):
+    """
+    Measures the per frame cost of the task bookkeeping: creating a task and timing every stage of it. It only depends
+    on the machine, so it's measured once per process.
+    :return: Average ns per frame.
+    """
+    start = perf_counter_ns()
+    for i in range(iterations):
+        task = AnalyzeFrameTask(frame_pos=i, task_id=i)
+        for stage_id in range(STAGE_COUNT):
+            task.start(stage_id)
+            task.end(stage_id)
+    return (perf_counter_ns() - start) / iterations
+
+
+def get_profile_output_path(state):
+    """
+    Profile path next to the raw yolo output, every segment of a segmented run writes its own profile.
+    """
+    filename = "profile" if state.segment_index is None else f"profile_segment_{state.segment_index}"
+    path, _ = get_output_file_path(state.video_path, ".json", filename)
+    return path
+
+
+def save_profile(state, profiler: PipelineProfiler):
+    path = get_profile_output_path(state)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profiler.to_dict(), f, indent=2)
+    log_od.info(f"Saved pipeline profile to {path}")
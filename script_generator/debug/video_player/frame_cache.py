@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from script_generator.debug.logger import log
+
+
+class DecodedFrameCache:
+    def __init__(self, reader, max_mb, frame_shape, behind_share=0.5):
+        """
+        LRU cache of decoded frames in front of a VideoReaderFFmpeg. A background thread reads ahead of the playhead,
+        the frames behind the playhead stay cached until they are the least recently used, so stepping back and
+        forth doesn't restart FFmpeg.
+
+        :param reader: Reader the cache owns, only the cache's thread uses it.
+        :param max_mb: Memory the cached frames may use.
+        :param frame_shape: Shape of a decoded frame, e.g. (640, 640, 3).
+        :param behind_share: Share of the cache kept behind the playhead, the read ahead stops at the rest.
+        """
+        self.reader = reader
+        self.capacity = max(2, max_mb * 1024 * 1024 // int(np.prod(frame_shape)))
+        self.behind_frames = int(self.capacity * behind_share)
+        self.ahead_frames = max(1, self.capacity - self.behind_frames)
+        self.frames = OrderedDict()
+        self.playhead = 0
+        self.read_pos = None  # Next frame the reader decodes, None until the first frame is requested
+        self.end_frame = None  # Frame the stream ended at
+        self._seek_to = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._read_ahead, name="Frame cache read ahead", daemon=True)
+        self._thread.start()
+
+    def get(self, frame_id):
+        """
+        :return: The decoded frame, waits for the reader on a cache miss. None past the end of the video.
+        """
+        with self._cond:
+            self.playhead = frame_id
+            self._cond.notify_all()  # The read ahead continues from the new playhead
+
+            in_reach = (
+                self._seek_to is None and self.read_pos is not None
+                and self.read_pos <= frame_id <= self.read_pos + self.ahead_frames
+            )
+            if frame_id not in self.frames and not in_reach:
+                self._seek_to = frame_id
+
+            while not self._stopped:
+                frame = self.frames.get(frame_id)
+                if frame is not None:
+                    self.frames.move_to_end(frame_id)
+                    return frame
+                if self._seek_to is None and self.end_frame is not None and frame_id >= self.end_frame:
+                    return None
+                self._cond.wait(timeout=1)
+            return None
+
+    def _get_seek_start(self, frame_id):
+        """
+        FFmpeg decodes from the keyframe before the frame anyway, start there to fill the window behind the playhead.
+        """
+        keyframe_index = self.reader.keyframe_index
+        if keyframe_index is None:
+            return frame_id
+        return max(keyframe_index.keyframe_before(frame_id), frame_id - self.behind_frames, 0)
+
+    def _read_ahead(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._stopped and self._seek_to is None and (
+                        self.read_pos is None or self.end_frame is not None
+                        or self.read_pos - self.playhead >= self.ahead_frames
+                    ):
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+
+                    seek_start = None
+                    if self._seek_to is not None:
+                        seek_start = self._get_seek_start(self._seek_to)
+                        self._seek_to = None
+                        self.read_pos = seek_start
+                        self.end_frame = None
+                    frame_id = self.read_pos
+
+                # Decode without holding the lock, cached frames are served in the meantime
+                if seek_start is not None:
+                    self.reader.set_frame(seek_start)
+                ret, frame = self.reader.read()
+
+                with self._cond:
+                    if ret:
+                        if frame_id not in self.frames:
+                            self.frames[frame_id] = frame
+                            while len(self.frames) > self.capacity:
+                                self.frames.popitem(last=False)
+                        self.read_pos = frame_id + 1
+                    else:
+                        self.end_frame = frame_id
+                    self._cond.notify_all()
+        except Exception as e:
+            log.error(f"Frame cache read ahead stopped: {e}")
+            with self._cond:
+                self._stopped = True
+                self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
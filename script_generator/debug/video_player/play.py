@@ -161,8 +161,8 @@ def play_debug_video(state, start_frame=0, end_frame=None, rolling_window_size=1
             if remaining > 0:
                 time.sleep(remaining)
 
+    video_player.release()
     if save_video_mode:
-        video_player.release()
         return temp_video_path
     else:
         cv2.destroyAllWindows()
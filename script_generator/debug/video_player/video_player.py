@@ -1,10 +1,11 @@
 import cv2
 import numpy as np
 
-from script_generator.constants import FUNSCRIPT_BUFFER_SIZE, GAUGE_WIDTH, GAUGE_HEIGHT
+from script_generator.constants import FUNSCRIPT_BUFFER_SIZE, GAUGE_WIDTH, GAUGE_HEIGHT, DEBUG_FRAME_CACHE_MB, DEBUG_FRAME_CACHE_BEHIND
+from script_generator.debug.video_player.frame_cache import DecodedFrameCache
 from script_generator.state.app_state import AppState
 from script_generator.video.data_classes.video_info import get_cropped_dimensions
-from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
+from script_generator.video.ffmpeg.video_reader import create_video_reader
 
 
 class VideoPlayer:
@@ -26,15 +27,21 @@ class VideoPlayer:
         # a buffer to show outliers longer then 1 frame and slowly fade them out
         self.outlier_buffer = []
 
-        self.reader = VideoReaderFFmpeg(state, start_frame)
+        self.reader = create_video_reader(state, start_frame, use_keyframe_index=True)
+        self.frame_cache = DecodedFrameCache(self.reader, DEBUG_FRAME_CACHE_MB, (height, width, 3), DEBUG_FRAME_CACHE_BEHIND)
         self.paused = False
 
         if start_frame != 0:
             self.set_frame(start_frame)
 
     def release(self):
+        # Stop the read ahead before the reader it uses
+        if self.frame_cache:
+            self.frame_cache.stop()
+            self.frame_cache = None
         if self.reader:
             self.reader.release()
+            self.reader = None
 
     def set_frame(self, frame_id):
         if frame_id < 0:
@@ -43,10 +50,10 @@ class VideoPlayer:
             frame_id = self.total_frames - 1
 
         self.current_frame = frame_id
-        self.reader.set_frame(self.current_frame)
 
     def read_frame(self):
-        ret, frame = self.reader.read()
+        frame = self.frame_cache.get(self.current_frame)
+        ret = frame is not None
         if ret and not self.paused:
             self.current_frame += 1
         return ret, frame
\ No newline at end of file
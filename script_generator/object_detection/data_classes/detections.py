@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class Detections:
+    """
+    Compact detection result of a single frame. Only holds numpy arrays so it is cheap to pickle
+    between processes and does not keep a reference to the (large) source frame like YOLO results do.
+    """
+    xywh: np.ndarray  # (n, 4) center x, center y, width, height
+    cls: np.ndarray  # (n,) class ids
+    conf: np.ndarray  # (n,) confidence scores
+    ids: Optional[np.ndarray] = None  # (n,) track ids, None when the tracker did not assign any
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __getitem__(self, index):
+        # Used by the ultralytics trackers to select detections, like indexing ultralytics Boxes
+        return Detections(
+            xywh=self.xywh[index],
+            cls=self.cls[index],
+            conf=self.conf[index],
+            ids=self.ids[index] if self.ids is not None else None
+        )
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(xywh=np.empty((0, 4), dtype=np.float32), cls=np.empty(0, dtype=np.int32), conf=np.empty(0, dtype=np.float32))
+
+    @property
+    def xyxy(self):
+        x, y, w, h = self.xywh.T
+        return np.stack([x - w / 2, y - h / 2, x + w / 2, y + h / 2], axis=1)
+
+    @classmethod
+    def from_yolo_result(cls, result) -> "Detections":
+        boxes = result.boxes
+        return cls(
+            xywh=boxes.xywh.cpu().numpy(),
+            cls=boxes.cls.cpu().numpy().astype(np.int32),
+            conf=boxes.conf.cpu().numpy(),
+            ids=boxes.id.cpu().numpy().astype(np.int64) if boxes.id is not None else None
+        )
+
+    def to_records(self, frame_pos):
+        """
+        Convert the tracked detections into raw yolo records.
+        :param frame_pos: The frame the detections belong to.
+        :return: List of [frame_pos, cls, conf, x1, y1, x2, y2, track_id] records.
+        """
+        if self.ids is None:
+            return []
+
+        records = []
+        for track_id, cls, conf, (x, y, w, h) in zip(self.ids.tolist(), self.cls.tolist(), self.conf.tolist(), self.xywh.astype(np.int32).tolist()):
+            records.append([frame_pos, int(cls), round(conf, 1), x - w // 2, y - h // 2, x + w // 2, y + h // 2, int(track_id)])
+        return records
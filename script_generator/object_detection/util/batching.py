@@ -0,0 +1,94 @@
+from collections import Counter
+
+from script_generator.constants import YOLO_BATCH_SIZE, YOLO_MAX_BATCH_SIZE, YOLO_MAX_BATCH_LATENCY_SECONDS
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine
+
+BATCH_SIZES = [1, 2, 4, 8, 12, 16, 24, 32, 48, 64, 96, 128]
+SAMPLES_PER_SIZE = 4  # Full batches measured before the sizer compares a size with its neighbours
+MIN_GAIN = 1.05  # A neighbouring size must be this much faster to switch to it
+EMA_WEIGHT = 0.3
+
+
+def get_fixed_batch_size(model, model_path):
+    """
+    :return: The batch size the model was compiled for or None when it takes any number of frames.
+    """
+    if isinstance(model, OnnxYoloEngine):
+        return model.batch_size
+    # ultralytics: TensorRT, onnx and CoreML models are exported with a fixed batch, PyTorch models take any
+    return None if model_path.endswith(".pt") else YOLO_BATCH_SIZE
+
+
+class AdaptiveBatchSizer:
+    def __init__(self, fixed_size=None, max_size=YOLO_MAX_BATCH_SIZE, max_latency=YOLO_MAX_BATCH_LATENCY_SECONDS):
+        """
+        Picks the inference batch size. Engines compiled for a fixed batch always get that size (smaller batches are
+        padded and cost the same). For dynamic engines it climbs the sizes in BATCH_SIZES from YOLO_BATCH_SIZE while
+        the measured frames per second improve, only tries a bigger size when enough frames are queued to fill it and
+        backs off when a batch takes longer than max_latency.
+
+        :param max_size: Largest batch, bound it by the frames the pipeline may hold.
+        """
+        self.fixed_size = fixed_size
+        self.sizes = [s for s in BATCH_SIZES if s <= max_size] or [1]
+        self.max_latency = max_latency
+        self.fps = {}  # Frames per second per batch size (moving average)
+        self.batches = Counter()  # Batches run per size, partial batches included
+        self.too_slow = set()  # Sizes that took longer than max_latency
+        self.frames = 0
+        self.seconds = 0.0
+        self._index = min(range(len(self.sizes)), key=lambda i: abs(self.sizes[i] - YOLO_BATCH_SIZE))
+        self._samples = 0
+
+    @property
+    def size(self):
+        return self.fixed_size or self.sizes[self._index]
+
+    @property
+    def is_fixed(self):
+        return self.fixed_size is not None
+
+    def record(self, frames, seconds, queued):
+        """
+        Records a finished batch and adjusts the size.
+
+        :param frames: Real frames in the batch, without padding.
+        :param queued: Frames waiting in the input queue after the batch.
+        """
+        self.batches[frames] += 1
+        self.frames += frames
+        self.seconds += seconds
+        size = self.size
+        if self.is_fixed or frames < size or seconds <= 0:
+            return  # Partial batches say nothing about the throughput of the size
+
+        fps = frames / seconds
+        self.fps[size] = fps if size not in self.fps else EMA_WEIGHT * fps + (1 - EMA_WEIGHT) * self.fps[size]
+        self._samples += 1
+
+        if seconds > self.max_latency and self._index > 0:
+            self.too_slow.add(size)
+            self._move(-1)
+            return
+        if self._samples < SAMPLES_PER_SIZE:
+            return
+
+        up = self.sizes[self._index + 1] if self._index + 1 < len(self.sizes) else None
+        down = self.sizes[self._index - 1] if self._index > 0 else None
+        if down is not None and self.fps.get(down, 0) > self.fps[size] * MIN_GAIN:
+            self._move(-1)
+        elif up is not None and up not in self.too_slow and queued >= up and (up not in self.fps or self.fps[up] > self.fps[size] * MIN_GAIN):
+            self._move(1)
+
+    def _move(self, step):
+        self._index += step
+        self._samples = 0
+
+    def to_dict(self):
+        return {
+            "final_size": self.size,
+            "fps": round(self.frames / self.seconds, 1) if self.seconds else 0,
+            "fixed": self.is_fixed,
+            "batches_per_size": {str(size): count for size, count in sorted(self.batches.items())},
+            "fps_per_size": {str(size): round(fps, 1) for size, fps in sorted(self.fps.items())},
+        }
@@ -0,0 +1,288 @@
+import numpy as np
+
+from script_generator.object_detection.data_classes.detections import Detections
+
+# Same defaults as ultralytics' bytetrack.yaml
+TRACK_HIGH_THRESH = 0.25  # Detections above this are associated first and can start tracks
+TRACK_LOW_THRESH = 0.1  # Detections between the thresholds can only continue tracks
+NEW_TRACK_THRESH = 0.25
+TRACK_BUFFER = 30  # Frames (at 30 fps) a lost track can be found again
+MATCH_THRESH = 0.8  # Highest association cost (1 - IoU * score) of the first association
+DUPLICATE_THRESH = 0.15  # Tracked and lost tracks closer than this (1 - IoU) are duplicates
+
+TRACKED, LOST, REMOVED = 1, 2, 3
+
+
+def box_iou_matrix(a, b):
+    """
+    :param a: (n, 4) xyxy boxes.
+    :param b: (m, 4) xyxy boxes.
+    :return: (n, m) IoU of every pair.
+    """
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-7)
+
+
+def assign(cost, threshold):
+    """
+    Greedy lowest cost first matching, with a handful of objects per frame it matches like a linear assignment.
+
+    :return: (list of (row, col) matches, unmatched rows, unmatched cols)
+    """
+    rows, cols = cost.shape
+    matches, used_rows, used_cols = [], set(), set()
+    if cost.size:
+        candidates = np.argwhere(cost <= threshold)
+        for row, col in candidates[np.argsort(cost[candidates[:, 0], candidates[:, 1]], kind="stable")].tolist():
+            if row not in used_rows and col not in used_cols:
+                matches.append((row, col))
+                used_rows.add(row)
+                used_cols.add(col)
+    return matches, [r for r in range(rows) if r not in used_rows], [c for c in range(cols) if c not in used_cols]
+
+
+class KalmanFilterXYAH:
+    """
+    Constant velocity Kalman filter of a box as center x, center y, aspect ratio and height (as in ByteTrack).
+    """
+    std_weight_position = 1 / 20
+    std_weight_velocity = 1 / 160
+
+    def __init__(self):
+        self.motion_mat = np.eye(8)
+        self.motion_mat[:4, 4:] = np.eye(4)
+        self.update_mat = np.eye(4, 8)
+
+    def initiate(self, measurement):
+        h = measurement[3]
+        std = [
+            2 * self.std_weight_position * h, 2 * self.std_weight_position * h, 1e-2, 2 * self.std_weight_position * h,
+            10 * self.std_weight_velocity * h, 10 * self.std_weight_velocity * h, 1e-5, 10 * self.std_weight_velocity * h
+        ]
+        return np.r_[measurement, np.zeros(4)], np.diag(np.square(std))
+
+    def multi_predict(self, mean, covariance):
+        """
+        :param mean: (n, 8) states.
+        :param covariance: (n, 8, 8) covariances.
+        """
+        h = mean[:, 3]
+        std = np.stack([
+            self.std_weight_position * h, self.std_weight_position * h, np.full_like(h, 1e-2), self.std_weight_position * h,
+            self.std_weight_velocity * h, self.std_weight_velocity * h, np.full_like(h, 1e-5), self.std_weight_velocity * h
+        ], axis=1)
+        motion_cov = np.zeros_like(covariance)
+        diagonal = np.arange(8)
+        motion_cov[:, diagonal, diagonal] = np.square(std)
+
+        mean = mean @ self.motion_mat.T
+        covariance = self.motion_mat @ covariance @ self.motion_mat.T + motion_cov
+        return mean, covariance
+
+    def update(self, mean, covariance, measurement):
+        h = mean[3]
+        std = [self.std_weight_position * h, self.std_weight_position * h, 1e-1, self.std_weight_position * h]
+        projected_mean = self.update_mat @ mean
+        projected_cov = self.update_mat @ covariance @ self.update_mat.T + np.diag(np.square(std))
+
+        kalman_gain = np.linalg.solve(projected_cov, (covariance @ self.update_mat.T).T).T
+        mean = mean + (measurement - projected_mean) @ kalman_gain.T
+        covariance = covariance - kalman_gain @ projected_cov @ kalman_gain.T
+        return mean, covariance
+
+
+def xyxy_to_xyah(xyxy):
+    w, h = xyxy[2] - xyxy[0], xyxy[3] - xyxy[1]
+    return np.array([xyxy[0] + w / 2, xyxy[1] + h / 2, w / max(h, 1e-7), h])
+
+
+class Track:
+    __slots__ = ("detection_xyxy", "score", "cls", "mean", "covariance", "state", "is_activated", "track_id", "frame_id", "start_frame")
+
+    def __init__(self, xyxy, score, cls):
+        self.detection_xyxy = xyxy
+        self.score = score
+        self.cls = cls
+        self.mean = None
+        self.covariance = None
+        self.state = None
+        self.is_activated = False
+        self.track_id = 0
+        self.frame_id = 0
+        self.start_frame = 0
+
+    @property
+    def xyxy(self):
+        if self.mean is None:
+            return self.detection_xyxy
+        x, y, a, h = self.mean[:4]
+        w = a * h
+        return np.array([x - w / 2, y - h / 2, x + w / 2, y + h / 2])
+
+    def activate(self, kalman_filter, frame_id, track_id):
+        self.mean, self.covariance = kalman_filter.initiate(xyxy_to_xyah(self.detection_xyxy))
+        self.track_id = track_id
+        self.state = TRACKED
+        # Tracks are confirmed by a second detection, except on the first frame
+        self.is_activated = frame_id == 1
+        self.frame_id = self.start_frame = frame_id
+
+    def update(self, kalman_filter, detection, frame_id):
+        self.mean, self.covariance = kalman_filter.update(self.mean, self.covariance, xyxy_to_xyah(detection.detection_xyxy))
+        self.score = detection.score
+        self.cls = detection.cls
+        self.state = TRACKED
+        self.is_activated = True
+        self.frame_id = frame_id
+
+
+def _boxes(tracks):
+    return np.array([t.xyxy for t in tracks]).reshape(-1, 4)
+
+
+def _iou_distance(tracks, detections, fuse_score=False):
+    if not tracks or not detections:
+        return np.empty((len(tracks), len(detections)))
+    similarity = box_iou_matrix(_boxes(tracks), _boxes(detections))
+    if fuse_score:
+        similarity *= np.array([d.score for d in detections])[None, :]
+    return 1 - similarity
+
+
+def _join(a, b):
+    ids = {t.track_id for t in a}
+    return a + [t for t in b if t.track_id not in ids]
+
+
+def _subtract(a, b):
+    ids = {t.track_id for t in b}
+    return [t for t in a if t.track_id not in ids]
+
+
+class ByteTracker:
+    def __init__(self, frame_rate=30):
+        """
+        ByteTrack multi-object tracker in numpy, follows ultralytics' BYTETracker with its default settings. High
+        confidence detections are associated with the predicted tracks first, the remaining tracks get a second chance
+        with the low confidence detections. Use one tracker per video and pass the frames in order.
+
+        :param frame_rate: Rate of the frames passed to the tracker, i.e. the fps divided by the detection stride.
+        """
+        self.max_time_lost = int(frame_rate / 30 * TRACK_BUFFER)
+        self.kalman_filter = KalmanFilterXYAH()
+        self.reset()
+
+    def reset(self):
+        self.frame_id = 0
+        self.tracked = []
+        self.lost = []
+        self._last_id = 0
+
+    def _next_id(self):
+        self._last_id += 1
+        return self._last_id
+
+    def _predict(self, tracks):
+        if not tracks:
+            return
+        mean = np.array([t.mean for t in tracks])
+        covariance = np.array([t.covariance for t in tracks])
+        # Lost tracks don't keep growing
+        mean[[t.state != TRACKED for t in tracks], 7] = 0
+        mean, covariance = self.kalman_filter.multi_predict(mean, covariance)
+        for track, m, c in zip(tracks, mean, covariance):
+            track.mean, track.covariance = m, c
+
+    def _continue(self, track, detection, activated, refound):
+        was_tracked = track.state == TRACKED
+        track.update(self.kalman_filter, detection, self.frame_id)
+        (activated if was_tracked else refound).append(track)
+
+    def update(self, detections: Detections) -> Detections:
+        """
+        :param detections: Untracked detections of the next frame.
+        :return: The detections of the confirmed tracks with their ids, the boxes are the filtered track boxes.
+        """
+        self.frame_id += 1
+        activated, refound, lost, removed = [], [], [], []
+
+        xyxy, scores, classes = detections.xyxy, detections.conf, detections.cls
+        high = scores >= TRACK_HIGH_THRESH
+        low = (scores > TRACK_LOW_THRESH) & ~high
+        high_dets = [Track(xyxy[i], scores[i], classes[i]) for i in np.flatnonzero(high)]
+        low_dets = [Track(xyxy[i], scores[i], classes[i]) for i in np.flatnonzero(low)]
+
+        unconfirmed = [t for t in self.tracked if not t.is_activated]
+        pool = _join([t for t in self.tracked if t.is_activated], self.lost)
+        self._predict(pool)
+
+        # First association with the high confidence detections
+        matches, unmatched_tracks, unmatched_dets = assign(_iou_distance(pool, high_dets, fuse_score=True), MATCH_THRESH)
+        for track_index, det_index in matches:
+            self._continue(pool[track_index], high_dets[det_index], activated, refound)
+
+        # Second association of the remaining tracks with the low confidence detections
+        remaining = [pool[i] for i in unmatched_tracks if pool[i].state == TRACKED]
+        matches, unmatched_remaining, _ = assign(_iou_distance(remaining, low_dets), 0.5)
+        for track_index, det_index in matches:
+            self._continue(remaining[track_index], low_dets[det_index], activated, refound)
+        for i in unmatched_remaining:
+            track = remaining[i]
+            if track.state != LOST:
+                track.state = LOST
+                lost.append(track)
+
+        # Tracks that were started on the previous frame are confirmed or dropped
+        high_dets = [high_dets[i] for i in unmatched_dets]
+        matches, unmatched_unconfirmed, unmatched_dets = assign(_iou_distance(unconfirmed, high_dets, fuse_score=True), 0.7)
+        for track_index, det_index in matches:
+            self._continue(unconfirmed[track_index], high_dets[det_index], activated, refound)
+        for i in unmatched_unconfirmed:
+            unconfirmed[i].state = REMOVED
+            removed.append(unconfirmed[i])
+
+        for i in unmatched_dets:
+            track = high_dets[i]
+            if track.score >= NEW_TRACK_THRESH:
+                track.activate(self.kalman_filter, self.frame_id, self._next_id())
+                activated.append(track)
+
+        for track in self.lost:
+            if self.frame_id - track.frame_id > self.max_time_lost:
+                track.state = REMOVED
+                removed.append(track)
+
+        self.tracked = _join(_join([t for t in self.tracked if t.state == TRACKED], activated), refound)
+        self.lost = _subtract(_subtract(self.lost, self.tracked) + lost, removed)
+        self._remove_duplicates()
+
+        output = [t for t in self.tracked if t.is_activated]
+        if not output:
+            return Detections(xywh=np.empty((0, 4), dtype=np.float32), cls=np.empty(0, dtype=np.int32), conf=np.empty(0, dtype=np.float32), ids=np.empty(0, dtype=np.int64))
+
+        boxes = _boxes(output)
+        return Detections(
+            xywh=np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2, boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1).astype(np.float32),
+            cls=np.array([t.cls for t in output], dtype=np.int32),
+            conf=np.array([t.score for t in output], dtype=np.float32),
+            ids=np.array([t.track_id for t in output], dtype=np.int64)
+        )
+
+    def _remove_duplicates(self):
+        """
+        A lost track that was found again as a new track, keep the older one.
+        """
+        distance = _iou_distance(self.tracked, self.lost)
+        duplicate_tracked, duplicate_lost = set(), set()
+        for i, j in np.argwhere(distance < DUPLICATE_THRESH).tolist():
+            tracked, lost = self.tracked[i], self.lost[j]
+            if tracked.frame_id - tracked.start_frame > lost.frame_id - lost.start_frame:
+                duplicate_lost.add(j)
+            else:
+                duplicate_tracked.add(i)
+        self.tracked = [t for i, t in enumerate(self.tracked) if i not in duplicate_tracked]
+        self.lost = [t for i, t in enumerate(self.lost) if i not in duplicate_lost]
@@ -0,0 +1,177 @@
+import math
+import os
+import time
+
+from script_generator.constants import OBJECT_DETECTION_VERSION, CHECKPOINT_INTERVAL_SECONDS, SEGMENT_OVERLAP_SECONDS
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.data import get_raw_yolo_output_path
+from script_generator.object_detection.util.segments import stitch_segment_records
+from script_generator.utils.msgpack_utils import append_msgpack_objects, load_msgpack_objects
+
+
+class YoloCheckpoint:
+    def __init__(self, path, frame_start, frame_end, yolo_model_path, detection_stride=1, parts=None):
+        """
+        Periodically flushed raw yolo records of an object detection run, so a crashed or stopped run can continue
+        where it left off. Every (resumed) run adds a part with its own frame range, the parts are stitched like the
+        segments of a segmented run as the tracker (and thus the track ids) restarts on every resume.
+        Picklable, process mode passes it to the post-processing process.
+
+        The file is a stream of msgpack objects: a header with the job settings followed by chunks of records. A save
+        only appends the records added since the previous save, the chunks of a run are joined into its part on load.
+
+        :param path: Checkpoint file path.
+        :param frame_start: First frame of the job (not of the resumed run).
+        :param frame_end: Frame end of the job, None for the end of the video.
+        :param yolo_model_path: Model the records were created with, a checkpoint is only resumed with the same model.
+        :param detection_stride: Stride the records were detected with, a checkpoint is only resumed with the same stride
+        as the strided and interpolated records of both runs would be mixed otherwise.
+        :param parts: Finished parts as [{"part": index, "range": [start, end], "data": records}], end is exclusive.
+        """
+        self.path = path
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.yolo_model_path = yolo_model_path
+        self.detection_stride = detection_stride
+        self.parts = parts or []
+        self.run_start = frame_start
+        self._last_save = time.time()
+        self._part_index = len(self.parts)  # Index of the current run's part, its chunks carry it
+        self._saved_count = 0  # Records of the current run that are in the file
+        self._file_started = False  # The file holds the header and the finished parts, chunks can be appended
+
+    @staticmethod
+    def load_or_create(state) -> "YoloCheckpoint":
+        frame_start = state.frame_start or 0
+        path = get_raw_yolo_checkpoint_path(state)
+        checkpoint = YoloCheckpoint(path, frame_start, state.frame_end, state.yolo_model_path, state.detection_stride)
+
+        if not os.path.exists(path):
+            return checkpoint
+
+        try:
+            objects, complete = load_msgpack_objects(path)
+        except Exception as e:
+            log_od.warn(f"Ignoring unreadable object detection checkpoint {path}: {e}")
+            return checkpoint
+
+        header, chunks = (objects[0], objects[1:]) if objects else ({}, [])
+        settings = checkpoint.settings
+        if not chunks or {key: header.get(key) for key in settings} != settings:
+            log_od.warn(f"Ignoring object detection checkpoint of a run with different settings: {path}")
+            return checkpoint
+
+        parts = []
+        for chunk in chunks:
+            if parts and parts[-1]["part"] == chunk["part"]:
+                parts[-1]["range"][1] = chunk["range"][1]
+                parts[-1]["data"].extend(chunk["data"])
+            else:
+                parts.append({"part": chunk["part"], "range": list(chunk["range"]), "data": list(chunk["data"])})
+
+        checkpoint.parts = parts
+        checkpoint._part_index = parts[-1]["part"] + 1
+        # Appending after an incomplete chunk would corrupt the stream, the first save replaces the file instead
+        checkpoint._file_started = complete
+        return checkpoint
+
+    @property
+    def settings(self):
+        return get_job_settings(self.frame_start, self.frame_end, self.yolo_model_path, self.detection_stride)
+
+    @property
+    def next_frame(self):
+        """
+        First frame that hasn't been processed yet.
+        """
+        return self.parts[-1]["range"][1] if self.parts else self.frame_start
+
+    def get_resume_frame(self, fps):
+        """
+        Frame the resumed run starts decoding from. It starts a bit before the next frame to warm up the tracker and
+        to match the new track ids against the previous run.
+        """
+        if not self.parts:
+            return self.frame_start
+        overlap = int(math.ceil(SEGMENT_OVERLAP_SECONDS * fps))
+        return max(self.parts[-1]["range"][0], self.next_frame - overlap)
+
+    def start_run(self, run_start):
+        self.run_start = run_start
+        self._last_save = time.time()
+        self._saved_count = 0
+
+    def maybe_save(self, records, last_frame):
+        """
+        Flushes the checkpoint when the interval has passed.
+
+        :param records: Records of the current run.
+        :param last_frame: Last frame of the current run that is fully processed, frames are processed in order.
+        """
+        if time.time() - self._last_save < CHECKPOINT_INTERVAL_SECONDS:
+            return
+        self.save(records, last_frame)
+
+    def save(self, records, last_frame):
+        """
+        Appends the records added since the previous save.
+
+        :param records: Records of the current run, records are only ever appended to it.
+        :param last_frame: Last frame of the current run that is fully processed.
+        """
+        self._last_save = time.time()
+        if last_frame is None or last_frame < self.next_frame:
+            return  # The run hasn't passed the frames of the previous parts yet
+
+        start_time = time.time()
+        objects = []
+        if not self._file_started:
+            objects.append(self.settings)
+            objects += [{"part": part["part"], "range": part["range"], "data": part["data"]} for part in self.parts]
+        # Records of later frames can't exist yet, so every frame in the range is complete
+        objects.append({"part": self._part_index, "range": [self.run_start, last_frame + 1], "data": records[self._saved_count:]})
+
+        # The first save of a run writes the whole stream, it replaces the file so a crash while writing keeps the
+        # previous parts. Later saves only append
+        append_msgpack_objects(self.path, objects, replace=not self._file_started)
+        self._file_started = True
+        self._saved_count = len(records)
+        log_od.info(f"Saved object detection checkpoint up to frame {last_frame} in {time.time() - start_time:.2f} s")
+
+    def get_records(self, records, run_end):
+        """
+        :param records: Records of the current run.
+        :param run_end: Exclusive end frame of the current run.
+        :return: The records of all the parts and the current run with consistent track ids.
+        """
+        if not self.parts:
+            return records
+
+        segment_records = [part["data"] for part in self.parts]
+        segment_ranges = [tuple(part["range"]) for part in self.parts]
+        if run_end > self.next_frame:
+            segment_records.append(records)
+            segment_ranges.append((self.run_start, run_end))
+        return stitch_segment_records(segment_records, segment_ranges)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def get_job_settings(frame_start, frame_end, yolo_model_path, detection_stride):
+    """
+    :return: The settings the records of an object detection job depend on, saved records are only reused (resumed
+             or as a finished range) when they match.
+    """
+    return {
+        "version": OBJECT_DETECTION_VERSION,
+        "frame_start": frame_start,
+        "frame_end": frame_end,
+        "yolo_model_path": yolo_model_path,
+        "detection_stride": detection_stride,
+    }
+
+
+def get_raw_yolo_checkpoint_path(state):
+    return get_raw_yolo_output_path(state).replace(".msgpack", "_checkpoint.msgpack")
@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from script_generator.object_detection.util.interpolation import is_synthetic_record
+from script_generator.object_detection.util.segments import box_iou
+
+
+def _group_by_frame(records):
+    frames = defaultdict(list)
+    for record in records:
+        frames[record[0]].append(record)
+    return frames
+
+
+def compare_records(reference, candidate, iou_threshold=0.5):
+    """
+    Measures how well the raw yolo records of a candidate run agree with a reference run (e.g. strided detection or
+    a quantized model against a full rate run with the default model). Boxes are matched per frame and class, best
+    IoU first. Track ids are ignored as they differ between runs.
+
+    :return: {"all" | "detected" | "synthetic": {"boxes", "matched", "precision", "mean_iou"}, "recall": ...}
+    """
+    reference_frames = _group_by_frame(reference)
+    candidate_frames = _group_by_frame(candidate)
+
+    stats = {kind: {"boxes": 0, "matched": 0, "iou_sum": 0.0} for kind in ("all", "detected", "synthetic")}
+    reference_matched = 0
+
+    for frame, candidate_records in candidate_frames.items():
+        reference_records = reference_frames.get(frame, [])
+        pairs = []
+        for i, record in enumerate(candidate_records):
+            for j, other in enumerate(reference_records):
+                if record[1] == other[1]:
+                    iou = box_iou(record[3:7], other[3:7])
+                    if iou >= iou_threshold:
+                        pairs.append((iou, i, j))
+
+        used_candidate, used_reference = {}, set()
+        for iou, i, j in sorted(pairs, reverse=True):
+            if i in used_candidate or j in used_reference:
+                continue
+            used_candidate[i] = iou
+            used_reference.add(j)
+        reference_matched += len(used_reference)
+
+        for i, record in enumerate(candidate_records):
+            for kind in ("all", "synthetic" if is_synthetic_record(record) else "detected"):
+                stats[kind]["boxes"] += 1
+                if i in used_candidate:
+                    stats[kind]["matched"] += 1
+                    stats[kind]["iou_sum"] += used_candidate[i]
+
+    report = {}
+    for kind, s in stats.items():
+        report[kind] = {
+            "boxes": s["boxes"],
+            "matched": s["matched"],
+            "precision": s["matched"] / s["boxes"] if s["boxes"] else 0.0,
+            "mean_iou": s["iou_sum"] / s["matched"] if s["matched"] else 0.0,
+        }
+    report["reference_boxes"] = len(reference)
+    report["recall"] = reference_matched / len(reference) if reference else 0.0
+    return report
@@ -3,7 +3,7 @@ import os
 import torch
 from ultralytics import YOLO
 
-from script_generator.constants import MODELS_PATH, MODEL_FILENAMES, OBJECT_DETECTION_VERSION, YOLO_BATCH_SIZE
+from script_generator.constants import MODELS_PATH, MODEL_FILENAMES, OBJECT_DETECTION_VERSION, YOLO_BATCH_SIZE, ONNX_MODEL_PRECISION, VALID_MODEL_PRECISIONS
 from script_generator.debug.logger import log
 from script_generator.utils.file import get_output_file_path
 from script_generator.utils.helpers import is_mac
@@ -21,8 +21,39 @@ def find_model(extension):
     return None
 
 
-def get_yolo_model_path():
-    """Selects the appropriate YOLO model based on platform and hardware capabilities."""
+def get_model_variant_path(model_path, precision):
+    """
+    Path of a precision variant of an .onnx model, e.g. models/FunGen-12s-pov-1.1.0.int8.onnx. fp32 is the model itself.
+    Works on the path of another variant too.
+    """
+    base, ext = os.path.splitext(model_path)
+    for other in VALID_MODEL_PRECISIONS:
+        if base.endswith(f".{other}"):
+            base = base[:-len(other) - 1]
+    return f"{base}{ext}" if precision == "fp32" else f"{base}.{precision}{ext}"
+
+
+def select_model_variant(model_path, precision):
+    """
+    :return: The precision variant of an .onnx model when it exists, the model path unchanged otherwise.
+    """
+    if not model_path or not model_path.endswith(".onnx"):
+        if precision != "fp32":
+            log.warn(f"Model precision {precision} is only available for .onnx models, using {model_path}")
+        return model_path
+
+    variant_path = get_model_variant_path(model_path, precision)
+    if not os.path.exists(variant_path):
+        log.warn(f"No {precision} variant of {model_path} found (run script_generator.cli.quantize_models), using {model_path}")
+        return model_path
+    return variant_path
+
+
+def get_yolo_model_path(precision=ONNX_MODEL_PRECISION):
+    """
+    Selects the appropriate YOLO model based on platform and hardware capabilities.
+    :param precision: Variant of the .onnx model used for CPU inference (fp32, fp16 or int8).
+    """
 
     model_checks = [
         (".mlpackage", is_mac(), "Apple device detected, using MPS inference."),
@@ -36,6 +67,7 @@ def get_yolo_model_path():
             log.info(f"{message} Loading {model_path}.")
             if ext == ".onnx":
                 log.info("WARNING: CPU inference may be slow on some devices.")
+                return select_model_variant(model_path, precision)
             return model_path
 
     log.error("No suitable model found. Please make sure to download one of our models and place it in the models directory.")
@@ -61,9 +93,33 @@ def get_raw_yolo_file_info(state):
     return False, None, None
 
 
-def save_yolo_data(state, data):
+def get_raw_yolo_segment_path(video_path, segment_index):
+    path, _ = get_output_file_path(video_path, ".msgpack", f"rawyolo_segment_{segment_index}")
+    return path
+
+
+def get_raw_yolo_output_path(state):
+    """
+    Path the object detection results are written to, segment processes write to their own file.
+    """
+    if state.segment_index is not None:
+        return get_raw_yolo_segment_path(state.video_path, state.segment_index)
     path, _ = get_output_file_path(state.video_path, ".msgpack", "rawyolo")
+    return path
+
+
+def save_yolo_data(state, data, settings=None):
+    save_yolo_data_to_path(get_raw_yolo_output_path(state), data, settings)
+
+
+def save_yolo_data_to_path(path, data, settings=None):
+    """
+    :param settings: Job settings the records were created with (see YoloCheckpoint.settings), lets a later run tell
+                     whether it can reuse them.
+    """
     json_data = {"version": OBJECT_DETECTION_VERSION, "data": data}
+    if settings is not None:
+        json_data["settings"] = settings
     save_msgpack_json(path, json_data)
 
 
@@ -0,0 +1,65 @@
+SYNTHETIC_FLAG = 1  # Appended to a raw yolo record (as 9th field) when its box was interpolated instead of detected
+
+
+def is_synthetic_record(record):
+    return len(record) > 8 and record[8] == SYNTHETIC_FLAG
+
+
+class BoxInterpolator:
+    def __init__(self, stride):
+        """
+        Fills the frames that were skipped by strided detection. The box of every track that is detected on two
+        consecutive detected frames is linearly interpolated over the frames in between.
+
+        :param stride: Detection runs on every stride-th frame, larger gaps (e.g. a seek) are not filled.
+        """
+        self.stride = stride
+        self.previous_frame = None
+        self.previous_tracks = {}
+
+    def interpolate(self, frame_pos, records):
+        """
+        :param frame_pos: Frame position of the detected frame, frames must be passed in order.
+        :param records: Raw yolo records of that frame.
+        :return: Synthetic records for the skipped frames before frame_pos, in frame order.
+        """
+        # Untracked records (track id 0, e.g. pose) can't be matched between frames
+        tracks = {record[7]: record for record in records if record[7] != 0}
+        synthetic = []
+
+        gap = frame_pos - self.previous_frame if self.previous_frame is not None else 0
+        if 1 < gap <= self.stride:
+            matched = [
+                (previous, tracks[track_id])
+                for track_id, previous in self.previous_tracks.items()
+                if track_id in tracks and tracks[track_id][1] == previous[1]
+            ]
+            for offset in range(1, gap):
+                t = offset / gap
+                for previous, current in matched:
+                    box = [round(a + (b - a) * t) for a, b in zip(previous[3:7], current[3:7])]
+                    conf = min(previous[2], current[2])
+                    synthetic.append([self.previous_frame + offset, previous[1], conf, *box, previous[7], SYNTHETIC_FLAG])
+
+        self.previous_frame = frame_pos
+        self.previous_tracks = tracks
+        return synthetic
+
+    def flush(self, end_frame):
+        """
+        A strided run rarely ends on a detected frame, the boxes of the last detected frame are held over the skipped
+        frames after it as there is no next detection to interpolate to.
+
+        :param end_frame: Exclusive end frame of the run.
+        :return: Synthetic records for the frames after the last detected frame, in frame order.
+        """
+        if self.previous_frame is None:
+            return []
+        synthetic = [
+            [frame_pos, record[1], record[2], *record[3:7], record[7], SYNTHETIC_FLAG]
+            for frame_pos in range(self.previous_frame + 1, min(end_frame, self.previous_frame + self.stride))
+            for record in self.previous_tracks.values()
+        ]
+        self.previous_frame = None
+        self.previous_tracks = {}
+        return synthetic
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import numpy as np
+
+from script_generator.constants import RENDER_RESOLUTION, YOLO_BATCH_SIZE
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.batching import get_fixed_batch_size
+from script_generator.object_detection.util.data import load_yolo_model
+from script_generator.object_detection.util.onnx_engine import load_onnx_engine, detect
+
+
+class ModelLoader:
+    def __init__(self, model_path, inference_engine="ultralytics", intra_op_threads=0, inter_op_threads=0):
+        """
+        Loads the detection model on first use, or in a background thread once start() is called so it loads while
+        the video is probed and decoded. The model is the onnxruntime engine when it's selected and can run the model,
+        the ultralytics model otherwise.
+        """
+        self.key = (model_path, inference_engine, intra_op_threads, inter_op_threads)
+        self.model_path = model_path
+        self.model = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._done = False
+
+    def start(self, warm_up=True):
+        """
+        Starts loading in the background, does nothing when the model is loaded or loading.
+        :param warm_up: Run a dummy batch after loading, moves the slow first inference out of the pipeline.
+        """
+        with self._lock:
+            if self._thread is None and not self._done:
+                self._thread = threading.Thread(target=self._load, args=(warm_up,), name="Model loader", daemon=True)
+                self._thread.start()
+
+    def get(self):
+        """
+        :return: The model, loads it now or waits for the background load. None when it can't be loaded.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None and not self._done:
+                self._load(warm_up=False)
+        if thread is not None:
+            thread.join()
+        return self.model
+
+    def _load(self, warm_up):
+        _, inference_engine, intra_op_threads, inter_op_threads = self.key
+        try:
+            start_time = time.perf_counter()
+            model = None
+            if inference_engine == "onnxruntime":
+                model = load_onnx_engine(self.model_path, intra_op_threads, inter_op_threads)
+                if model is None:
+                    log_od.warn("Falling back to the ultralytics inference engine")
+            if model is None:
+                model = load_yolo_model(self.model_path)
+            self.load_seconds = time.perf_counter() - start_time
+            self.model = model
+
+            if model is not None and warm_up:
+                start_time = time.perf_counter()
+                frame = np.zeros((RENDER_RESOLUTION, RENDER_RESOLUTION, 3), dtype=np.uint8)
+                detect(model, [frame] * (get_fixed_batch_size(model, self.model_path) or YOLO_BATCH_SIZE))
+                self.warmup_seconds = time.perf_counter() - start_time
+                log_od.info(f"Loaded the YOLO model in {self.load_seconds:.2f} s, warm-up took {self.warmup_seconds:.2f} s")
+        except Exception as e:
+            if self.model is None:
+                log_od.error(f"Could not load the YOLO model {self.model_path}: {e}")
+            else:
+                log_od.warn(f"YOLO model warm-up failed: {e}")
+        finally:
+            self._done = True
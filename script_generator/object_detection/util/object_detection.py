@@ -39,7 +39,7 @@ def make_data_boxes(records):
     """
     result = ObjectDetectionResult()  # Create a Result instance
     for record in records:
-        frame_idx, cls, conf, x1, y1, x2, y2, track_id = record
+        frame_idx, cls, conf, x1, y1, x2, y2, track_id = record[:8]  # Interpolated records carry a synthetic flag
         box = [x1, y1, x2, y2]
         class_name = CLASS_REVERSE_MATCH.get(cls, 'unknown')
         box_record = BoxRecord(box, conf, cls, class_name, track_id)
@@ -61,7 +61,7 @@ def parse_yolo_data_looking_for_penis(data, start_frame):
     threshold = 5
 
     for line in data:
-        frame_idx, cls, conf, x1, y1, x2, y2, track_id = line
+        frame_idx, cls, conf, x1, y1, x2, y2, track_id = line[:8]
         if frame_idx >= start_frame and cls == penis_cls and conf >= 0.5:
             penis_frame = frame_idx
             if prev_frame == frame_idx - 1:
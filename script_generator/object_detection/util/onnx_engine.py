@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+
+from script_generator.constants import YOLO_CONF, YOLO_IOU, YOLO_MAX_DET, RENDER_RESOLUTION
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.data_classes.detections import Detections
+
+LETTERBOX_COLOR = 114  # Padding value ultralytics uses
+MAX_WH = 7680  # Offset per class so boxes of different classes never overlap in the NMS (same as ultralytics)
+MAX_NMS = 30000  # Most candidates per frame that go into the NMS
+
+
+def non_max_suppression(prediction, conf_threshold=YOLO_CONF, iou_threshold=YOLO_IOU, max_det=YOLO_MAX_DET):
+    """
+    Per class NMS of raw YOLO detection heads, gives the same boxes as ultralytics' non_max_suppression.
+
+    :param prediction: (batch, 4 + classes, anchors) output of a YOLOv8/11 detection model, boxes are center x,
+                       center y, width, height.
+    :return: One (n, 6) array of [x1, y1, x2, y2, conf, cls] per frame, sorted by confidence.
+    """
+    # The best class of every anchor of the whole batch at once, most anchors are dropped here
+    class_scores = prediction[:, 4:, :]
+    conf = class_scores.max(axis=1)
+    candidates = conf > conf_threshold
+
+    output = []
+    for i in range(len(prediction)):
+        anchors = np.flatnonzero(candidates[i])
+        if len(anchors) == 0:
+            output.append(np.empty((0, 6), dtype=np.float32))
+            continue
+
+        scores = conf[i, anchors]
+        order = np.argsort(-scores, kind="stable")[:MAX_NMS]
+        anchors, scores = anchors[order], scores[order]
+        cls = class_scores[i, :, anchors].argmax(axis=1)
+
+        x, y, w, h = prediction[i, :4, anchors].T
+        boxes = np.stack([x - w / 2, y - h / 2, x + w / 2, y + h / 2], axis=1)
+        keep = _greedy_nms(boxes + (cls * MAX_WH)[:, None], iou_threshold)[:max_det]
+        output.append(np.concatenate([boxes[keep], scores[keep, None], cls[keep, None]], axis=1).astype(np.float32))
+    return output
+
+
+def _greedy_nms(boxes, iou_threshold):
+    """
+    :param boxes: (n, 4) xyxy boxes sorted by descending score.
+    :return: Indices of the kept boxes, in score order.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.arange(len(boxes))
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def get_letterbox(frame_shape, size):
+    """
+    :return: (scale, pad x, pad y, resized width, resized height) that fit a frame into a size x size input.
+    """
+    height, width = frame_shape[:2]
+    scale = min(size / height, size / width)
+    resized_w, resized_h = round(width * scale), round(height * scale)
+    return scale, (size - resized_w) // 2, (size - resized_h) // 2, resized_w, resized_h
+
+
+class OnnxYoloEngine:
+    def __init__(self, model_path, intra_op_threads=0, inter_op_threads=0, conf=YOLO_CONF, iou=YOLO_IOU, max_det=YOLO_MAX_DET):
+        """
+        Runs an exported ultralytics detection model (.onnx) directly in onnxruntime. The frames of a batch are
+        letterboxed into one preallocated buffer and converted to the NCHW float input in a single numpy operation,
+        the NMS is done in numpy. Detection only, pass the results to a tracker.
+
+        :param intra_op_threads: Threads onnxruntime uses within an operator, 0 uses its default (physical cores).
+        :param inter_op_threads: Threads that run independent operators in parallel, 0 or 1 runs them in sequence.
+        """
+        import onnxruntime as ort  # Optional dependency
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=ort.get_available_providers())
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, _ = model_input.shape
+        # Dimensions exported as dynamic are names instead of numbers
+        self.batch_size = batch if isinstance(batch, int) else None
+        self.imgsz = height if isinstance(height, int) else RENDER_RESOLUTION
+
+        self._frames = None  # Letterboxed BGR frames, (batch, imgsz, imgsz, 3) uint8
+        self._input = None  # Model input, (batch, 3, imgsz, imgsz) float32
+        log_od.info(
+            f"onnxruntime engine loaded {model_path} ({self.session.get_providers()[0]}, "
+            f"batch {self.batch_size or 'dynamic'}, {self.imgsz}x{self.imgsz})"
+        )
+
+    def _allocate(self, batch_size):
+        if self._frames is None or len(self._frames) < batch_size:
+            self._frames = np.full((batch_size, self.imgsz, self.imgsz, 3), LETTERBOX_COLOR, dtype=np.uint8)
+            self._input = np.zeros((batch_size, 3, self.imgsz, self.imgsz), dtype=np.float32)
+
+    def preprocess(self, frames):
+        """
+        Letterboxes the BGR frames into the input buffer as normalized RGB NCHW.
+
+        :return: (input batch, letterbox of every frame)
+        """
+        count = len(frames)
+        # Fixed batch models always get a full batch, the rows after the frames keep whatever they held before
+        rows = self.batch_size or count
+        self._allocate(rows)
+
+        letterboxes = []
+        for i, frame in enumerate(frames):
+            letterbox = get_letterbox(frame.shape, self.imgsz)
+            scale, pad_x, pad_y, resized_w, resized_h = letterbox
+            if scale == 1 and (pad_x, pad_y) == (0, 0):
+                self._frames[i] = frame
+            else:
+                self._frames[i] = LETTERBOX_COLOR
+                cv2.resize(frame, (resized_w, resized_h), dst=self._frames[i, pad_y:pad_y + resized_h, pad_x:pad_x + resized_w], interpolation=cv2.INTER_LINEAR)
+            letterboxes.append(letterbox)
+
+        # BGR HWC uint8 to RGB CHW float for the whole batch in one pass
+        np.multiply(self._frames[:count, :, :, ::-1].transpose(0, 3, 1, 2), np.float32(1 / 255), out=self._input[:count])
+        return self._input[:rows], letterboxes
+
+    def predict(self, frames):
+        """
+        :param frames: BGR frames, any number, fixed batch models run several batches when there are more.
+        :return: Untracked Detections of every frame, in the coordinates of the frame.
+        """
+        if self.batch_size and len(frames) > self.batch_size:
+            return [d for i in range(0, len(frames), self.batch_size) for d in self.predict(frames[i:i + self.batch_size])]
+
+        batch, letterboxes = self.preprocess(frames)
+        prediction = self.session.run(None, {self.input_name: batch})[0]
+        boxes = non_max_suppression(prediction[:len(frames)], self.conf, self.iou, self.max_det)
+
+        results = []
+        for frame, det, (scale, pad_x, pad_y, _, _) in zip(frames, boxes, letterboxes):
+            xyxy = (det[:, :4] - [pad_x, pad_y, pad_x, pad_y]) / scale
+            height, width = frame.shape[:2]
+            np.clip(xyxy, 0, [width, height, width, height], out=xyxy)
+            results.append(Detections(
+                xywh=np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2, xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]], axis=1).astype(np.float32),
+                cls=det[:, 5].astype(np.int32),
+                conf=det[:, 4]
+            ))
+        return results
+
+
+_engines = {}
+
+
+def load_onnx_engine(model_path, intra_op_threads=0, inter_op_threads=0):
+    """
+    The onnxruntime engine of the model, shared by the pipeline runs of the process. Returns None when the model isn't
+    an .onnx file or onnxruntime is not installed.
+    """
+    if not model_path or not model_path.endswith(".onnx"):
+        log_od.warn(f"The onnxruntime engine needs an .onnx model, got {model_path}")
+        return None
+
+    key = (model_path, intra_op_threads, inter_op_threads)
+    if key not in _engines:
+        try:
+            _engines[key] = OnnxYoloEngine(model_path, intra_op_threads, inter_op_threads)
+        except ImportError:
+            log_od.warn("onnxruntime is not installed (pip install onnxruntime)")
+            return None
+    return _engines[key]
+
+
+
+def detect(model, frames):
+    """
+    Detection only inference with the onnxruntime engine or an ultralytics model.
+    :return: Untracked Detections of every frame.
+    """
+    if isinstance(model, OnnxYoloEngine):
+        return model.predict(frames)
+    # Yolo expects bgr images when using numpy frames
+    return [Detections.from_yolo_result(result) for result in model.predict(frames, conf=YOLO_CONF, verbose=False)]
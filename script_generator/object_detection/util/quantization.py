@@ -0,0 +1,123 @@
+import math
+import os
+import subprocess
+
+import numpy as np
+
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.data import get_model_variant_path
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
+
+# Only convolutions and matrix multiplications (YOLO11's attention) are quantized, the concat/split ops of the detection
+# head stay float and keep the box coordinates exact
+INT8_OP_TYPES = ["Conv", "MatMul"]
+
+
+def sample_calibration_frames(state, video_paths, count):
+    """
+    Decodes count frames spread evenly over the videos the way the pipeline reads them (scaled and projected to the
+    render resolution), so the int8 ranges are calibrated on the content the model sees in production.
+    """
+    frames = []
+    per_video = max(1, math.ceil(count / len(video_paths)))
+    for video_path in video_paths:
+        state.video_path = video_path
+        state.set_video_info()
+        total = state.video_info.total_frames
+        # Skip the first and last few percent, intros and credits calibrate badly
+        for frame_pos in np.linspace(total * 0.05, total * 0.95, per_video).astype(int):
+            cmd, frame_size, width, height = get_ffmpeg_read_cmd(state, int(frame_pos))
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                frame = np.empty((height, width, 3), dtype=np.uint8)
+                if read_into(process.stdout, frame) == frame_size:
+                    frames.append(frame)
+            finally:
+                process.terminate()
+                process.wait()
+        log_od.info(f"Sampled {len(frames)} calibration frames so far ({video_path})")
+    return frames[:count]
+
+
+class CalibrationReader:
+    def __init__(self, model_path, frames):
+        """
+        Feeds the calibration frames to onnxruntime's static quantization, preprocessed exactly like the onnxruntime
+        engine does (letterbox, RGB, NCHW float) in batches of the model. A fixed batch model only gets full batches,
+        the remaining frames are dropped: the engine would fill the rest of a partial batch with the frames of the
+        previous batch, which would calibrate those twice.
+        """
+        self.engine = OnnxYoloEngine(model_path)
+        batch_size = self.engine.batch_size or 1
+        usable = len(frames) - len(frames) % batch_size
+        if usable == 0:
+            raise ValueError(f"{model_path} takes batches of {batch_size} frames, sample at least that many calibration frames")
+        if usable < len(frames):
+            log_od.warn(f"Dropping the last {len(frames) - usable} calibration frames, {model_path} takes batches of {batch_size} frames")
+        self.batches = [frames[i:i + batch_size] for i in range(0, usable, batch_size)]
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.batches):
+            return None
+        batch, _ = self.engine.preprocess(self.batches[self.index])
+        self.index += 1
+        return {self.engine.input_name: batch.copy()}
+
+    def rewind(self):
+        self.index = 0
+
+
+def quantize_int8(model_path, calibration_frames=None):
+    """
+    Writes the int8 variant of an .onnx model next to it. With calibration frames the activations are quantized
+    statically (QDQ, per channel weights), which is what makes convolutions fast on CPU. Without them the weights are
+    quantized and the activations dynamically at run time, which needs no data but gains less on convolutional models.
+
+    :return: Path of the int8 model.
+    """
+    from onnxruntime import quantization as q  # Optional dependency
+
+    output_path = get_model_variant_path(model_path, "int8")
+    if calibration_frames:
+        # Shape inference and graph optimization before quantization, recommended by onnxruntime
+        prepared_path = f"{output_path}.prepared.onnx"
+        q.quant_pre_process(model_path, prepared_path)
+        try:
+            q.quantize_static(
+                prepared_path,
+                output_path,
+                CalibrationReader(model_path, calibration_frames),
+                quant_format=q.QuantFormat.QDQ,
+                op_types_to_quantize=INT8_OP_TYPES,
+                per_channel=True,
+                activation_type=q.QuantType.QUInt8,
+                weight_type=q.QuantType.QInt8,
+                calibrate_method=q.CalibrationMethod.MinMax
+            )
+        finally:
+            os.remove(prepared_path)
+    else:
+        q.quantize_dynamic(model_path, output_path, op_types_to_quantize=INT8_OP_TYPES, weight_type=q.QuantType.QUInt8)
+
+    log_od.info(f"Saved the int8 ({'static' if calibration_frames else 'dynamic'}) model to {output_path}")
+    return output_path
+
+
+def convert_fp16(model_path):
+    """
+    Writes the fp16 variant of an .onnx model next to it. The input and output stay float32, so the onnxruntime
+    engine feeds it like the fp32 model. Halves the model size, it's faster on GPUs and CPUs with native fp16.
+
+    :return: Path of the fp16 model.
+    """
+    import onnx  # Optional dependency
+    from onnxconverter_common import float16
+
+    output_path = get_model_variant_path(model_path, "fp16")
+    model = float16.convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+    onnx.save(model, output_path)
+    log_od.info(f"Saved the fp16 model to {output_path}")
+    return output_path
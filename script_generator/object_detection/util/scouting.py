@@ -0,0 +1,114 @@
+import math
+import subprocess
+import time
+
+import numpy as np
+
+from script_generator.constants import CLASS_REVERSE_MATCH, SCOUT_CLASSES, YOLO_BATCH_SIZE
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.batching import get_fixed_batch_size
+from script_generator.object_detection.util.onnx_engine import detect, OnnxYoloEngine
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
+from script_generator.video.util.keyframes import load_or_build_keyframe_index
+
+
+def scout_keyframes(state, frame_start, frame_end):
+    """
+    Scouting pass: decodes only the keyframes and runs detection (no tracking) on them.
+
+    :return: ([keyframe frame numbers], [is relevant]) of the keyframes in the range, or None when the keyframes of
+             the video are unknown.
+    """
+    keyframe_index = load_or_build_keyframe_index(state)
+    if keyframe_index is None:
+        return None
+
+    relevant_classes = {cls for cls, name in CLASS_REVERSE_MATCH.items() if name in SCOUT_CLASSES}
+    # Decodes from the start, the keyframes are matched to the index in decoding order. The scouting pass has no
+    # OpenGL or remap stage, FFmpeg projects VR keyframes
+    cmd, frame_size, width, height = get_ffmpeg_read_cmd(state, 0, disable_opengl=True, keyframes_only=True)
+    log_od.info(f"OBJECT DETECTION Scouting {len(keyframe_index.keyframes)} keyframes: {' '.join(cmd)}")
+
+    start_time = time.time()
+    model = state.yolo_model
+    fixed_size = get_fixed_batch_size(model, state.yolo_model_path)
+    batch_size = fixed_size or YOLO_BATCH_SIZE
+    # Only engines compiled for a fixed batch are padded, the onnxruntime engine pads fixed batch models itself
+    pad_to = fixed_size if not isinstance(model, OnnxYoloEngine) else None
+    frames = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(batch_size)]
+    keyframes, relevant = [], []
+
+    def run_batch(positions):
+        batch = frames[:len(positions)]
+        if pad_to:
+            batch += [batch[-1]] * (pad_to - len(batch))
+        for frame_pos, detections in zip(positions, detect(model, batch)):
+            keyframes.append(frame_pos)
+            relevant.append(any(cls in relevant_classes for cls in detections.cls.tolist()))
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        positions = []
+        for frame_pos in keyframe_index.keyframes:
+            if frame_end is not None and frame_pos >= frame_end:
+                break
+            if read_into(process.stdout, frames[len(positions)]) < frame_size:
+                log_od.warn(f"OBJECT DETECTION Scouting decoded fewer keyframes than the index holds, stopped at frame {frame_pos}")
+                break
+            if frame_pos < frame_start:
+                continue  # Before the range, decoded to stay aligned with the index
+            positions.append(frame_pos)
+            if len(positions) == batch_size:
+                run_batch(positions)
+                positions = []
+        if positions:
+            run_batch(positions)
+    finally:
+        process.terminate()
+        process.wait()
+
+    log_od.info(f"OBJECT DETECTION Scouted {len(keyframes)} keyframes in {time.time() - start_time:.2f} s, {sum(relevant)} relevant")
+    return keyframes, relevant
+
+
+def get_relevant_ranges(keyframes, relevant, frame_start, frame_end, margin, min_gap):
+    """
+    Turns the scouted keyframes into the frame ranges that need full rate detection. The content can change anywhere
+    between two keyframes, so the range of a relevant keyframe reaches from the keyframe before to the keyframe after.
+
+    :param margin: Frames added before and after every range.
+    :param min_gap: Ranges separated by fewer frames are merged.
+    :return: Sorted, non overlapping (start, end) tuples, end is exclusive.
+    """
+    ranges = []
+    for i, is_relevant in enumerate(relevant):
+        if not is_relevant:
+            continue
+        start = keyframes[i - 1] if i > 0 else frame_start
+        end = keyframes[i + 1] if i + 1 < len(keyframes) else frame_end
+        start, end = max(frame_start, start - margin), min(frame_end, end + margin)
+
+        if ranges and start - ranges[-1][1] < min_gap:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def scout_relevant_ranges(state, frame_start, frame_end, margin_seconds, min_gap_seconds):
+    """
+    :return: The frame ranges with relevant content, None when scouting isn't possible (analyze everything instead).
+    """
+    scouted = scout_keyframes(state, frame_start, frame_end)
+    if scouted is None:
+        return None
+    keyframes, relevant = scouted
+    if not keyframes:
+        return None
+
+    fps = state.video_info.fps
+    return get_relevant_ranges(
+        keyframes, relevant, frame_start, frame_end,
+        int(math.ceil(margin_seconds * fps)), int(math.ceil(min_gap_seconds * fps))
+    )
@@ -0,0 +1,115 @@
+import math
+from collections import Counter, defaultdict
+
+from script_generator.debug.logger import log_od
+
+
+def split_frame_range(frame_start, frame_end, segments, overlap):
+    """
+    Split a frame range into adjacent segments. Every segment but the first starts `overlap` frames early so its
+    tracker is warmed up and the track ids can be matched against the previous segment.
+
+    :return: List of (start, end) tuples, end is exclusive.
+    """
+    segment_size = math.ceil((frame_end - frame_start) / segments)
+    ranges = []
+    for i in range(segments):
+        start = frame_start + i * segment_size
+        end = min(start + segment_size, frame_end)
+        if start >= end:
+            break
+        ranges.append((max(frame_start, start - overlap) if i > 0 else start, end))
+    return ranges
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _match_track_ids(previous, current, iou_threshold):
+    """
+    Vote for an id mapping using the boxes both segments detected in the overlapping frames.
+
+    :param previous: {frame: [records]} of the already stitched result.
+    :param current: {frame: [records]} of the segment that is being stitched.
+    :return: {current track id: previous track id}
+    """
+    votes = defaultdict(Counter)
+    for frame, records in current.items():
+        candidates = previous.get(frame, [])
+        pairs = []
+        for record in records:
+            for candidate in candidates:
+                if record[1] == candidate[1]:
+                    iou = box_iou(record[3:7], candidate[3:7])
+                    if iou >= iou_threshold:
+                        pairs.append((iou, record[7], candidate[7]))
+
+        # Greedy one to one matching per frame, best overlaps first
+        used_current, used_previous = set(), set()
+        for iou, current_id, previous_id in sorted(pairs, reverse=True):
+            if current_id in used_current or previous_id in used_previous:
+                continue
+            used_current.add(current_id)
+            used_previous.add(previous_id)
+            votes[current_id][previous_id] += 1
+
+    id_map = {}
+    taken = set()
+    ranked = sorted(((count, current_id, previous_id) for current_id, counter in votes.items() for previous_id, count in counter.items()), reverse=True)
+    for count, current_id, previous_id in ranked:
+        if current_id in id_map or previous_id in taken:
+            continue
+        id_map[current_id] = previous_id
+        taken.add(previous_id)
+    return id_map
+
+
+def stitch_segment_records(segment_records, segment_ranges, iou_threshold=0.5):
+    """
+    Merge the raw yolo records of independently analyzed segments into one stream with consistent track ids.
+    Overlapping frames are taken from the earlier segment, the later segment only contributes them to match ids.
+    Track id 0 is used for untracked records (e.g. pose) and is never remapped.
+
+    :param segment_records: List of raw yolo record lists, one per segment in frame order.
+    :param segment_ranges: The (start, end) frame range of each segment as returned by split_frame_range.
+    :return: The merged list of records.
+    """
+    merged = []
+    next_id = 1
+    previous_end = None
+
+    for records, (start, end) in zip(segment_records, segment_ranges):
+        if previous_end is None:
+            id_map = {}
+            own_start = start
+        else:
+            own_start = previous_end
+            previous = defaultdict(list)
+            for record in merged:
+                if start <= record[0] < own_start:
+                    previous[record[0]].append(record)
+            current = defaultdict(list)
+            for record in records:
+                if record[0] < own_start:
+                    current[record[0]].append(record)
+            id_map = _match_track_ids(previous, current, iou_threshold)
+            log_od.info(f"Stitching segment {start}-{end}: matched {len(id_map)} track(s) in {own_start - start} overlapping frame(s)")
+
+        for record in records:
+            if record[0] < own_start:
+                continue
+            track_id = record[7]
+            if track_id != 0 and track_id not in id_map:
+                id_map[track_id] = next_id
+                next_id += 1
+            merged.append(record[:7] + [id_map.get(track_id, 0)] + record[8:])
+
+        next_id = max(next_id, max((record[7] for record in merged), default=0) + 1)
+        previous_end = end
+
+    return merged
@@ -0,0 +1,68 @@
+import queue
+from time import perf_counter_ns
+
+from script_generator.object_detection.util.byte_tracker import ByteTracker
+from script_generator.object_detection.util.data import save_yolo_data_to_path, get_raw_yolo_output_path
+from script_generator.object_detection.util.interpolation import BoxInterpolator
+from script_generator.tasks.workers.abstract_process_worker import AbstractProcessWorker
+from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_YOLO_ANALYSIS, STAGE_TRACKING
+
+
+class PostProcessProcessWorker(AbstractProcessWorker):
+    process_type = TaskProcessorTypes.YOLO_ANALYSIS
+
+    def stage_args(self):
+        state = self.state
+        tracker_frame_rate = max(1, round(state.video_info.fps / state.detection_stride))
+        end_frame = state.frame_end or state.video_info.total_frames
+        return get_raw_yolo_output_path(state), state.analyze_task.checkpoint, state.detection_stride, end_frame, tracker_frame_rate, self.failed_event, self.input_queue
+
+    @staticmethod
+    def stage_logic(raw_yolo_path, checkpoint, stride, end_frame, tracker_frame_rate, failed_event, input_queue, output_queue, stop_event):
+        records = []
+        interpolator = BoxInterpolator(stride)
+        # The inference process only detects, tracking here overlaps with the inference of the next batch
+        tracker = ByteTracker(frame_rate=tracker_frame_rate)
+        last_frame = None  # Last fully processed frame, frames arrive in order
+
+        while not stop_event.is_set():
+            try:
+                descriptor = input_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if descriptor is None:
+                if failed_event.is_set():
+                    break  # An upstream stage failed, only the checkpoint is saved
+
+                # Fill the skipped frames after the last detected frame
+                tail = interpolator.flush(end_frame)
+                records.extend(tail)
+                run_end = last_frame + 1 if last_frame is not None else checkpoint.run_start
+                if tail:
+                    run_end = tail[-1][0] + 1
+                save_yolo_data_to_path(raw_yolo_path, checkpoint.get_records(records, run_end), checkpoint.settings)
+                checkpoint.remove()
+                output_queue.put(None)
+                return
+
+            frame_pos, detections, durations, entered_ns = descriptor
+            start_time = perf_counter_ns()
+            detections = tracker.update(detections)
+            durations[STAGE_TRACKING] = perf_counter_ns() - start_time
+
+            start_time = perf_counter_ns()
+            frame_records = detections.to_records(frame_pos)
+            records.extend(interpolator.interpolate(frame_pos, frame_records))
+            records.extend(frame_records)
+            durations[STAGE_YOLO_ANALYSIS] = perf_counter_ns() - start_time
+            last_frame = frame_pos
+            checkpoint.maybe_save(records, last_frame)
+
+            # Only the frame position and timings are sent back for progress and performance logging
+            output_queue.put((frame_pos, durations, entered_ns))
+
+        # Stopped or failed, keep what was processed so the next run resumes it
+        checkpoint.save(records, last_frame)
+        output_queue.put(None)
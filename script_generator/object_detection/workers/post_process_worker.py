@@ -8,7 +8,9 @@ from script_generator.debug.logger import log
 from script_generator.gui.messages.messages import UpdateGUIState
 from script_generator.object_detection.data_classes.object_detection_result import ObjectDetectionResult
 from script_generator.object_detection.util.data import save_yolo_data
+from script_generator.object_detection.util.interpolation import BoxInterpolator
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_YOLO_ANALYSIS, STAGE_VIDEO
 from script_generator.utils.file import get_output_file_path
 from script_generator.utils.msgpack_utils import save_msgpack_json
 from script_generator.video.data_classes.video_info import get_cropped_dimensions
@@ -16,55 +18,55 @@ from script_generator.video.data_classes.video_info import get_cropped_dimension
 
 class PostProcessWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.YOLO_ANALYSIS
+    stage_id = STAGE_YOLO_ANALYSIS
     records = []
     test_result = ObjectDetectionResult()  # Test result object for debugging
 
+    last_frame = None  # Last fully processed frame, frames arrive in order
+    interpolator = None
+
     def task_logic(self):
         self.records = []
+        self.last_frame = None
         self.test_result = ObjectDetectionResult()
         state = self.state
         width, height = get_cropped_dimensions(state.video_info)
 
+        self.interpolator = interpolator = BoxInterpolator(state.detection_stride)
         debug_window_open = False
         for task in self.get_task():
+            task.start(self.stage_id)
 
             frame_pos = task.frame_pos
-            det_results = task.yolo_results
             frame = task.rendered_frame
             pose_results = None # TODO pose support
 
-            # Skip if no boxes are detected or no tracks are found
-            if  det_results.boxes.id is None or (len(det_results.boxes) == 0 and not state.live_preview_mode):
+            detections = task.yolo_results  # Tracked by the tracking stage
+            frame_records = detections.to_records(frame_pos)
+
+            # Fill the frames that were skipped by strided detection
+            self.records.extend(interpolator.interpolate(frame_pos, frame_records))
+
+            # Skip if no boxes are detected or no tracks are found, or there's no frame to preview (not decoded)
+            if detections.ids is None or (len(detections) == 0 and (not state.live_preview_mode or frame is None)):
                 task.rendered_frame = None # Clear memory
                 task.yolo_results = None  # Clear memory
+                state.analyze_task.release_frame(task)
                 self.finish_task(task)
                 continue
 
             ### DETECTION of BODY PARTS
-            # Extract track IDs, boxes, classes, and confidence scores
-            track_ids = det_results.boxes.id.cpu().tolist()
-            boxes = det_results.boxes.xywh.cpu()
-            classes = det_results.boxes.cls.cpu().tolist()
-            confs = det_results.boxes.conf.cpu().tolist()
-
-            # Process each detection
-            for track_id, cls, conf, box in zip(track_ids, classes, confs, boxes):
-                track_id = int(track_id)
-                x, y, w, h = box.int().tolist()
-                x1 = x - w // 2
-                y1 = y - h // 2
-                x2 = x + w // 2
-                y2 = y + h // 2
-                # Create a detection record
-                record = [frame_pos, int(cls), round(conf, 1), x1, y1, x2, y2, track_id]
+            # Create a detection record for each tracked box
+            for record in frame_records:
                 self.records.append(record)
                 if state.live_preview_mode:
-                    test_box = [[x1, y1, x2, y2], round(conf, 1), int(cls), CLASS_REVERSE_MATCH.get(int(cls), 'unknown'), track_id]
+                    _, cls, conf, x1, y1, x2, y2, track_id = record
+                    test_box = [[x1, y1, x2, y2], conf, cls, CLASS_REVERSE_MATCH.get(cls, 'unknown'), track_id]
                     self.test_result.add_record(frame_pos, test_box)
 
                     # print and test the record
                     log.debug(f"Record : {record}")
-                    log.debug(f"For class id: {int(cls)}, getting: {CLASS_REVERSE_MATCH.get(int(cls), 'unknown')}")
+                    log.debug(f"For class id: {cls}, getting: {CLASS_REVERSE_MATCH.get(cls, 'unknown')}")
                     log.debug(f"Test box: {test_box}")
 
             if RUN_POSE_MODEL:
@@ -150,18 +152,40 @@ class PostProcessWorker(AbstractTaskProcessor):
                     state.live_preview_mode = False
 
             task.rendered_frame = None # Clear memory
-            task.yolo_results = None # Clear memory (yolo results contains a copy of the image)
+            task.yolo_results = None # Clear memory (yolo results contains a reference to the image)
+            state.analyze_task.release_frame(task)
             self.finish_task(task)
             
 
+    def finish_task(self, task):
+        if task is not None:
+            # Last stage of the pipeline, the frame is done
+            task.end(self.stage_id)
+            self.state.analyze_task.profiler.record_task(task.durations, task.ends[STAGE_VIDEO])
+            self.last_frame = task.frame_pos
+            self.state.analyze_task.checkpoint.maybe_save(self.records, self.last_frame)
+        super().finish_task(task)
+
     def on_last_item(self):
-        # stop processing when the task is force closed
-        if self.state.analyze_task and self.state.analyze_task.is_stopped:
+        analyze_task = self.state.analyze_task
+        checkpoint = analyze_task.checkpoint
+
+        # Keep what was processed when the task is force closed or an upstream stage failed, the next run resumes it
+        if analyze_task.is_stopped or analyze_task.has_failed():
+            checkpoint.save(self.records, self.last_frame)
             return
 
-        self.state.analyze_task.end_time = time.time()
+        analyze_task.end_time = time.time()
+
+        # Fill the skipped frames after the last detected frame
+        tail = self.interpolator.flush(self.state.frame_end or self.state.video_info.total_frames)
+        self.records.extend(tail)
 
-        save_yolo_data(self.state, self.records)
+        run_end = self.last_frame + 1 if self.last_frame is not None else checkpoint.run_start
+        if tail:
+            run_end = tail[-1][0] + 1
+        save_yolo_data(self.state, checkpoint.get_records(self.records, run_end), checkpoint.settings)
+        checkpoint.remove()
 
 def handle_user_input(window_name):
     key = cv2.waitKey(1) & 0xFF
@@ -0,0 +1,22 @@
+from script_generator.object_detection.util.byte_tracker import ByteTracker
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_TRACKING
+
+
+class TrackingWorker(AbstractTaskProcessor):
+    """
+    Assigns track ids to the detections of the YOLO stage. Runs in its own thread on the frames in order, so the
+    association overlaps with the inference of the next batch.
+    """
+    process_type = TaskProcessorTypes.TRACKING
+    stage_id = STAGE_TRACKING
+
+    def task_logic(self):
+        state = self.state
+        tracker = ByteTracker(frame_rate=max(1, round(state.video_info.fps / state.detection_stride)))
+
+        for task in self.get_task():
+            task.start(self.stage_id)
+            task.yolo_results = tracker.update(task.yolo_results)
+            task.end(self.stage_id)
+            self.finish_task(task)
@@ -0,0 +1,103 @@
+import queue
+import time
+from time import perf_counter_ns
+
+from script_generator.constants import YOLO_WARM_UP
+from script_generator.object_detection.util.batching import AdaptiveBatchSizer, get_fixed_batch_size
+from script_generator.object_detection.util.model_loader import ModelLoader
+from script_generator.object_detection.util.onnx_engine import detect, OnnxYoloEngine
+from script_generator.tasks.util.budgeted_queue import get_queue_size
+from script_generator.tasks.workers.abstract_process_worker import AbstractProcessWorker
+from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_YOLO
+
+
+class YoloProcessWorker(AbstractProcessWorker):
+    process_type = TaskProcessorTypes.YOLO
+
+    def __init__(self, state, ctx, slab, input_queue, output_queue, failed_event=None):
+        super().__init__(state=state, ctx=ctx, input_queue=input_queue, output_queue=output_queue, failed_event=failed_event)
+        self.slab = slab
+        self._info_queue = ctx.Queue()  # Run info of the inference process for the profile, e.g. the model timings
+        self._info_reported = False
+
+    def stage_args(self):
+        # The model can't be pickled, the child process loads its own instance
+        state = self.state
+        loader_key = state.yolo_model_path, state.inference_engine, state.onnx_intra_op_threads, state.onnx_inter_op_threads
+        return loader_key, self.slab, self.input_queue, self._info_queue
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        if self.process and not self.process.is_alive() and not self._info_reported:
+            self._info_reported = True
+            try:
+                info = self._info_queue.get(timeout=1)
+            except queue.Empty:
+                return  # The process failed before it finished the run
+            for key, value in info.items():
+                self.state.analyze_task.profiler.set_info(key, value)
+
+    @staticmethod
+    def stage_logic(loader_key, slab, input_queue, info_queue, output_queue, stop_event):
+        yolo_model_path = loader_key[0]
+        # The model loads and warms up while the decoder process fills the queue
+        loader = ModelLoader(*loader_key)
+        loader.start(YOLO_WARM_UP)
+        wait_start = time.perf_counter()
+        model = loader.get()
+        model_wait_s = time.perf_counter() - wait_start
+        if model is None:
+            raise RuntimeError(f"Could not load YOLO model in inference process: {yolo_model_path}")
+        # A batch holds its slab slots until it's done, leave the other half of the slab to the decoder
+        sizer = AdaptiveBatchSizer(get_fixed_batch_size(model, yolo_model_path), max_size=max(1, slab.slots // 2))
+
+        batch = []
+        while not stop_event.is_set():
+            try:
+                descriptor = input_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if descriptor is None:
+                break
+
+            batch.append(descriptor)
+            # Dynamic batch engines don't wait for frames that aren't there, inference is not the bottleneck then
+            if len(batch) >= sizer.size or (not sizer.is_fixed and input_queue.empty()):
+                YoloProcessWorker.process_batch(model, sizer, slab, batch, input_queue, output_queue)
+                batch = []
+
+        if batch and not stop_event.is_set():
+            YoloProcessWorker.process_batch(model, sizer, slab, batch, input_queue, output_queue)
+
+        info_queue.put({
+            "model_load_s": loader.load_seconds,
+            "model_warmup_s": loader.warmup_seconds,
+            "model_wait_s": model_wait_s,
+            "yolo_batch_size": sizer.size,
+            "yolo_batching": sizer.to_dict(),
+        })
+        output_queue.put(None)
+
+    @staticmethod
+    def process_batch(model, sizer, slab, batch, input_queue, output_queue):
+        frames = [slab.frames[slot] for _, slot, _, _ in batch]
+        # Only engines compiled for a fixed batch are padded, with the last frame. The onnxruntime engine pads fixed
+        # batch models itself
+        if sizer.is_fixed and not isinstance(model, OnnxYoloEngine):
+            frames = frames + [frames[-1]] * (sizer.size - len(frames))
+
+        start_time = perf_counter_ns()
+        # Detection only, the analysis process tracks the detections
+        detections = detect(model, frames)
+        batch_time = perf_counter_ns() - start_time
+        avg_time = batch_time // len(batch)  # Use original batch length, not padded
+        # Without a queue size (macOS) the sizer doesn't try bigger batches
+        sizer.record(len(batch), batch_time / 1e9, get_queue_size(input_queue))
+
+        # Only process the actual frames, ignore padded results
+        for (frame_pos, slot, durations, entered_ns), frame_detections in zip(batch, detections[:len(batch)]):
+            slab.release(slot)  # The frame is no longer needed once the boxes are extracted
+            durations[STAGE_YOLO] = avg_time
+            output_queue.put((frame_pos, frame_detections, durations, entered_ns))
@@ -1,52 +1,96 @@
+import threading
 import time
+from time import perf_counter_ns
 
-from script_generator.constants import YOLO_CONF, YOLO_BATCH_SIZE, YOLO_PERSIST
 from script_generator.debug.logger import log_od
+from script_generator.object_detection.data_classes.detections import Detections
+from script_generator.object_detection.util.batching import AdaptiveBatchSizer, get_fixed_batch_size
+from script_generator.object_detection.util.onnx_engine import detect, OnnxYoloEngine
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_YOLO
 
 
 class YoloWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.YOLO
+    stage_id = STAGE_YOLO
+    model = None
+    batch_sizer = None
+    batch = []  # Frames of the batch being collected
+    tasks = []  # Tasks of the frames in the batch
 
     # TODO add pose model support
     # if run_pose_model:
     #     yolo_pose_results = pose_model.track(frame, persist=True, conf=YOLO_CONF, verbose=False)
 
     def task_logic(self):
-        batch = []
-        tasks = []
+        state = self.state
+        # The model may still be loading in the background, the decoder fills the queue in the meantime
+        wait_start = time.perf_counter()
+        self.model = state.yolo_model
+        state.analyze_task.profiler.set_info("model_wait_s", time.perf_counter() - wait_start)
+        if self.model is None:
+            raise RuntimeError(f"Could not load the YOLO model {state.yolo_model_path}")
+
+        # A batch holds its frame buffers until it's done, leave the other half of the pool to the other stages
+        sizer = self.batch_sizer = AdaptiveBatchSizer(
+            get_fixed_batch_size(self.model, state.yolo_model_path),
+            max_size=max(1, state.analyze_task.frame_pool.size // 2)
+        )
+
+        self.batch = []
+        self.tasks = []
 
         for task in self.get_task():
             if task.rendered_frame is not None:
-                batch.append(task.rendered_frame)
-                tasks.append(task)
-
-                # If batch is ready, process it
-                if len(batch) >= YOLO_BATCH_SIZE:
-                    self.process_batch(batch, tasks)
-                    batch = []
-                    tasks = []
+                self.batch.append(task.rendered_frame)
+                self.tasks.append(task)
+
+                # Dynamic batch engines don't wait for frames that aren't there, inference is not the bottleneck then
+                if len(self.batch) >= sizer.size or (not sizer.is_fixed and self.input_queue.qsize() == 0):
+                    self.flush_batch()
             else:
-                log_od.warn(f"Rendered frame missing on Yolo task")
+                log_od.warn(f"Rendered frame missing on Yolo task of frame {task.frame_pos}")
+                # The later stages still get the frame, the ordered ones wait for every frame position. The batch
+                # goes first to keep the order
+                self.flush_batch()
+                state.analyze_task.release_frame(task)
+                task.yolo_results = Detections.empty()
+                self.finish_task(task)
 
-        # Process any remaining tasks in the batch with padding
-        if batch:
-            # Pad the batch with the last frame to reach YOLO_BATCH_SIZE
-            last_frame = batch[-1]
-            while len(batch) < YOLO_BATCH_SIZE:
-                batch.append(last_frame.copy())
+        # Left over when the worker was stopped
+        self.flush_batch()
 
-            self.process_batch(batch, tasks)
+        state.analyze_task.profiler.set_info("yolo_batch_size", sizer.size)
+        state.analyze_task.profiler.set_info("yolo_batching", sizer.to_dict())
+
+    def on_last_item(self):
+        # The remaining frames have to go out before the end is passed on. Only in this thread, stop_process calls it
+        # from the stopping thread
+        if threading.current_thread() is self:
+            self.flush_batch()
+
+    def flush_batch(self):
+        if self.batch:
+            self.process_batch(self.batch, self.tasks)
+        self.batch = []
+        self.tasks = []
 
     def process_batch(self, frames, tasks):
-        start_time = time.time()
-        # Yolo expects bgr images when using numpy frames
-        # yolo_results = self.state.yolo_model(frames, conf=YOLO_CONF, verbose=False) # replace with this line for pipeline speed testing
-        yolo_results = self.state.yolo_model.track(frames, persist=YOLO_PERSIST, conf=YOLO_CONF, verbose=False) # , tracker="bytetrack.yaml") # , iou=0.5, show=True
-        avg_time = (time.time() - start_time) / len(tasks)  # Use original tasks length, not padded
+        sizer = self.batch_sizer
+        # Only engines compiled for a fixed batch are padded, with the last frame. Inference doesn't modify the frame
+        # so no copy is needed. The onnxruntime engine pads fixed batch models itself
+        if sizer.is_fixed and not isinstance(self.model, OnnxYoloEngine):
+            frames = frames + [frames[-1]] * (sizer.size - len(frames))
+
+        start_time = perf_counter_ns()
+        # Detection only, the tracking stage assigns the track ids
+        detections = detect(self.model, frames)
+        batch_time = perf_counter_ns() - start_time
+        avg_time = batch_time // len(tasks)  # Use original tasks length, not padded
+        sizer.record(len(tasks), batch_time / 1e9, self.input_queue.qsize())
 
         # Only process the actual tasks, ignore padded results
-        for t, result in zip(tasks, yolo_results[:len(tasks)]):
+        for t, result in zip(tasks, detections[:len(tasks)]):
             t.yolo_results = result
-            t.duration(str(self.process_type), avg_time)
+            t.duration(self.stage_id, avg_time)
             self.finish_task(t)
@@ -1,3 +1,4 @@
+import math
 import threading
 import time
 from typing import List, TYPE_CHECKING
@@ -6,29 +7,67 @@ from tqdm import tqdm
 
 from script_generator.constants import SEQUENTIAL_MODE, UPDATE_PROGRESS_INTERVAL
 from script_generator.debug.logger import log_od
+from script_generator.debug.pipeline_profile import save_profile, measure_task_overhead_ns
 from script_generator.gui.messages.messages import ProgressMessage
+from script_generator.object_detection.util.checkpoint import YoloCheckpoint
+from script_generator.scripts.analyze_video_scouted import analyze_video_scouted
+from script_generator.scripts.analyze_video_segments import analyze_video_segments
 from script_generator.state.app_state import AppState
 from script_generator.tasks.data_classes.analyze_video_task import AnalyzeVideoTask
 from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
 from script_generator.utils.data_classes.meta_data import MetaData
 from script_generator.utils.file import check_create_output_folder
+from script_generator.video.ffmpeg.video_reader import is_pyav_available
+from script_generator.video.util.frame_store import get_or_build_frame_store
 
 if TYPE_CHECKING:
     pass
 
 
+def get_analysis_mode(state: AppState):
+    """
+    :return: How analyze_video runs the job: "scouted" (scouting pass, then the pipeline over the scouted ranges),
+    "segments" (a process per segment) or "pipeline" (this process runs the pipeline over the job's frame range).
+    """
+    if state.segment_index is None:
+        if state.scout_keyframes:
+            return "scouted"
+        if state.detection_segments > 1:
+            return "segments"
+    return "pipeline"
+
+
 def analyze_video(state: AppState):
+    mode = get_analysis_mode(state)
+    # The model loads in the background while the video is probed and the pipeline starts, the YOLO stage waits for it.
+    # Segment processes and the inference process of the process mode load their own
+    runs_inference_process = state.pipeline_mode == "processes" and not SEQUENTIAL_MODE
+    if mode == "scouted" or (mode == "pipeline" and not runs_inference_process):
+        state.load_yolo()
+
+    if state.use_frame_store and state.segment_index is None:
+        # Built before the segments or scouted ranges start, they all read from it
+        check_create_output_folder(state.video_path)
+        state.set_video_info()
+        get_or_build_frame_store(state)
+
+    if mode == "scouted":
+        return analyze_video_scouted(state)
+    if mode == "segments":
+        return analyze_video_segments(state)
+
     log_od.info(f"OBJECT DETECTION Starting up pipeline...")
 
     log_thread_stop_event = threading.Event()
     threads = []
+    job_frame_start = state.frame_start
 
     try:
         # make sure the output folder exists for this video
         check_create_output_folder(state.video_path)
 
-        # Get meta file
-        meta = MetaData.get_create_meta(state)
+        # Get meta file (segment processes leave it to the process that stitches the segments)
+        meta = MetaData.get_create_meta(state) if state.segment_index is None else None
 
         # Initialize batch task
         state.set_video_info()
@@ -38,13 +77,51 @@ def analyze_video(state: AppState):
                 state.video_reader = "FFmpeg"
 
             if state.video_info.is_fisheye:
-                log_od.warn("Disabled OpenGL as fisheye is not yet supported with the opengl feature")
+                log_od.warn("Disabled OpenGL as fisheye is not yet supported with the opengl feature, use FFmpeg + CPU remap instead")
+                state.video_reader = "FFmpeg"
+
+        if state.video_reader == "FFmpeg + CPU remap" and not state.video_info.is_vr:
+            log_od.warn("Disabled the remap projection in the pipeline as it's not needed for 2D videos")
+            state.video_reader = "FFmpeg"
+
+        if state.video_reader == "PyAV" and not is_pyav_available():
+            log_od.warn("PyAV is not installed (pip install av), using the FFmpeg reader instead")
+            state.video_reader = "FFmpeg"
+
+        if state.use_frame_store and state.video_reader != "FFmpeg":
+            log_od.warn("The frame store holds the projected frames, reading it with the FFmpeg reader")
+            state.video_reader = "FFmpeg"
+
+        use_processes = state.pipeline_mode == "processes"
+        if use_processes:
+            if state.video_reader == "FFmpeg + OpenGL (Windows)":
+                log_od.warn("Disabled OpenGL as it is not supported when running the pipeline in processes")
                 state.video_reader = "FFmpeg"
+            if state.video_reader == "FFmpeg + CPU remap":
+                log_od.warn("The remap projection is not supported when running the pipeline in processes, FFmpeg projects the frames instead")
+                state.video_reader = "FFmpeg"
+            if state.video_reader == "PyAV":
+                log_od.warn("PyAV is not supported when running the pipeline in processes, using the FFmpeg reader instead")
+                state.video_reader = "FFmpeg"
+            if state.live_preview_mode:
+                log_od.warn("Live preview is not supported when running the pipeline in processes")
+                state.live_preview_mode = False
+            if SEQUENTIAL_MODE:
+                log_od.warn("Sequential mode is not supported when running the pipeline in processes, using threads instead")
+                use_processes = False
 
         use_open_gl = state.video_reader == "FFmpeg + OpenGL (Windows)"
+        use_remap = state.video_reader == "FFmpeg + CPU remap"
+
+        # Resume an interrupted run, the decoder starts from the state's frame start
+        checkpoint = YoloCheckpoint.load_or_create(state)
+        if checkpoint.parts:
+            state.frame_start = checkpoint.get_resume_frame(state.video_info.fps)
+            log_od.info(f"OBJECT DETECTION Resuming from checkpoint at frame {checkpoint.next_frame} (decoding from frame {state.frame_start})")
+        checkpoint.start_run(state.frame_start or 0)
 
         # Create the task
-        a = AnalyzeVideoTask(state, use_open_gl)
+        a = AnalyzeVideoTask(state, use_open_gl, use_processes, checkpoint, use_remap=use_remap)
 
         # Start logging thread
         queue_logging_thread = threading.Thread(
@@ -56,20 +133,16 @@ def analyze_video(state: AppState):
 
         # Sequential mode can be used to determine performance bottlenecks on very short videos
         if SEQUENTIAL_MODE:
-            def run_thread(thread, thread_name, out_queue):
+            for stage in a.graph.stages:
                 start_time = time.time()
-                thread.start()
-                thread.join()
-                out_queue.put(None)
-                log_od.info(f"[OBJECT DETECTION] {thread_name} thread done in {time.time() - start_time} s")
-
-            run_thread(a.decode_thread, TaskProcessorTypes.VIDEO, a.opengl_q)
-            if use_open_gl:
-                run_thread(a.opengl_thread, TaskProcessorTypes.OPENGL, a.yolo_q)
-            run_thread(a.yolo_thread, TaskProcessorTypes.YOLO, a.analysis_q)
-            run_thread(a.yolo_analysis_thread, TaskProcessorTypes.YOLO_ANALYSIS, a.result_q)
+                stage_threads = a.graph.get_workers(stage.name)
+                for thread in stage_threads:
+                    thread.start()
+                for thread in stage_threads:
+                    thread.join()
+                log_od.info(f"[OBJECT DETECTION] {stage.worker_class.process_type} stage done in {time.time() - start_time} s")
         else:
-            threads = [a.decode_thread, a.opengl_thread, a.yolo_thread, a.yolo_analysis_thread] if use_open_gl else [a.decode_thread, a.yolo_thread, a.yolo_analysis_thread]
+            threads = a.get_workers()
             for thread in threads:
                 thread.start()
             for thread in threads:
@@ -86,9 +159,10 @@ def analyze_video(state: AppState):
         log_thread_stop_event.set()
 
         if a.is_stopped:
-            return []
+            return
 
-        log_performance(state=state, results_queue=a.result_q)
+        log_performance(state=state)
+        save_profile(state, a.profiler)
 
         if state.update_ui:
             state.update_ui(ProgressMessage(
@@ -98,9 +172,8 @@ def analyze_video(state: AppState):
                 eta="Done"
             ))
 
-        meta.finish_analyze_video(state)
-
-        return a.result_q.queue
+        if meta:
+            meta.finish_analyze_video(state)
 
     except Exception as e:
         log_od.error(f"An error occurred during video analysis: {e}")
@@ -111,18 +184,27 @@ def analyze_video(state: AppState):
                 thread.join(timeout=1)
         raise
 
+    finally:
+        state.frame_start = job_frame_start
+        if state.analyze_task:
+            state.analyze_task.release()
+
 
 def log_progress(state, analyze_task, stop_event):
-    total_frames = state.video_info.total_frames
+    frame_start = state.frame_start or 0
+    # Frames skipped by strided detection never reach the results
+    total_frames = math.ceil(((state.frame_end or state.video_info.total_frames) - frame_start) / state.detection_stride)
 
     label = 'Analyzing ' + ('VR' if state.video_info.is_vr else '2D') + ' video'
+    if state.segment_index is not None:
+        label += f" (segment {state.segment_index + 1})"
 
     with tqdm(
             total=total_frames,
             #desc="Analyzing video",
             desc=label,
             unit="f",
-            position=0,
+            position=state.segment_index or 0,
             unit_scale=False,
             unit_divisor=1
     ) as progress_bar:
@@ -131,15 +213,20 @@ def log_progress(state, analyze_task, stop_event):
             if analyze_task.is_stopped:
                 stop_event.set()
 
-            opengl_size = analyze_task.opengl_q.qsize()
-            yolo_size = analyze_task.yolo_q.qsize()
-            analysis_size = analyze_task.analysis_q.qsize()
-            frames_processed = analyze_task.result_q.qsize()
+            depths = analyze_task.get_queue_depths()
+            analyze_task.profiler.sample_queues(depths)
+            opengl_size = depths.get(str(TaskProcessorTypes.OPENGL), 0)
+            remap_size = depths.get(str(TaskProcessorTypes.REMAP), 0)
+            yolo_size = depths[str(TaskProcessorTypes.YOLO)]
+            tracking = f"Tracking: {depths[str(TaskProcessorTypes.TRACKING)]:>3}, " if str(TaskProcessorTypes.TRACKING) in depths else ""
+            analysis_size = depths[str(TaskProcessorTypes.YOLO_ANALYSIS)]
+            frames_processed = analyze_task.result_sink.qsize()
 
             progress_bar.n = frames_processed
             open_gl = f"OpenGL: {opengl_size:>3}, " if state.video_reader == "FFmpeg + OpenGL (Windows)" else ""
+            remap = f"Remap: {remap_size:>3}, " if state.video_reader == "FFmpeg + CPU remap" else ""
             progress_bar.set_postfix_str(
-                f"Q's: {open_gl}YOLO: {yolo_size:>3}, Analysis: {analysis_size:>3}"
+                f"Q's: {open_gl}{remap}YOLO: {yolo_size:>3}, {tracking}Analysis: {analysis_size:>3}"
             )
             progress_bar.refresh()
 
@@ -163,36 +250,51 @@ def log_progress(state, analyze_task, stop_event):
 
             time.sleep(UPDATE_PROGRESS_INTERVAL)
 
-def log_performance(state, results_queue):
+def log_performance(state):
     analyze_task = state.analyze_task
-    tasks = [task for task in results_queue.queue if hasattr(task, 'profile')]
-    total_frames = len(tasks)
+    profiler = analyze_task.profiler
+    total_frames = profiler.frames
 
     total_pipeline_time = analyze_task.end_time - analyze_task.start_time
-    video_duration = total_frames / state.video_info.fps
+    video_duration = total_frames * state.detection_stride / state.video_info.fps
     avg_processing_fps = total_frames / total_pipeline_time
     realtime_percentage = (avg_processing_fps / 60.0) * 100.0
 
+    profiler.set_info("video_reader", state.video_reader)
+    profiler.set_info("pipeline_mode", state.pipeline_mode)
+    profiler.set_info("yolo_model_path", state.yolo_model_path)
+    profiler.set_info("detection_stride", state.detection_stride)
+    # The inference process of the process mode reports the timings of its own model
+    if state.model_loader and not analyze_task.use_processes:
+        profiler.set_info("model_load_s", state.model_loader.load_seconds)
+        profiler.set_info("model_warmup_s", state.model_loader.warmup_seconds)
+    profiler.set_info("queue_memory_budget_mb", state.queue_memory_budget_mb)
+    profiler.set_info("segment_index", state.segment_index)
+    profiler.set_info("scout_keyframes", state.scout_keyframes)
+    profiler.set_info("use_frame_store", state.use_frame_store)
+    profiler.set_info("total_frames", total_frames)
+    profiler.set_info("total_pipeline_time_s", total_pipeline_time)
+    profiler.set_info("average_fps", avg_processing_fps)
+    profiler.set_info("queues", analyze_task.get_queue_stats())
+    # A synthetic benchmark, only run when the debug metrics are requested
+    task_overhead_ns = measure_task_overhead_ns() if state.save_debug_file else None
+    profiler.set_info("task_bookkeeping_ns_per_frame", task_overhead_ns)
+
     log_message = (
         f"\n{'-' * 60}"
         f"\n OBJECT DETECTION COMPLETED {'(sequential mode)' if SEQUENTIAL_MODE else ''}\n"
         f"\n Settings\n"
         f"  - Video reader               : {state.video_reader}\n"     
+        f"  - Pipeline mode              : {state.pipeline_mode}\n"
+        f"  - Detection stride           : {state.detection_stride}\n"
         f"\n Video stats\n"
         f"  - Total Frames               : {total_frames}\n"
         f"  - Video Duration             : {video_duration:.2f} s\n"
     )
 
     if SEQUENTIAL_MODE:
-        log_message += f"\n Sequential Queue statistics\n"
-        for key, total_time in analyze_task.profile.items():
-            if key.endswith("_duration"):  # Only include duration metrics
-                avg_time = total_time / total_frames if total_frames > 0 else 0.0
-                stage_name = key.replace("_duration", "").capitalize()
-                log_message += (
-                    f"  - {stage_name:<27}: {avg_time * 1000:.0f} ms | "
-                    f"{(1 / avg_time if avg_time > 0 else 0):.0f} fps\n"
-                )
+        # The stages ran one after the other, the averages are the cost of every stage on its own
+        log_message += f"\n Sequential stage statistics\n"
     else:
         log_message += (
             f"\n Performance stats\n"
@@ -202,22 +304,33 @@ def log_performance(state, results_queue):
         )
         log_message += f"\n Task Average Times (while running in parallel)\n"
 
-        aggregated_times = {}
-        for task in tasks:
-            for key, total_time in task.profile.items():
-                if key.endswith("_duration"):
-                    if key not in aggregated_times:
-                        aggregated_times[key] = {"total_time": 0, "task_count": 0}
-                    aggregated_times[key]["total_time"] += total_time
-                    aggregated_times[key]["task_count"] += 1
-
-        # Calculate and format averages for each key
-        for key, data in aggregated_times.items():
-            avg_time = data["total_time"] / total_frames if total_frames > 0 else 0.0
-            stage_name = key.replace("_duration", "").replace("_", " ").capitalize()
+    # Calculate and format averages for each stage the frames went through
+    for stage, total_time in profiler.get_stage_totals().items():
+        avg_time = total_time / total_frames if total_frames > 0 else 0.0
+        stage_name = stage.capitalize()
+        log_message += (
+            f"  - {stage_name:<27}: {avg_time * 1000:.0f} ms | "
+            f"{(1 / avg_time if avg_time > 0 else 0):.0f} fps\n"
+        )
+
+    stage_latencies = profiler.to_dict()["stages"]
+    if stage_latencies:
+        log_message += f"\n Stage latencies (p50 | p95 | p99)\n"
+        for stage, latency in stage_latencies.items():
+            log_message += (
+                f"  - {stage:<27}: {latency['p50_ms']:.0f} | {latency['p95_ms']:.0f} | {latency['p99_ms']:.0f} ms\n"
+            )
+
+    if task_overhead_ns is not None:
+        log_message += f"\n Task bookkeeping overhead    : {task_overhead_ns / 1000:.1f} us per frame\n"
+
+    queue_stats = analyze_task.get_queue_stats()
+    if queue_stats:
+        log_message += f"\n Queue stats (budget {state.queue_memory_budget_mb} MB, blocked put = backpressure, blocked get = starving)\n"
+        for name, stats in queue_stats.items():
             log_message += (
-                f"  - {stage_name:<27}: {avg_time * 1000:.0f} ms | "
-                f"{(1 / avg_time if avg_time > 0 else 0):.0f} fps\n"
+                f"  - {name:<27}: share {stats['share_mb']:.0f} MB | peak {stats['peak_mb']:.0f} MB | "
+                f"blocked put {stats['blocked_put_s']:.1f} s | blocked get {stats['blocked_get_s']:.1f} s\n"
             )
 
     log_message += f"{'-' * 60}\n"
@@ -0,0 +1,105 @@
+import os
+import time
+
+from script_generator.constants import SCOUT_MARGIN_SECONDS, SCOUT_MIN_GAP_SECONDS
+from script_generator.debug.logger import log_od
+from script_generator.gui.messages.messages import ProgressMessage
+from script_generator.object_detection.util.checkpoint import get_job_settings
+from script_generator.object_detection.util.data import save_yolo_data, get_raw_yolo_segment_path
+from script_generator.object_detection.util.scouting import scout_relevant_ranges
+from script_generator.object_detection.util.segments import stitch_segment_records
+from script_generator.state.app_state import AppState
+from script_generator.utils.data_classes.meta_data import MetaData
+from script_generator.utils.file import check_create_output_folder
+from script_generator.utils.msgpack_utils import load_msgpack_json
+
+
+def analyze_video_scouted(state: AppState):
+    """
+    Coarse to fine analysis: a scouting pass runs detection on the keyframes only, the full pipeline then only runs
+    on the frame ranges around the keyframes with relevant detections. The ranges are analyzed one after the other
+    like the segments of a segmented run and their records are stitched into a single rawyolo.msgpack.
+    Frames outside the ranges have no records.
+    """
+    check_create_output_folder(state.video_path)
+    meta = MetaData.get_create_meta(state)
+    state.set_video_info()
+
+    frame_start = state.frame_start or 0
+    frame_end = state.frame_end or state.video_info.total_frames
+    if state.detection_segments > 1:
+        log_od.warn("Segments are not supported when scouting, the relevant ranges are analyzed one after the other")
+
+    start_time = time.time()
+    ranges = scout_relevant_ranges(state, frame_start, frame_end, SCOUT_MARGIN_SECONDS, SCOUT_MIN_GAP_SECONDS)
+    if ranges is None:
+        log_od.warn("Scouting is not possible for this video (the keyframes are unknown), analyzing all frames")
+        ranges = [(frame_start, frame_end)]
+    scout_time = time.time() - start_time
+
+    frames_to_analyze = sum(end - start for start, end in ranges)
+    log_od.info(
+        f"OBJECT DETECTION Scouting took {scout_time:.2f} s, analyzing {len(ranges)} range(s) with "
+        f"{frames_to_analyze} of {frame_end - frame_start} frames ({frames_to_analyze / max(1, frame_end - frame_start) * 100:.0f} %): {ranges}"
+    )
+
+    from script_generator.scripts.analyze_video import analyze_video
+
+    job = state.frame_start, state.frame_end, state.segment_index
+    segment_records = []
+    try:
+        for segment_index, (start, end) in enumerate(ranges):
+            path = get_raw_yolo_segment_path(state.video_path, segment_index)
+            # A stopped or crashed run keeps the files of its finished ranges, they're reused when scouting gives the
+            # same range again
+            records = load_finished_range(path, get_job_settings(start, end, state.yolo_model_path, state.detection_stride))
+            if records is not None:
+                log_od.info(f"OBJECT DETECTION Reusing the finished range {start} - {end}: {path}")
+                segment_records.append(records)
+                continue
+
+            state.segment_index = segment_index
+            state.frame_start = start
+            state.frame_end = end
+            # The ranges don't continue each other, every pipeline run starts with a new tracker
+            analyze_video(state)
+            if state.analyze_task and state.analyze_task.is_stopped:
+                return
+
+            segment_records.append(load_msgpack_json(path)["data"])
+    finally:
+        state.frame_start, state.frame_end, state.segment_index = job
+
+    # The ranges don't overlap, stitching only gives every range its own track ids
+    records = stitch_segment_records(segment_records, ranges)
+    save_yolo_data(state, records)
+    for segment_index in range(len(ranges)):
+        os.remove(get_raw_yolo_segment_path(state.video_path, segment_index))
+
+    total_time = time.time() - start_time
+    log_od.info(f"OBJECT DETECTION Scouted analysis completed in {total_time:.2f} s ({(frame_end - frame_start) / total_time:.2f} fps of video)")
+
+    if state.update_ui:
+        state.update_ui(ProgressMessage(
+            process="OBJECT_DETECTION",
+            frames_processed=state.video_info.total_frames,
+            total_frames=state.video_info.total_frames,
+            eta="Done"
+        ))
+
+    meta.finish_analyze_video(state)
+
+    return records
+
+
+def load_finished_range(path, settings):
+    """
+    :return: The records of a range a previous run finished with the same settings, None when there are none.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        data = load_msgpack_json(path)
+    except Exception:
+        return None
+    return data["data"] if data.get("settings") == settings else None
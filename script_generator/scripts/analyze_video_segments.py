@@ -0,0 +1,120 @@
+import math
+import multiprocessing
+import os
+import time
+
+from script_generator.constants import SEGMENT_OVERLAP_SECONDS
+from script_generator.debug.logger import log_od, set_log_level
+from script_generator.gui.messages.messages import ProgressMessage
+from script_generator.object_detection.util.data import save_yolo_data, get_raw_yolo_segment_path
+from script_generator.object_detection.util.segments import split_frame_range, stitch_segment_records
+from script_generator.state.app_state import AppState
+from script_generator.utils.data_classes.meta_data import MetaData
+from script_generator.utils.file import check_create_output_folder
+from script_generator.utils.msgpack_utils import load_msgpack_json
+
+# AppState settings that are copied to the segment processes. A spawned segment starts from a fresh AppState that only
+# knows the config file, so every setting that changes how a segment is analyzed or logged has to be listed here.
+# queue_memory_budget_mb is divided between the segments. Not copied: the frame range and detection_segments (set per
+# segment), live_preview_mode (there is no window in a segment process) and scout_keyframes (the parent scouts).
+SEGMENT_STATE_ATTRS = [
+    "video_path", "video_reader", "pipeline_mode", "queue_memory_budget_mb", "detection_stride", "use_frame_store",
+    "stage_replicas", "inference_engine", "onnx_intra_op_threads", "onnx_inter_op_threads", "yolo_model_path",
+    "ffmpeg_path", "ffprobe_path", "ffmpeg_hwaccel", "save_debug_file", "log_level"
+]
+
+
+def analyze_video_segments(state: AppState):
+    """
+    Splits the video into frame ranges and runs an independent decode + YOLO pipeline per range in its own process.
+    The records of all segments are stitched into a single rawyolo.msgpack afterward.
+    """
+    check_create_output_folder(state.video_path)
+    meta = MetaData.get_create_meta(state)
+    state.set_video_info()
+
+    fps = state.video_info.fps
+    frame_start = state.frame_start or 0
+    frame_end = state.frame_end or state.video_info.total_frames
+    overlap = int(math.ceil(SEGMENT_OVERLAP_SECONDS * fps))
+    ranges = split_frame_range(frame_start, frame_end, state.detection_segments, overlap)
+
+    log_od.info(f"OBJECT DETECTION Analyzing {len(ranges)} segment(s) in parallel: {ranges}")
+
+    if state.update_ui:
+        state.update_ui(ProgressMessage(
+            process="OBJECT_DETECTION",
+            frames_processed=0,
+            total_frames=frame_end - frame_start,
+            eta=f"Analyzing {len(ranges)} segments..."
+        ))
+
+    start_time = time.time()
+    settings = {attr: getattr(state, attr) for attr in SEGMENT_STATE_ATTRS}
+    # The memory budget is for the whole job, not per segment
+    settings["queue_memory_budget_mb"] = state.queue_memory_budget_mb // len(ranges)
+
+    # Each segment needs its own AppState (singleton) and model, so the segments run in separate processes
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for segment_index, (start, end) in enumerate(ranges):
+        process = ctx.Process(
+            target=analyze_segment,
+            args=(settings, segment_index, start, end),
+            name=f"Segment-{segment_index}"
+        )
+        process.start()
+        processes.append(process)
+
+    for process in processes:
+        process.join()
+
+    failed = [i for i, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Object detection failed for segment(s): {', '.join(map(str, failed))}")
+
+    segment_records = []
+    for segment_index in range(len(ranges)):
+        path = get_raw_yolo_segment_path(state.video_path, segment_index)
+        segment_records.append(load_msgpack_json(path)["data"])
+
+    records = stitch_segment_records(segment_records, ranges)
+    save_yolo_data(state, records)
+
+    for segment_index in range(len(ranges)):
+        os.remove(get_raw_yolo_segment_path(state.video_path, segment_index))
+
+    total_time = time.time() - start_time
+    log_od.info(f"OBJECT DETECTION {len(ranges)} segments completed in {total_time:.2f} s ({(frame_end - frame_start) / total_time:.2f} fps)")
+
+    if state.update_ui:
+        state.update_ui(ProgressMessage(
+            process="OBJECT_DETECTION",
+            frames_processed=state.video_info.total_frames,
+            total_frames=state.video_info.total_frames,
+            eta="Done"
+        ))
+
+    meta.finish_analyze_video(state)
+
+    return records
+
+
+def analyze_segment(settings, segment_index, frame_start, frame_end):
+    """
+    Segment process entry point, runs the regular pipeline on a single frame range.
+    """
+    from script_generator.scripts.analyze_video import analyze_video
+
+    state = AppState()
+    for attr, value in settings.items():
+        setattr(state, attr, value)
+    if state.log_level:
+        set_log_level(state.log_level)
+    state.set_is_cli(True)
+    state.segment_index = segment_index
+    state.detection_segments = 1
+    state.frame_start = frame_start
+    state.frame_end = frame_end
+
+    analyze_video(state)
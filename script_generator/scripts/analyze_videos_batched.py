@@ -0,0 +1,229 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+from time import perf_counter_ns
+from typing import List
+
+from tqdm import tqdm
+
+from script_generator.constants import YOLO_BATCH_SIZE
+from script_generator.debug.errors import FFMpegError
+from script_generator.debug.logger import log_od, log_vid
+from script_generator.object_detection.util.batching import AdaptiveBatchSizer, get_fixed_batch_size
+from script_generator.object_detection.util.byte_tracker import ByteTracker
+from script_generator.object_detection.util.data import save_yolo_data_to_path
+from script_generator.object_detection.util.interpolation import BoxInterpolator
+from script_generator.object_detection.util.onnx_engine import detect, OnnxYoloEngine
+from script_generator.state.app_state import AppState
+from script_generator.utils.file import check_create_output_folder, get_output_file_path
+from script_generator.video.data_classes.video_info import get_video_info, get_cropped_dimensions
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import FrameBufferPool, frames_for_budget, read_into
+
+BATCH_FILL_TIMEOUT = 0.05  # Seconds inference waits for more frames before running a partial batch
+
+
+class BatchedVideo:
+    def __init__(self, state: AppState, index, video_path, frame_budget_bytes, frames_q):
+        """
+        A video of a batched run with its own decoder, frame buffers and tracker. Only the model is shared.
+        """
+        self.state = state
+        self.index = index
+        self.video_path = video_path
+        self.video_info = get_video_info(video_path)
+        self.frames_q = frames_q
+
+        width, height = get_cropped_dimensions(self.video_info)
+        self.frame_pool = FrameBufferPool(
+            frames_for_budget(frame_budget_bytes, (height, width, 3), min_frames=YOLO_BATCH_SIZE),
+            (height, width, 3)
+        )
+
+        stride = state.detection_stride
+        self.tracker = ByteTracker(frame_rate=max(1, round(self.video_info.fps / stride)))
+        self.interpolator = BoxInterpolator(stride)
+        self.records = []
+        self.frames_processed = 0
+
+        self.error = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self._decode, name=f"Decoder-{index}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _decode(self):
+        """
+        Decodes the frames into the shared queue as (video, frame_pos, buffer_index), ends with (video, None, None).
+        """
+        state = self.state
+        stride = state.detection_stride
+        frame_start = state.frame_start or 0
+        process = None
+        try:
+            # The OpenGL projection is not part of the batched pipeline, VR videos are projected by ffmpeg
+            cmd, frame_size, _, _ = get_ffmpeg_read_cmd(
+                state, frame_start, disable_opengl=True, frame_stride=stride, video_info=self.video_info,
+                use_frame_store=state.use_frame_store
+            )
+            log_vid.info(f"FFMPEG executing command: {' '.join(cmd)}")
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            current_frame = frame_start
+            while not self.stopped:
+                if state.frame_end is not None and current_frame >= state.frame_end:
+                    break
+
+                buffer_index = self.frame_pool.acquire()
+                if buffer_index is None:
+                    continue  # All buffers are waiting for inference
+
+                if read_into(process.stdout, self.frame_pool.frames[buffer_index]) < frame_size:
+                    self.frame_pool.release(buffer_index)
+                    if current_frame == frame_start:
+                        error_output = process.stderr.read().decode('utf-8', errors='replace')
+                        log_vid.error(f"FFMPEG could not read frames from {self.video_path}\nFFMPEG ERROR:\n{error_output}")
+                        raise FFMpegError(f"FFMPEG could not read frames from {self.video_path}. See the log for details.")
+                    break
+
+                self.frames_q.put((self, current_frame, buffer_index))
+                current_frame += stride
+        except Exception as e:
+            self.error = e
+        finally:
+            if process:
+                process.terminate()
+                try:
+                    process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            self.frames_q.put((self, None, None))
+
+    def add_result(self, frame_pos, detections):
+        detections = self.tracker.update(detections)
+        frame_records = detections.to_records(frame_pos)
+
+        # Fill the frames that were skipped by strided detection
+        self.records.extend(self.interpolator.interpolate(frame_pos, frame_records))
+        self.records.extend(frame_records)
+        self.frames_processed += 1
+
+    def save(self):
+        # Fill the skipped frames after the last detected frame
+        self.records.extend(self.interpolator.flush(self.state.frame_end or self.video_info.total_frames))
+        check_create_output_folder(self.video_path)
+        path, _ = get_output_file_path(self.video_path, ".msgpack", "rawyolo")
+        save_yolo_data_to_path(path, self.records)
+
+    def stop(self):
+        self.stopped = True
+
+
+def analyze_videos_batched(state: AppState, video_paths: List[str], concurrent_videos=2):
+    """
+    Runs object detection on several videos with a single loaded model. Up to concurrent_videos videos are decoded
+    at the same time and their frames are packed into the same inference batches, which keeps the model busy when a
+    single video is decode bound. Every video keeps its own tracker, the raw yolo output is saved per video like
+    analyze_video does. Checkpoints, segments, scouting and the OpenGL reader are not supported in this mode.
+
+    :return: The paths of the videos that were analyzed successfully.
+    """
+    model = state.yolo_model
+    if model is None:
+        log_od.error(f"Could not load the YOLO model {state.yolo_model_path}")
+        return []
+    pending = list(video_paths)
+    concurrent_videos = max(1, min(concurrent_videos, len(pending)))
+    frame_budget_bytes = state.queue_memory_budget_mb * 1024 * 1024 // concurrent_videos
+    frames_q = queue.Queue()
+    active: List[BatchedVideo] = []
+    done = []
+    next_index = 0
+
+    def start_next_video():
+        nonlocal next_index
+        while pending:
+            video_path = pending.pop(0)
+            try:
+                video = BatchedVideo(state, next_index, video_path, frame_budget_bytes, frames_q)
+            except Exception as e:
+                log_od.error(f"Skipping {video_path}: {e}")
+                continue
+            next_index += 1
+            video.start()
+            active.append(video)
+            log_od.info(f"OBJECT DETECTION Started {video_path} ({len(active)} video(s) in the batch)")
+            return
+
+    batch = []
+
+    def finish_video(video):
+        active.remove(video)
+        if video.error:
+            log_od.error(f"OBJECT DETECTION Failed {video.video_path}: {video.error}")
+        else:
+            video.save()
+            done.append(video.video_path)
+            log_od.info(f"OBJECT DETECTION Finished {video.video_path} ({video.frames_processed} frames)")
+        start_next_video()
+
+    for _ in range(concurrent_videos):
+        start_next_video()
+
+    # A batch can't hold more frames than the decoders have buffers for, partial batches run on BATCH_FILL_TIMEOUT
+    frames_in_flight = sum(video.frame_pool.size for video in active)
+    sizer = AdaptiveBatchSizer(get_fixed_batch_size(model, state.yolo_model_path), max_size=max(YOLO_BATCH_SIZE, frames_in_flight // 2))
+
+    start_time = time.time()
+    try:
+        with tqdm(desc=f"Analyzing {len(video_paths)} videos", unit="f") as progress_bar:
+            def run_batch():
+                # Only engines compiled for a fixed batch are padded, with the last frame. Inference doesn't modify the
+                # frames. The onnxruntime engine pads fixed batch models itself
+                frames = [video.frame_pool.frames[buffer_index] for video, _, buffer_index in batch]
+                if sizer.is_fixed and not isinstance(model, OnnxYoloEngine):
+                    frames += [frames[-1]] * (sizer.size - len(frames))
+                start_ns = perf_counter_ns()
+                results = detect(model, frames)
+                sizer.record(len(batch), (perf_counter_ns() - start_ns) / 1e9, frames_q.qsize())
+                for (video, frame_pos, buffer_index), detections in zip(batch, results):
+                    video.add_result(frame_pos, detections)
+                    video.frame_pool.release(buffer_index)
+                progress_bar.update(len(batch))
+                batch.clear()
+
+            while active:
+                try:
+                    item = frames_q.get(timeout=BATCH_FILL_TIMEOUT)
+                except queue.Empty:
+                    # Decoders can't keep up, don't hold the frames back any longer
+                    if batch:
+                        run_batch()
+                    continue
+
+                video, frame_pos, _ = item
+                if frame_pos is None:
+                    # The frames of the ended video that are still in the batch must be tracked before it is saved
+                    if any(v is video for v, _, _ in batch):
+                        run_batch()
+                    finish_video(video)
+                    continue
+
+                batch.append(item)
+                if len(batch) >= sizer.size:
+                    run_batch()
+    finally:
+        for video in active:
+            video.stop()
+
+    log_od.info(f"OBJECT DETECTION Batching: {sizer.to_dict()}")
+    log_od.info(f"OBJECT DETECTION Batched run of {len(done)}/{len(video_paths)} video(s) done in {time.time() - start_time:.2f} s")
+    return done
+
+
+def has_raw_yolo_output(video_path):
+    path, _ = get_output_file_path(video_path, ".msgpack", "rawyolo")
+    return os.path.exists(path)
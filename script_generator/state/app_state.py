@@ -5,10 +5,12 @@ from tkinter import messagebox
 from typing import Literal, Optional, TYPE_CHECKING
 
 from script_generator.config.config_manager import ConfigManager
+from script_generator.constants import QUEUE_MEMORY_BUDGET_MB, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, YOLO_WARM_UP
 from script_generator.debug.debug_data import DebugData, get_metrics_file_info
 from script_generator.debug.logger import log
 from script_generator.funscript.util.check_existing_funscript import check_existing_funscript
-from script_generator.object_detection.util.data import load_yolo_model, get_raw_yolo_file_info
+from script_generator.object_detection.util.data import get_raw_yolo_file_info
+from script_generator.object_detection.util.model_loader import ModelLoader
 from script_generator.video.data_classes.video_info import VideoInfo, get_video_info
 
 if TYPE_CHECKING:
@@ -37,7 +39,17 @@ class AppState:
         self.video_path: string = None
         self.frame_start: int = 0
         self.frame_end: int | None = None
-        self.video_reader: Literal["FFmpeg", "FFmpeg + OpenGL (Windows)"] = "FFmpeg" # if is_mac() else "FFmpeg + OpenGL (Windows)"
+        self.video_reader: Literal["FFmpeg", "FFmpeg + OpenGL (Windows)", "FFmpeg + CPU remap", "PyAV"] = "FFmpeg" # if is_mac() else "FFmpeg + OpenGL (Windows)"
+        self.pipeline_mode: Literal["threads", "processes"] = "threads"
+        self.detection_segments: int = 1  # Number of frame ranges that are analyzed in parallel
+        self.queue_memory_budget_mb: int = QUEUE_MEMORY_BUDGET_MB
+        self.stage_replicas: dict[str, int] = {}  # Worker threads per pipeline stage, e.g. {"opengl": 2}
+        self.detection_stride: int = 1  # Run object detection on every n-th frame, the frames in between are interpolated
+        self.use_frame_store: bool = False  # Read the projected frames from the video's frame store, it's built on the first run
+        self.inference_engine: Literal["ultralytics", "onnxruntime"] = "ultralytics"
+        self.onnx_intra_op_threads: int = ONNX_INTRA_OP_THREADS
+        self.onnx_inter_op_threads: int = ONNX_INTER_OP_THREADS
+        self.scout_keyframes: bool = False  # Run object detection on the keyframes first and only analyze the relevant ranges
         self.copy_funscript_to_movie_dir = True
         self.copy_funscript_to_movie_dir = c.get("copy_funscript_to_movie_dir")
         self.funscript_output_dir = c.get("funscript_output_dir")
@@ -86,6 +98,7 @@ class AppState:
         # State
         self.video_info: VideoInfo | None = None
         self.analyze_task: AnalyzeVideoTask | None = None
+        self.segment_index: int | None = None  # Set when this process analyzes a single segment of the video
         self.has_raw_yolo = False
         self.has_tracking_data = False
         self.is_processing = False
@@ -94,7 +107,7 @@ class AppState:
         self.debug_data = DebugData(self)
         self.update_ui = None
         self.ffmpeg_hwaccel = c.get("ffmpeg_hwaccel")
-        self.yolo_model = load_yolo_model(self.yolo_model_path)
+        self.model_loader: ModelLoader | None = None  # The model is loaded when the detection needs it
 
     def set_is_cli(self, cli):
         self.is_cli = cli
@@ -102,9 +115,27 @@ class AppState:
     def set_root(self, root):
         self.root = root
 
-    def load_yolo(self):
-        if self.yolo_model_path and not self.yolo_model:
-            self.yolo_model = load_yolo_model(self.yolo_model_path)
+    @property
+    def yolo_model(self):
+        """
+        The detection model (ultralytics model or onnxruntime engine), loaded on first use. Waits for a load started
+        with load_yolo(). None when it can't be loaded.
+        """
+        return self.get_model_loader().get()
+
+    def load_yolo(self, warm_up=YOLO_WARM_UP):
+        """
+        Starts loading the detection model in the background.
+        """
+        if self.yolo_model_path:
+            self.get_model_loader().start(warm_up)
+
+    def get_model_loader(self):
+        key = (self.yolo_model_path, self.inference_engine, self.onnx_intra_op_threads, self.onnx_inter_op_threads)
+        # A changed model or engine setting needs another model
+        if self.model_loader is None or self.model_loader.key != key:
+            self.model_loader = ModelLoader(*key)
+        return self.model_loader
 
     def is_configured(self):
         message_prefix = "Cannot process the video."
@@ -113,7 +144,8 @@ class AppState:
             (self.ffprobe_path, f"{message_prefix} FFprobe is missing. Please provide the correct path."),
             (self.ffmpeg_path, f"{message_prefix} FFMPEG is missing. Please provide the correct path."),
             (self.yolo_model_path, f"{message_prefix} YOLO model path not set. Please make sure to download the YOLO model to the models directory and that the path under settings is correct."),
-            (self.yolo_model, f"{message_prefix} YOLO model is not loaded. Please make sure to download the YOLO model to the models directory."),
+            # Only checks the file, the model is loaded when the detection needs it
+            (self.yolo_model_path and os.path.exists(self.yolo_model_path), f"{message_prefix} YOLO model is not found. Please make sure to download the YOLO model to the models directory."),
         ]
 
         for path, error_message in checks:
@@ -1,18 +1,34 @@
+import multiprocessing
 import queue
 import time
 from dataclasses import dataclass, field
 from threading import Lock
 from typing import List, TYPE_CHECKING
 
-from script_generator.constants import QUEUE_MAXSIZE
+from script_generator.constants import SEQUENTIAL_MODE, YOLO_BATCH_SIZE, REMAP_WORKERS
+from script_generator.debug.pipeline_profile import PipelineProfiler
 from script_generator.tasks.data_classes.abstract_task import Task
+from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
 
+from script_generator.object_detection.workers.post_process_process_worker import PostProcessProcessWorker
 from script_generator.object_detection.workers.post_process_worker import PostProcessWorker
+from script_generator.object_detection.workers.tracking_worker import TrackingWorker
+from script_generator.object_detection.workers.yolo_process_worker import YoloProcessWorker
 from script_generator.object_detection.workers.yolo_worker import YoloWorker
+from script_generator.tasks.util.budgeted_queue import QueueBudget, get_queue_size
+from script_generator.tasks.util.pipeline_graph import PipelineGraph, ResultSink, Stage
+from script_generator.tasks.workers.process_result_collector import ProcessResultCollector
+from script_generator.debug.logger import log
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.util.decode_chunks import create_decode_scheduler
+from script_generator.video.util.frame_buffers import FrameBufferPool, SharedFrameSlab, frames_for_budget
+from script_generator.video.workers.ffmpeg_process_worker import VideoProcessWorker
 from script_generator.video.workers.ffmpeg_worker import VideoWorker
+from script_generator.video.workers.vr_to_2d_remap_worker import VrTo2DRemapWorker
 from script_generator.video.workers.vr_to_2d_worker import VrTo2DWorker
 
 if TYPE_CHECKING:
+    from script_generator.object_detection.util.checkpoint import YoloCheckpoint
     from script_generator.state.app_state import AppState
 
 
@@ -20,27 +36,150 @@ if TYPE_CHECKING:
 class AnalyzeVideoTask(Task):
     tasks: List[Task] = field(default_factory=list)
 
-    def __init__(self, state: "AppState", use_open_gl):
+    def __init__(self, state: "AppState", use_open_gl, use_processes=False, checkpoint: "YoloCheckpoint" = None, use_remap=False):
         super().__init__()
         self.tasks = []
         self._lock = Lock()
-        self.profile = {}
         self.start_time = time.time()
-        self.opengl_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.yolo_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.analysis_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.result_q = queue.Queue(maxsize=0)
+        self.result_sink = ResultSink()
         self.use_open_gl = use_open_gl
+        self.use_remap = use_remap
+        self.use_processes = use_processes
         self.is_stopped = False
+        self.slab = None
+        self.frame_pool = None
+        self.queue_budget = None
+        self.collector_thread = None
+        self.graph = None
+        self.decode_scheduler = None
+        self.profiler = PipelineProfiler()
+        self.checkpoint = checkpoint
 
-        # Create threads
-        self.decode_thread = VideoWorker(state=state, output_queue=self.opengl_q if use_open_gl else self.yolo_q)
-        self.opengl_thread = VrTo2DWorker(state=state, input_queue=self.opengl_q, output_queue=self.yolo_q) if use_open_gl else None
-        self.yolo_thread = YoloWorker(state=state, input_queue=self.yolo_q, output_queue=self.analysis_q)
-        self.yolo_analysis_thread = PostProcessWorker(state=state, input_queue=self.analysis_q, output_queue=self.result_q)
+        width, height = get_cropped_dimensions(state.video_info)
+        budget_bytes = state.queue_memory_budget_mb * 1024 * 1024
+        # Frames held by the workers themselves (e.g. a YOLO batch) need a buffer as well
+        pool_size = frames_for_budget(budget_bytes, (height, width, 3), min_frames=YOLO_BATCH_SIZE * 2)
+
+        if use_processes:
+            self._create_processes(state, pool_size)
+        else:
+            self.frame_pool = FrameBufferPool(pool_size, (height, width, 3))
+            self._create_threads(state, budget_bytes, pool_size)
 
         state.analyze_task = self
 
+    def _create_threads(self, state: "AppState", budget_bytes, pool_size):
+        stages = [Stage("decode", VideoWorker)]
+        if self.use_open_gl:
+            stages.append(Stage("opengl", VrTo2DWorker, queue_name=str(TaskProcessorTypes.OPENGL)))
+        if self.use_remap:
+            stages.append(Stage("remap", VrTo2DRemapWorker, replicas=REMAP_WORKERS, queue_name=str(TaskProcessorTypes.REMAP)))
+        stages.append(Stage("yolo", YoloWorker, queue_name=str(TaskProcessorTypes.YOLO)))
+        # The tracker and the records (interpolation, checkpoints) need the frames in order
+        stages.append(Stage("tracking", TrackingWorker, ordered=True, queue_name=str(TaskProcessorTypes.TRACKING)))
+        stages.append(Stage("analysis", PostProcessWorker, ordered=True, queue_name=str(TaskProcessorTypes.YOLO_ANALYSIS)))
+        for stage in stages:
+            stage.replicas = state.stage_replicas.get(stage.name, stage.replicas)
+        if stages[0].replicas > 1 and state.video_reader == "PyAV":
+            log.warn("Parallel decoding is only supported with the FFmpeg readers, running a single decoder")
+            stages[0].replicas = 1
+        self.graph = PipelineGraph(state, stages)
+
+        if SEQUENTIAL_MODE:
+            # Every stage runs to completion before the next one starts, only the pool bounds the memory
+            create_queue = lambda stage: queue.Queue()
+        else:
+            # Queues are named after their consumer and created in pipeline order
+            self.queue_budget = QueueBudget(budget_bytes)
+            create_queue = lambda stage: self.queue_budget.create_queue(stage.queue_name)
+
+        # Frames held back by a reorder buffer keep their frame buffer, leave enough for the producers to go on
+        max_pending = pool_size // 2
+        self.graph.build(create_queue, self.result_sink, first_key=state.frame_start or 0, step=state.detection_stride, max_pending=max_pending, on_drop=self.release_frame)
+
+        decoders = len(self.graph.get_workers("decode"))
+        if decoders > 1:
+            self.decode_scheduler = create_decode_scheduler(state, decoders, max_pending)
+
+        channels = self.graph.channels
+        self.opengl_q = channels.get("opengl", queue.Queue())
+        self.remap_q = channels.get("remap", queue.Queue())
+        self.yolo_q = channels["yolo"]
+        self.tracking_q = channels["tracking"]
+        self.analysis_q = channels["analysis"]
+
+        self.decode_thread = self.graph.get_workers("decode")[0]
+        self.opengl_thread = next(iter(self.graph.get_workers("opengl")), None)
+        self.yolo_thread = self.graph.get_workers("yolo")[0]
+        self.yolo_analysis_thread = self.graph.get_workers("analysis")[0]
+
+    def _create_processes(self, state: "AppState", slots):
+        # Spawn on all platforms, forking a process that already initialized CUDA or ffmpeg pipes is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        width, height = get_cropped_dimensions(state.video_info)
+        self.slab = SharedFrameSlab(ctx, slots, (height, width, 3))
+
+        # Queues only carry small frame descriptors, the number of frames in flight is bounded by the slab
+        self.opengl_q = queue.Queue()  # Unused, OpenGL is not supported in process mode
+        self.remap_q = queue.Queue()  # Unused, FFmpeg projects the frames in process mode
+        self.yolo_q = ctx.Queue()
+        self.tracking_q = queue.Queue()  # Unused, the analysis process tracks the detections in process mode
+        self.analysis_q = ctx.Queue()
+        self.process_result_q = ctx.Queue()
+
+        # Create processes
+        failed_event = ctx.Event()
+        self.decode_thread = VideoProcessWorker(state=state, ctx=ctx, slab=self.slab, output_queue=self.yolo_q, failed_event=failed_event)
+        self.opengl_thread = None
+        self.yolo_thread = YoloProcessWorker(state=state, ctx=ctx, slab=self.slab, input_queue=self.yolo_q, output_queue=self.analysis_q, failed_event=failed_event)
+        self.yolo_analysis_thread = PostProcessProcessWorker(state=state, ctx=ctx, input_queue=self.analysis_q, output_queue=self.process_result_q, failed_event=failed_event)
+        self.collector_thread = ProcessResultCollector(state=state, input_queue=self.process_result_q, output_queue=self.result_sink)
+
+    def get_workers(self):
+        if self.use_processes:
+            return [self.decode_thread, self.yolo_thread, self.yolo_analysis_thread, self.collector_thread]
+        return self.graph.get_workers()
+
+    def has_failed(self):
+        """
+        Whether a worker raised, the remaining workers still receive a sentinel and finish as if the video ended.
+        """
+        return any(worker is not None and worker.exception for worker in self.get_workers())
+
+    def get_queue_depths(self):
+        """
+        :return: {queue name: number of queued frames} for the queues that are in use.
+        """
+        depths = {}
+        if self.use_open_gl:
+            depths[str(TaskProcessorTypes.OPENGL)] = get_queue_size(self.opengl_q)
+        if self.use_remap:
+            depths[str(TaskProcessorTypes.REMAP)] = get_queue_size(self.remap_q)
+        depths[str(TaskProcessorTypes.YOLO)] = get_queue_size(self.yolo_q)
+        if not self.use_processes:
+            depths[str(TaskProcessorTypes.TRACKING)] = get_queue_size(self.tracking_q)
+        depths[str(TaskProcessorTypes.YOLO_ANALYSIS)] = get_queue_size(self.analysis_q)
+        return depths
+
+    def get_queue_stats(self):
+        """
+        :return: Share, peak usage and blocked put/get time per queue, empty when the queues aren't budgeted.
+        """
+        return self.queue_budget.get_stats() if self.queue_budget else {}
+
+    def release_frame(self, task):
+        """
+        Hands the buffer backing the task's frame back to the frame pool, call once the frame is no longer used.
+        """
+        if self.frame_pool and task.buffer_index is not None:
+            self.frame_pool.release(task.buffer_index)
+            task.buffer_index = None
+
+    def release(self):
+        if self.slab:
+            self.slab.close()
+            self.slab = None
+
     def add_task(self, task: Task) -> Task:
         with self._lock:
             self.tasks.append(task)
@@ -52,11 +191,12 @@ class AnalyzeVideoTask(Task):
 
     def stop(self):
         self.is_stopped = True
-        if self.decode_thread:
-            self.decode_thread.release()
-        if self.opengl_thread and self.use_open_gl:
-            self.opengl_thread.stop_process()
-        if self.yolo_thread:
-            self.yolo_thread.stop_process()
-        if self.yolo_analysis_thread:
-            self.yolo_analysis_thread.stop_process()
\ No newline at end of file
+        if self.graph:
+            self.graph.close()
+        decoders = self.graph.get_workers("decode") if self.graph else [self.decode_thread]
+        for worker in self.get_workers():
+            if worker in decoders:
+                worker.release()
+            else:
+                worker.stop_process()
+
@@ -0,0 +1,233 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from script_generator.debug.logger import log
+
+MIN_SHARE = 0.1  # Every queue keeps at least this fraction of the budget, so a fast stage can't be starved of room
+REBALANCE_INTERVAL = 1.0  # Seconds between two share adjustments
+RATE_SMOOTHING = 0.3  # Weight of the newest measurement in the moving average of the per item service time
+
+
+def get_queue_size(q):
+    try:
+        return q.qsize()
+    except NotImplementedError:
+        # multiprocessing queues don't implement qsize on macOS
+        return 0
+
+
+def frame_nbytes(task):
+    """
+    Default size of a queued item, the raw frames it holds. A sentinel (None) costs nothing.
+    """
+    if task is None:
+        return 0
+
+    nbytes = 0
+    seen = set()
+    for frame in (task.preprocessed_frame, task.rendered_frame):
+        if isinstance(frame, np.ndarray) and id(frame) not in seen:
+            seen.add(id(frame))
+            nbytes += frame.nbytes
+    return nbytes
+
+
+class QueueBudget:
+    def __init__(self, budget_bytes):
+        """
+        Memory budget shared by the queues between the pipeline stages. Each queue gets a share in bytes that follows
+        the measured speed of its consumer: the slowest stage gets the most room to buffer, stages that keep up get
+        little. A producer blocks once its output queue is over its share.
+
+        :param budget_bytes: Total number of bytes the queued frames may use.
+        """
+        self.budget_bytes = budget_bytes
+        self.queues = []
+        self._lock = threading.Lock()
+        self._last_rebalance = time.perf_counter()
+
+    def create_queue(self, name, sizeof=frame_nbytes) -> "BudgetedQueue":
+        """
+        Register the next queue of the pipeline, queues must be created in pipeline order so the consumer of a queue is
+        the producer of the next one.
+        """
+        with self._lock:
+            q = BudgetedQueue(name, self, sizeof)
+            self.queues.append(q)
+            share = self.budget_bytes // len(self.queues)
+            for registered in self.queues:
+                registered.set_capacity(share)
+            return q
+
+    def maybe_rebalance(self):
+        now = time.perf_counter()
+        if now - self._last_rebalance < REBALANCE_INTERVAL or not self._lock.acquire(blocking=False):
+            return
+        try:
+            elapsed = now - self._last_rebalance
+            self._last_rebalance = now
+            self._rebalance(elapsed)
+        finally:
+            self._lock.release()
+
+    def _rebalance(self, elapsed):
+        for i, q in enumerate(self.queues):
+            downstream = self.queues[i + 1] if i + 1 < len(self.queues) else None
+            gets, blocked_get = q.take_consumer_window()
+            blocked_put = downstream.peek_blocked_put() if downstream else 0.0
+
+            # Time the consumer actually spent working, waiting on empty input or a full output isn't its cost
+            busy = max(0.0, elapsed - blocked_get - blocked_put)
+            if gets > 0:
+                service_time = busy / gets
+                q.service_time = service_time if q.service_time is None else (
+                    RATE_SMOOTHING * service_time + (1 - RATE_SMOOTHING) * q.service_time
+                )
+
+        for q in self.queues:
+            q.commit_blocked_put()
+
+        service_times = [q.service_time for q in self.queues]
+        if any(t is None for t in service_times) or sum(service_times) <= 0:
+            return  # Not every consumer has processed an item yet
+
+        total = sum(service_times)
+        floor = min(MIN_SHARE, 1 / len(self.queues))
+        variable = 1 - floor * len(self.queues)
+        for q, service_time in zip(self.queues, service_times):
+            q.set_capacity(int(self.budget_bytes * (floor + variable * service_time / total)))
+
+        log.debug("Queue shares: " + ", ".join(f"{q.name} {q.capacity / 2**20:.0f} MB" for q in self.queues))
+
+    def get_stats(self):
+        """
+        :return: {queue name: stats} with the share, peak usage and the time spent blocked on put and get in seconds.
+        """
+        return {q.name: q.get_stats() for q in self.queues}
+
+
+class BudgetedQueue(queue.Queue):
+    def __init__(self, name, budget: QueueBudget, sizeof=frame_nbytes):
+        """
+        Queue bounded by a number of bytes instead of a number of items. Tracks the time producers spend blocked on a
+        full queue (backpressure) and consumers spend blocked on an empty one (starvation).
+
+        :param name: Name used in the stats, usually the consuming stage.
+        :param budget: Budget the capacity of this queue is a share of.
+        :param sizeof: Returns the size in bytes of an item.
+        """
+        super().__init__(maxsize=0)
+        self.name = name
+        self.budget = budget
+        self.sizeof = sizeof
+        self.capacity = budget.budget_bytes
+        self.nbytes = 0
+        self.peak_nbytes = 0
+        self.service_time = None
+        self.blocked_put_time = 0.0
+        self.blocked_get_time = 0.0
+        self.total_gets = 0
+        self._window_gets = 0
+        self._window_blocked_get = 0.0
+        self._window_blocked_put = 0.0
+        self._sizes = deque()
+
+    def set_capacity(self, capacity):
+        with self.mutex:
+            grew = capacity > self.capacity
+            self.capacity = capacity
+            if grew:
+                self.not_full.notify_all()
+
+    def put(self, item, block=True, timeout=None):
+        nbytes = self.sizeof(item)
+        with self.not_full:
+            blocked_since = None
+            # An empty queue always accepts an item, so a single frame larger than the share can't deadlock the pipeline
+            while self.nbytes > 0 and nbytes > 0 and self.nbytes + nbytes > self.capacity:
+                if blocked_since is None:
+                    blocked_since = time.perf_counter()
+                if not block:
+                    raise queue.Full
+                remaining = None if timeout is None else timeout - (time.perf_counter() - blocked_since)
+                if remaining is not None and remaining <= 0:
+                    self._add_blocked_put(time.perf_counter() - blocked_since)
+                    raise queue.Full
+                self.not_full.wait(remaining)
+
+            if blocked_since is not None:
+                self._add_blocked_put(time.perf_counter() - blocked_since)
+
+            self._put(item)
+            self._sizes.append(nbytes)
+            self.nbytes += nbytes
+            self.peak_nbytes = max(self.peak_nbytes, self.nbytes)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        with self.not_empty:
+            blocked_since = None
+            while not self._qsize():
+                if blocked_since is None:
+                    blocked_since = time.perf_counter()
+                if not block:
+                    raise queue.Empty
+                remaining = None if timeout is None else timeout - (time.perf_counter() - blocked_since)
+                if remaining is not None and remaining <= 0:
+                    self._add_blocked_get(time.perf_counter() - blocked_since)
+                    raise queue.Empty
+                self.not_empty.wait(remaining)
+
+            if blocked_since is not None:
+                self._add_blocked_get(time.perf_counter() - blocked_since)
+
+            item = self._get()
+            self.nbytes -= self._sizes.popleft()
+            self.total_gets += 1
+            self._window_gets += 1
+            # Room is measured in bytes, the freed space might fit more than one waiting producer
+            self.not_full.notify_all()
+
+        self.budget.maybe_rebalance()
+        return item
+
+    def _add_blocked_put(self, seconds):
+        self.blocked_put_time += seconds
+        self._window_blocked_put += seconds
+
+    def _add_blocked_get(self, seconds):
+        self.blocked_get_time += seconds
+        self._window_blocked_get += seconds
+
+    def take_consumer_window(self):
+        """
+        :return: Items taken and seconds blocked on get since the previous call.
+        """
+        with self.mutex:
+            window = self._window_gets, self._window_blocked_get
+            self._window_gets = 0
+            self._window_blocked_get = 0.0
+            return window
+
+    def peek_blocked_put(self):
+        with self.mutex:
+            return self._window_blocked_put
+
+    def commit_blocked_put(self):
+        with self.mutex:
+            self._window_blocked_put = 0.0
+
+    def get_stats(self):
+        with self.mutex:
+            return {
+                "share_mb": self.capacity / 2**20,
+                "peak_mb": self.peak_nbytes / 2**20,
+                "blocked_put_s": self.blocked_put_time,
+                "blocked_get_s": self.blocked_get_time,
+                "items": self.total_gets,
+            }
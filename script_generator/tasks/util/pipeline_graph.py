@@ -0,0 +1,264 @@
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Type, TYPE_CHECKING
+
+from script_generator.debug.logger import log
+
+if TYPE_CHECKING:
+    from script_generator.state.app_state import AppState
+    from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor
+
+
+class StageChannel:
+    def __init__(self, inner: queue.Queue, producers=1, consumers=1):
+        """
+        Queue between two stages of the graph. Every producer replica ends with a sentinel (None), the channel only
+        passes the end on once all producers are done and then hands every consumer replica its own sentinel.
+
+        :param inner: Queue holding the items, e.g. a BudgetedQueue.
+        """
+        self.inner = inner
+        self.producers = producers
+        self.consumers = consumers
+        self.closed = False
+        self._producers_done = 0
+        self._lock = threading.Lock()
+
+    def put(self, item, block=True, timeout=None):
+        if item is None:
+            with self._lock:
+                self._producers_done += 1
+                if self._producers_done != self.producers:
+                    return
+                remaining = self._take_remaining()
+            for remaining_item in remaining:
+                self._forward(remaining_item)
+            for _ in range(self.consumers):
+                self.inner.put(None)
+            return
+
+        self.inner.put(item, block, timeout)
+
+    def _take_remaining(self):
+        """
+        :return: Items still held by the channel once all producers are done, they're passed on before the end.
+        """
+        return []
+
+    def _forward(self, item):
+        """
+        Blocking put that gives up once the channel is closed, so a stopped consumer can't hang a producer.
+        """
+        while True:
+            try:
+                self.inner.put(item, timeout=1)
+                return
+            except queue.Full:
+                if self.closed:
+                    return
+
+    def get(self, block=True, timeout=None):
+        return self.inner.get(block, timeout)
+
+    def task_done(self):
+        self.inner.task_done()
+
+    def qsize(self):
+        return self.inner.qsize()
+
+    def close(self):
+        self.closed = True
+
+
+class ReorderChannel(StageChannel):
+    def __init__(self, inner: queue.Queue, producers, consumers, first_key, step=1, max_pending=64, key=lambda task: task.frame_pos, on_drop=None):
+        """
+        Channel that reassembles the output of replicated producers in frame order, for consumers that depend on it
+        (e.g. the tracker). Items are held back until all the items before them have arrived.
+
+        :param first_key: Key of the first item, e.g. the first frame position.
+        :param step: Distance between two consecutive keys, e.g. the detection stride.
+        :param max_pending: When more items are held back, the missing item is assumed lost and skipped. Keep it below
+        the number of frame buffers or the producers run out of buffers waiting for it.
+        :param on_drop: Called with an item that arrives after it was skipped, e.g. to release its frame buffer. It
+        can't be passed on anymore as the consumer already went past it.
+        """
+        super().__init__(inner, producers, consumers)
+        self.key = key
+        self.step = step
+        self.max_pending = max_pending
+        self.on_drop = on_drop
+        self._next = first_key
+        self._pending = {}
+        self._draining = False  # A producer is passing the ready items on, only one at a time to keep them in order
+
+    def put(self, item, block=True, timeout=None):
+        if item is None:
+            super().put(item, block, timeout)
+            return
+
+        with self._lock:
+            item_key = self.key(item)
+            if item_key < self._next:
+                late = True
+            else:
+                late = False
+                self._pending[item_key] = item
+                if len(self._pending) > self.max_pending and self._next not in self._pending:
+                    skip_to = min(self._pending)
+                    log.warn(f"Reorder buffer skips missing frame(s) {self._next} to {skip_to - self.step}")
+                    self._next = skip_to
+
+            # While another producer is draining it passes the item on
+            ready = None if late or self._draining else self._take_ready()
+            if ready:
+                self._draining = True
+
+        if late:
+            log.warn(f"Reorder buffer drops frame {item_key} that arrived after it was skipped")
+            if self.on_drop:
+                self.on_drop(item)
+            return
+
+        # The blocking puts happen outside the lock, the other producers can keep adding their items meanwhile
+        try:
+            while ready:
+                for ready_item in ready:
+                    self._forward(ready_item)
+                with self._lock:
+                    ready = self._take_ready()
+                    if not ready:
+                        self._draining = False
+        except BaseException:
+            with self._lock:
+                self._draining = False
+            raise
+
+    def _take_ready(self):
+        """
+        Removes the items that are next in order from the pending items, call with the lock held.
+        """
+        ready = []
+        while self._next in self._pending:
+            ready.append(self._pending.pop(self._next))
+            self._next += self.step
+        return ready
+
+    def _take_remaining(self):
+        # All producers are done, whatever is still missing won't arrive anymore
+        remaining = [self._pending[item_key] for item_key in sorted(self._pending)]
+        self._pending.clear()
+        return remaining
+
+    def qsize(self):
+        return self.inner.qsize() + len(self._pending)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._pending.clear()
+
+
+class ResultSink:
+    def __init__(self):
+        """
+        Output of the last stage. The last stage records a finished frame in the run statistics (PipelineProfiler)
+        before handing it over, so the sink only counts it and drops it. Keeping the tasks alive until the end of
+        the run would grow the memory with the length of the video.
+        """
+        self.count = 0
+        self.finished = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        if item is None:
+            self.finished.set()
+            return
+        self.count += 1  # Only the single last stage worker puts, no lock needed
+
+    def qsize(self):
+        """
+        :return: Number of frames that went through the whole pipeline.
+        """
+        return self.count
+
+
+@dataclass
+class Stage:
+    """
+    Declaration of a pipeline stage.
+
+    :param name: Short name, used to configure the replicas (e.g. "opengl").
+    :param worker_class: AbstractTaskProcessor subclass, replicas are only created when it sets supports_replicas.
+    :param replicas: Number of worker threads consuming the stage's input queue.
+    :param ordered: The stage needs its input in frame order, replicated producers get a reorder buffer in between.
+    :param queue_name: Name of the stage's input queue (e.g. in the queue stats).
+    """
+    name: str
+    worker_class: Type["AbstractTaskProcessor"]
+    replicas: int = 1
+    ordered: bool = False
+    queue_name: Optional[str] = None
+
+
+class PipelineGraph:
+    def __init__(self, state: "AppState", stages: List[Stage]):
+        """
+        Linear chain of stages, the first stage produces the frames and the last one feeds the results queue.
+        """
+        self.state = state
+        self.stages = stages
+        self.channels = {}
+        self.workers = {}
+
+        for stage in stages:
+            if stage.replicas > 1 and not getattr(stage.worker_class, "supports_replicas", False):
+                log.warn(f"Stage {stage.name} can't be replicated, running a single worker")
+                stage.replicas = 1
+
+    def build(self, create_queue: Callable[[Stage], queue.Queue], output_queue, first_key, step=1, max_pending=64, on_drop=None):
+        """
+        Creates the channels and the worker threads.
+
+        :param create_queue: Creates the queue in front of a stage, called in pipeline order.
+        :param output_queue: Queue the last stage produces the results to.
+        :param first_key: First frame position, for the reorder buffers.
+        :param step: Distance between two frame positions, for the reorder buffers.
+        :param on_drop: Called with the items a reorder buffer drops, see ReorderChannel.
+        """
+        # A replicated stage (e.g. parallel decoders) mixes up the order, until a reorder buffer restores it
+        in_order = self.stages[0].replicas == 1
+        for previous, stage in zip(self.stages, self.stages[1:]):
+            inner = create_queue(stage)
+            if stage.ordered and not in_order:
+                channel = ReorderChannel(inner, previous.replicas, stage.replicas, first_key, step, max_pending, on_drop=on_drop)
+                in_order = True
+            else:
+                channel = StageChannel(inner, previous.replicas, stage.replicas)
+            in_order = in_order and stage.replicas == 1
+            self.channels[stage.name] = channel
+
+        for i, stage in enumerate(self.stages):
+            input_queue = self.channels.get(stage.name)
+            next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            stage_output = self.channels[next_stage.name] if next_stage else output_queue
+
+            replicas = []
+            for replica in range(stage.replicas):
+                if input_queue is None:
+                    worker = stage.worker_class(state=self.state, output_queue=stage_output)
+                else:
+                    worker = stage.worker_class(state=self.state, input_queue=input_queue, output_queue=stage_output)
+                if stage.replicas > 1:
+                    worker.name = f"{worker.name}-{stage.name}-{replica}"
+                replicas.append(worker)
+            self.workers[stage.name] = replicas
+
+    def get_workers(self, stage_name=None):
+        if stage_name:
+            return self.workers.get(stage_name, [])
+        return [worker for stage in self.stages for worker in self.workers[stage.name]]
+
+    def close(self):
+        for channel in self.channels.values():
+            channel.close()
@@ -0,0 +1,97 @@
+import queue
+import traceback
+from typing import Optional, TYPE_CHECKING
+
+from script_generator.debug.logger import log
+
+if TYPE_CHECKING:
+    from script_generator.state.app_state import AppState
+
+
+def _run_stage(stage_logic, args, output_queue, stop_event, error_queue, failed_event):
+    """
+    Child process entry point. Runs the stage and forwards any exception to the parent.
+    """
+    try:
+        stage_logic(*args, output_queue, stop_event)
+    except Exception as e:
+        error_queue.put(f"{e.__class__.__name__}: {e}")
+        failed_event.set()
+        log.error(f"An error occurred during stage execution in process: {e}")
+        traceback.print_exc()
+        # Propagate sentinel to the output queue so downstream stages finish
+        output_queue.put(None)
+
+
+class AbstractProcessWorker:
+
+    process_type = ""
+
+    def __init__(self, state: "AppState", ctx, output_queue, input_queue: Optional[object] = None, failed_event=None):
+        """
+        Parent side handle of a pipeline stage that runs in its own process. Exposes the same lifecycle as
+        AbstractTaskProcessor (start, join, check_exception, stop_process) so the pipeline can drive threads and
+        processes alike. Everything passed to the child must be picklable, the AppState is not.
+
+        :param ctx: Multiprocessing context to create the process with.
+        :param input_queue: Multiprocessing queue to consume frame descriptors from.
+        :param output_queue: Multiprocessing queue to produce frame descriptors to.
+        :param failed_event: Event set when a stage fails, share it between the stages of a pipeline so downstream
+        stages can tell a failed run from a finished one (both end with a sentinel).
+        """
+        self.state = state
+        self.ctx = ctx
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self._stop_event = ctx.Event()
+        self._error_queue = ctx.Queue()
+        self.failed_event = failed_event or ctx.Event()
+        self.process = None
+        self.exception = None
+
+    def stage_args(self) -> tuple:
+        """
+        Picklable arguments passed to stage_logic in the child process (output queue and stop event are appended).
+        """
+        raise NotImplementedError("Subclasses must implement stage_args")
+
+    @staticmethod
+    def stage_logic(*args):
+        """
+        Stage implementation, runs in the child process.
+        """
+        raise NotImplementedError("Subclasses must implement stage_logic")
+
+    def start(self):
+        self.state.analyze_task.start(self.process_type)
+        self.process = self.ctx.Process(
+            target=_run_stage,
+            args=(type(self).stage_logic, self.stage_args(), self.output_queue, self._stop_event, self._error_queue, self.failed_event),
+            name=f"{self.__class__.__name__}",
+            daemon=True
+        )
+        self.process.start()
+
+    def join(self, timeout=None):
+        if self.process:
+            self.process.join(timeout)
+            if not self.process.is_alive():
+                self.state.analyze_task.end(self.process_type)
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def stop_process(self):
+        self._stop_event.set()
+
+    def check_exception(self):
+        """
+        Raises the exception that occurred in the child process in the calling context.
+        """
+        try:
+            self.exception = RuntimeError(self._error_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if self.exception:
+            raise self.exception
@@ -11,6 +11,8 @@ if TYPE_CHECKING:
 class AbstractTaskProcessor(threading.Thread):
 
     process_type = ""
+    stage_id = None  # Index into the timing arrays of the frame tasks, for the stages that handle frames
+    supports_replicas = False  # Whether several threads can run this stage on the same input queue
 
     def __init__(self, state: "AppState", output_queue: queue.Queue, input_queue: Optional[queue.Queue] = None):
         """
@@ -69,7 +71,7 @@ class AbstractTaskProcessor(threading.Thread):
                 self.output_queue.put(task, timeout=1)
                 break
             except queue.Full:
-                return
+                continue  # Backpressure, retry until the consumer makes room or the thread is stopped
 
     def run(self):
         """
@@ -117,7 +119,9 @@ class TaskProcessorTypes(Enum):
     VIDEO = "Video processing"
     OPENGL = "3D to 2D"
     METAL = "3D to 2D (MPS)"
+    REMAP = "3D to 2D (remap)"
     YOLO = "YOLO inference"
+    TRACKING = "Tracking"
     YOLO_ANALYSIS = "YOLO analysis"
 
     def __str__(self):
@@ -0,0 +1,30 @@
+import queue
+import time
+
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor
+
+
+class ProcessResultCollector(AbstractTaskProcessor):
+    """
+    Runs in the parent process and records the frame timings coming out of the last process stage in the run
+    statistics, so progress and performance logging work the same as in the threaded pipeline.
+    """
+    process_type = "Process results"
+
+    def task_logic(self):
+        while not self._stop_event.is_set():
+            try:
+                descriptor = self.input_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if descriptor is None:
+                self.state.analyze_task.end_time = time.time()
+                break
+
+            frame_pos, durations, entered_ns = descriptor
+            self.state.analyze_task.profiler.record_task(durations, entered_ns)
+            self.output_queue.put(frame_pos)
+
+    def stop_process(self):
+        self._stop_event.set()
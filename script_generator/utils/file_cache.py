@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+import threading
+
+from script_generator.debug.logger import log
+
+
+class FileKeyedCache:
+    def __init__(self, path, version):
+        """
+        Directory of json files that map files to values derived from them (e.g. probe results). An entry is keyed by
+        the absolute path of the file and only valid while the file has the same size and modification time. Every
+        entry has its own file that is replaced atomically, so the processes sharing the cache never rewrite each
+        other's entries and a write costs the same no matter how many entries there are.
+
+        :param path: Cache directory path.
+        :param version: Entries written with another version are ignored.
+        """
+        self.path = path
+        self.version = version
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.path, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, file_path):
+        """
+        :return: The cached value or None when the file is unknown or changed.
+        """
+        if not os.path.isfile(file_path):
+            return None
+
+        key = os.path.abspath(file_path)
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning(f"Ignoring unreadable cache entry {entry_path}: {e}")
+            return None
+
+        stat = os.stat(file_path)
+        if (
+            entry.get("version") != self.version or entry.get("key") != key
+            or entry["size_bytes"] != stat.st_size or entry["mtime"] != stat.st_mtime
+        ):
+            return None
+        return entry["value"]
+
+    def put(self, file_path, value):
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        entry = {"version": self.version, "key": key, "size_bytes": stat.st_size, "mtime": stat.st_mtime, "value": value}
+
+        entry_path = self._get_entry_path(key)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            log.warning(f"Could not write the cache entry {entry_path}: {e}")
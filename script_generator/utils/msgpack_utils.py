@@ -25,13 +25,48 @@ def load_msgpack_json(output_path):
 def save_msgpack_json(path, data):
     start_time = time.time()
     try:
-        with open(path, "wb") as f:
+        # Write to a temporary file first so a crash while writing never leaves a truncated file behind
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
             f.write(msgpack.packb(data, use_bin_type=True, default=_default_serializer))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
         log.info(f"Data saved to msgpack in {(time.time() - start_time) * 1000}ms: {path}")
     except Exception as e:
         log.error(f"Failed to save to msgpack: {e}")
         raise
 
+def append_msgpack_objects(path, objects, replace=False):
+    """
+    Appends the objects to a stream of msgpack objects, read it back with load_msgpack_objects.
+    :param replace: Start a new stream instead of appending. It's written to a temporary file first and replaces the
+                    file once complete, so a crash while writing keeps the previous stream.
+    """
+    write_path = f"{path}.tmp" if replace else path
+    with open(write_path, "wb" if replace else "ab") as f:
+        for obj in objects:
+            f.write(msgpack.packb(obj, use_bin_type=True, default=_default_serializer))
+        f.flush()
+        os.fsync(f.fileno())
+    if replace:
+        os.replace(write_path, path)
+
+def load_msgpack_objects(path):
+    """
+    :return: (objects of the stream, whether the stream is complete). A crash while appending leaves an incomplete
+             object at the end, it's left out.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+    unpacker.feed(data)
+    objects, end = [], 0
+    for obj in unpacker:
+        objects.append(obj)
+        end = unpacker.tell()
+    return objects, end == len(data)
+
 def _default_serializer(obj):
     if isinstance(obj, np.integer):
         return int(obj)
@@ -1,15 +1,62 @@
-from dataclasses import dataclass
+from array import array
+from time import perf_counter_ns
 from typing import Optional
 
 import numpy as np
 
-from script_generator.tasks.data_classes.abstract_task import Task
+from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
 
+# Stage ids index the timing arrays of a frame task
+STAGE_VIDEO = 0
+STAGE_OPENGL = 1
+STAGE_YOLO = 2
+STAGE_YOLO_ANALYSIS = 3
+STAGE_REMAP = 4
+STAGE_TRACKING = 5
+STAGE_NAMES = (
+    str(TaskProcessorTypes.VIDEO),
+    str(TaskProcessorTypes.OPENGL),
+    str(TaskProcessorTypes.YOLO),
+    str(TaskProcessorTypes.YOLO_ANALYSIS),
+    str(TaskProcessorTypes.REMAP),
+    str(TaskProcessorTypes.TRACKING),
+)
+STAGE_COUNT = len(STAGE_NAMES)
 
-@dataclass
-class AnalyzeFrameTask(Task):
-    frame_pos: int = -1
-    preprocessed_frame: Optional[np.ndarray] = None  # Cropped frame from video stream
-    rendered_frame: Optional[np.ndarray] = None  # The final 2D image from OpenGL
-    yolo_results = None
-    # detections: List[Detection] = field(default_factory=list) # YOLO detection results
\ No newline at end of file
+_EMPTY_TIMINGS = array("q", [0] * STAGE_COUNT)
+
+
+def new_timings():
+    """
+    Fixed size array with a perf_counter_ns value (or 0 when not set) per stage id.
+    """
+    return array("q", _EMPTY_TIMINGS)
+
+
+class AnalyzeFrameTask:
+    """
+    A single frame on its way through the pipeline. Kept small as one is created for every frame: no locks (a frame
+    is only handled by one stage at a time), the id is assigned by the decoder and timings are stored per stage id.
+    """
+    __slots__ = ("id", "frame_pos", "preprocessed_frame", "rendered_frame", "buffer_index", "yolo_results", "starts", "ends", "durations")
+
+    def __init__(self, frame_pos: int = -1, task_id: int = -1):
+        self.id = task_id
+        self.frame_pos = frame_pos
+        self.preprocessed_frame: Optional[np.ndarray] = None  # Cropped frame from video stream
+        self.rendered_frame: Optional[np.ndarray] = None  # The final 2D image (projected by FFmpeg, OpenGL or remap)
+        self.buffer_index: Optional[int] = None  # Frame pool buffer backing the frame, handed back once the frame is no longer used
+        self.yolo_results = None
+        self.starts = new_timings()
+        self.ends = new_timings()
+        self.durations = new_timings()
+
+    def start(self, stage_id: int, now_ns: int = None):
+        self.starts[stage_id] = now_ns or perf_counter_ns()
+
+    def end(self, stage_id: int):
+        end = self.ends[stage_id] = perf_counter_ns()
+        self.durations[stage_id] = end - self.starts[stage_id]
+
+    def duration(self, stage_id: int, duration_ns: int):
+        self.durations[stage_id] = duration_ns
@@ -5,7 +5,7 @@ import subprocess
 from dataclasses import dataclass, field, asdict, fields
 from datetime import timedelta
 
-from script_generator.constants import RENDER_RESOLUTION
+from script_generator.constants import RENDER_RESOLUTION, VIDEO_INFO_COUNT_FRAMES
 from script_generator.debug.errors import FFProbeError
 from script_generator.debug.logger import log_vid
 
@@ -85,7 +85,19 @@ def get_cropped_dimensions(video: VideoInfo):
     # We crop 2d squarely in the center so both vr and 2d have the same dimensions
     return RENDER_RESOLUTION, RENDER_RESOLUTION
 
-def get_video_info(video_path):
+def get_video_info(video_path, count_frames=VIDEO_INFO_COUNT_FRAMES, use_cache=True):
+    """
+    Probes the video with ffprobe, the result is cached on disk until the file changes.
+
+    :param count_frames: Count the frames when the header has no frame count instead of estimating it.
+    """
+    from script_generator.video.util.video_info_cache import get_cached_video_info, cache_video_info
+
+    if use_cache:
+        cached = get_cached_video_info(video_path, exact_frames=count_frames)
+        if cached is not None:
+            return cached
+
     try:
         from script_generator.state.app_state import AppState
         state = AppState()
@@ -132,6 +144,11 @@ def get_video_info(video_path):
         num, den = map(int, r_frame_rate.split('/'))
         fps = num / den if den > 0 else 0
 
+        exact_frames = nb_frames is not None
+        if nb_frames is None and count_frames:
+            nb_frames = count_video_frames(state.ffprobe_path, video_path)
+            exact_frames = nb_frames is not None
+
         # Estimate frames if not available
         if nb_frames is None and duration > 0 and fps > 0:
             nb_frames = int(duration * fps)
@@ -140,11 +157,36 @@ def get_video_info(video_path):
         is_vr = height == width // 2
         size_bytes = os.path.getsize(video_path)
 
-        return VideoInfo(video_path, codec_name, width, height, duration, int(nb_frames), fps, bit_depth, is_vr, size_bytes)
+        video_info = VideoInfo(video_path, codec_name, width, height, duration, int(nb_frames), fps, bit_depth, is_vr, size_bytes)
+        if use_cache:
+            cache_video_info(video_info, exact_frames)
+        return video_info
 
     except subprocess.CalledProcessError as e:
         log_vid.error(f"FFProbe command failed: {e.output.decode('utf-8')}")
         raise FFProbeError("FFProbe command execution failed.")
     except (ValueError, KeyError, IndexError) as e:
         log_vid.error(f"Error parsing FFProbe output: {e}")
-        raise FFProbeError("Failed to parse FFProbe output.")
\ No newline at end of file
+        raise FFProbeError("Failed to parse FFProbe output.")
+
+
+def count_video_frames(ffprobe_path, video_path):
+    """
+    Counts the packets of the video stream, only demuxes the file so no frames are decoded.
+    :return: The frame count or None when ffprobe could not count them.
+    """
+    cmd = [
+        ffprobe_path,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-count_packets",
+        "-show_entries", "stream=nb_read_packets",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode("utf-8")
+        return int(output.strip().split(",")[0])
+    except (subprocess.CalledProcessError, ValueError) as e:
+        log_vid.warn(f"Could not count the frames of {video_path}: {e}")
+        return None
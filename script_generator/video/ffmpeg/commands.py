@@ -1,37 +1,87 @@
+from script_generator.constants import FRAME_STORE_CRF
 from script_generator.state.app_state import AppState
 from script_generator.video.data_classes.video_info import get_cropped_dimensions
 from script_generator.video.ffmpeg.filters import get_video_filters
 from script_generator.video.ffmpeg.hwaccel import get_hwaccel_read_args, supports_scale_cuda
 
 
-def get_ffmpeg_read_cmd(state: AppState, frame_start: int | None, output="-", disable_opengl=False):
-    video = state.video_info
+def get_ffmpeg_read_cmd(state: AppState, frame_start: int | None, output="-", disable_opengl=False, frame_stride=1, video_info=None, keyframes_only=False, use_frame_store=False):
+    """
+    :param keyframes_only: Only decode the keyframes (scouting pass), every keyframe is output once.
+    :param use_frame_store: Read the already projected frames from the video's frame store when there is a valid one.
+    """
+    video = video_info or state.video_info  # Batched multi video runs pass the video explicitly
     width, height = get_cropped_dimensions(video)
-    vf = get_video_filters(video, state.video_reader, state.ffmpeg_hwaccel, width, height, disable_opengl)
-    start_time = (frame_start / video.fps) * 1000
 
-    # Get supported hardware acceleration backends
-    hwaccel_read = get_hwaccel_read_args(state)
+    frame_store_path = None
+    if use_frame_store:
+        from script_generator.video.util.frame_store import get_valid_frame_store_path
+        frame_store_path = get_valid_frame_store_path(video)
+
+    if frame_store_path:
+        # The frames are already scaled and projected, decoding 640x640 frames is cheap in software
+        input_path = frame_store_path
+        hwaccel_read = []
+        vf = None
+    else:
+        input_path = video.path
+        hwaccel_read = get_hwaccel_read_args(state)
+        vf = get_video_filters(video, state.video_reader, state.ffmpeg_hwaccel, width, height, disable_opengl)
+
+    if frame_stride > 1:
+        # Only output every frame_stride-th frame, dropped before the (expensive) scale and projection filters
+        select = f"select=not(mod(n\\,{frame_stride}))"
+        vf = f"[0:v]{select},{vf.removeprefix('[0:v]')}" if vf else select
+    start_time = (frame_start / video.fps) * 1000
 
     video_filter = ["-vf", vf] if vf else []
-    if state.ffmpeg_hwaccel == "vaapi":
-        # VAAPI requires specific pixel formats and filters
-        video_filter = ["-vf", f"{vf},format=nv12,hwupload"] if vf else ["-vf", "format=nv12,hwupload"]
+    if not frame_store_path:
+        if state.ffmpeg_hwaccel == "vaapi":
+            # VAAPI requires specific pixel formats and filters
+            video_filter = ["-vf", f"{vf},format=nv12,hwupload"] if vf else ["-vf", "format=nv12,hwupload"]
 
-    if supports_scale_cuda(state):
-        video_filter = ["-noautoscale"] + video_filter  # explicitly tell ffmpeg that scaling is done by cuda
+        if supports_scale_cuda(state):
+            video_filter = ["-noautoscale"] + video_filter  # explicitly tell ffmpeg that scaling is done by cuda
 
     frame_size = width * height * 3  # Size of one frame in bytes
 
+    # The decoder (keyframes) or the select filter (stride) drops the other frames, passthrough keeps the rawvideo
+    # output from duplicating frames to fill the gaps
+    skip_frames = ["-skip_frame", "nokey"] if keyframes_only else []
+    passthrough = ["-fps_mode", "passthrough"] if keyframes_only or frame_stride > 1 else []
+
     return [
         state.ffmpeg_path,
         *hwaccel_read,
         '-nostats', '-loglevel', 'warning',
         "-ss", str(start_time / 1000),  # Seek to start time in seconds
-        "-i", video.path,
+        *skip_frames,
+        "-i", input_path,
         "-an",  # Disable audio processing
         *video_filter,
+        *passthrough,
         "-f", "rawvideo", "-pix_fmt", "bgr24",  # cv2 requires bgr (over rgb) and Yolo expects bgr images when using numpy frames (converts them internally)
         "-threads", "0", # all threads
         output
-    ], frame_size, width, height
\ No newline at end of file
+    ], frame_size, width, height
+
+
+def get_ffmpeg_frame_store_cmd(state: AppState, output_path):
+    """
+    Decodes and projects the whole video like the reader does and encodes the frames into a frame store.
+    The frames are converted to bgr24 before the encoder, so with a crf of 0 (lossless) reading the store returns
+    exactly the frames the reader would have decoded from the source.
+    """
+    video = state.video_info
+    cmd, _, _, _ = get_ffmpeg_read_cmd(state, 0, disable_opengl=True)
+    input_args = cmd[:cmd.index("-f", cmd.index("-an"))]  # Everything up to the rawvideo output
+
+    return [
+        *input_args,
+        "-fps_mode", "passthrough",  # One stored frame per source frame, the timestamps stay those of the source
+        "-pix_fmt", "bgr24",
+        "-c:v", "libx264rgb", "-crf", str(FRAME_STORE_CRF), "-preset", "veryfast",
+        "-g", str(max(1, round(video.fps))),  # A keyframe every second keeps seeks cheap
+        "-threads", "0",
+        "-y", output_path
+    ]
@@ -1,15 +1,18 @@
-from script_generator.constants import RENDER_RESOLUTION, VR_TO_2D_PITCH
+from script_generator.constants import RENDER_RESOLUTION, VR_TO_2D_PITCH, PROJECTION_STAGE_READERS
 from script_generator.state.app_state import AppState
 from script_generator.video.ffmpeg.hwaccel import supports_scale_cuda
 
 
 def get_video_filters(video, video_reader, hwaccel, width, height, disable_opengl=False):
+    """
+    :param hwaccel: Hardware acceleration the frames are decoded with, None for a software filter graph (e.g. PyAV).
+    """
     if video.is_vr:
-        return get_vr_video_filters(video, disable_opengl)
+        return get_vr_video_filters(video, video_reader, hwaccel, disable_opengl)
     else:
-        return get_2d_video_filters(video, width, height)
+        return get_2d_video_filters(video, hwaccel, width, height)
 
-def get_vr_video_filters(video, disable_opengl=False):
+def get_vr_video_filters(video, video_reader, hwaccel, disable_opengl=False):
     state = AppState()
     fov = int(video.fov * 1)
     if video.is_fisheye:
@@ -17,14 +20,15 @@ def get_vr_video_filters(video, disable_opengl=False):
     else:
         projection, iv_fov, ih_fov, v_fov, h_fov, d_fov = "he", fov, fov, 90, 90, fov
 
-    cuda = state.ffmpeg_hwaccel == "cuda"
+    cuda = hwaccel == "cuda"
 
     # hardware accelerated output is not supported with > 8 bit
-    scale = f"[0:v]scale_cuda={RENDER_RESOLUTION * 2}:-2,hwdownload" if supports_scale_cuda(state) else f"[0:v]scale={RENDER_RESOLUTION * 2}:-2"
+    scale = f"[0:v]scale_cuda={RENDER_RESOLUTION * 2}:-2,hwdownload" if cuda and supports_scale_cuda(state) else f"[0:v]scale={RENDER_RESOLUTION * 2}:-2"
     crop = f"crop={RENDER_RESOLUTION}:{RENDER_RESOLUTION}:0:0"
     out_format = f"format=nv12," if cuda else ""
 
-    if state.video_reader == "FFmpeg" or disable_opengl:
+    # Every reader but OpenGL and remap projects the frames in the filter graph
+    if video_reader not in PROJECTION_STAGE_READERS or disable_opengl:
         filters = [
             scale,
             crop,
@@ -43,13 +47,13 @@ def get_vr_video_filters(video, disable_opengl=False):
     return f"{','.join(filters)}"
 
 
-def get_2d_video_filters(video, width, height):
+def get_2d_video_filters(video, hwaccel, width, height):
     state = AppState()
-    cuda = state.ffmpeg_hwaccel == "cuda"
+    scale_cuda = hwaccel == "cuda" and supports_scale_cuda(state)
 
     # in portrait, we squash the video because we don't really know where the penis is
     if video.height > video.width:
-        if supports_scale_cuda(state):
+        if scale_cuda:
             return f"[0:v]scale_cuda={width}:{height},hwdownload,format=nv12"
         else:
             return f"[0:v]scale={width}:{height}"
@@ -58,7 +62,7 @@ def get_2d_video_filters(video, width, height):
         new_width = 640
         new_height = int((video.height / video.width) * new_width)
 
-        if supports_scale_cuda(state):
+        if scale_cuda:
             scale_filter = f"scale_cuda={new_width}:{new_height},hwdownload,format=nv12"
         else:
             scale_filter = f"scale={new_width}:{new_height}"
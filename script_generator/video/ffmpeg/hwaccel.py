@@ -1,7 +1,11 @@
+import os
+import shutil
 import subprocess
 from typing import TYPE_CHECKING
 
+from script_generator.constants import CACHE_PATH
 from script_generator.debug.logger import log_vid
+from script_generator.utils.file_cache import FileKeyedCache
 
 if TYPE_CHECKING:
     from script_generator.state.app_state import AppState
@@ -49,6 +53,31 @@ HW_TEST_CMDS = {
 }
 
 
+FFMPEG_CAPABILITIES_CACHE_VERSION = 1
+
+# Probe results per ffmpeg binary, a replaced or updated binary is probed again. Saves every process folder mode
+# spawns from running the hwaccel test encodes and the filter listing again.
+_capabilities_cache = FileKeyedCache(os.path.join(CACHE_PATH, "ffmpeg_capabilities"), FFMPEG_CAPABILITIES_CACHE_VERSION)
+
+
+def _cached_probe(ffmpeg_path, key, probe):
+    """
+    :param probe: Runs the probe, a None result is not cached (e.g. ffmpeg could not be run).
+    :return: The cached or probed result.
+    """
+    binary = None
+    if ffmpeg_path:
+        binary = ffmpeg_path if os.path.isfile(ffmpeg_path) else shutil.which(ffmpeg_path)
+    capabilities = (_capabilities_cache.get(binary) if binary else None) or {}
+    if key in capabilities:
+        return capabilities[key]
+
+    result = probe()
+    if binary and result is not None:
+        _capabilities_cache.put(binary, {**capabilities, key: result})
+    return result
+
+
 def _run_cmd(cmd):
     try:
         r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
@@ -58,6 +87,9 @@ def _run_cmd(cmd):
 
 
 def _list_ffmpeg_hwaccels(ffmpeg_path):
+    """
+    :return: The hwaccel names or None when ffmpeg could not be run.
+    """
     try:
         r = subprocess.run(
             [ffmpeg_path, "-hwaccels"],
@@ -71,7 +103,7 @@ def _list_ffmpeg_hwaccels(ffmpeg_path):
         return lines
     except Exception as e:
         log_vid.error(e)
-        return []
+        return None
 
 
 def _test_hwaccel(ffmpeg_path, hw):
@@ -85,9 +117,9 @@ def _test_hwaccel(ffmpeg_path, hw):
 
 
 def get_preferred_hwaccel(ffmpeg_path):
-    supported = _list_ffmpeg_hwaccels(ffmpeg_path)
+    supported = _cached_probe(ffmpeg_path, "hwaccels", lambda: _list_ffmpeg_hwaccels(ffmpeg_path)) or []
     for hw in ["cuda", "vaapi", "amf", "videotoolbox", "qsv", "d3d11va", "vulkan"]:
-        if hw in supported and _test_hwaccel(ffmpeg_path, hw):
+        if hw in supported and _cached_probe(ffmpeg_path, f"hwaccel_test_{hw}", lambda: _test_hwaccel(ffmpeg_path, hw)):
             log_vid.info(f"Setting preferred FFmpeg hardware acceleration to: {hw}")
             return hw
     log_vid.info("No working hwaccel found.")
@@ -119,14 +151,10 @@ _filters_checked = False
 scale_cuda = None
 scale_npp = None
 
-def _get_ffmpeg_filters(ffmpeg_path):
+def _list_scale_filters(ffmpeg_path):
     """
-    Runs FFmpeg once to check support for both scale_cuda and scale_npp filters.
+    :return: {"scale_cuda": bool, "scale_npp": bool} or None when ffmpeg could not be run.
     """
-    global _filters_checked, scale_cuda, scale_npp
-    if _filters_checked:
-        return
-
     try:
         r = subprocess.run(
             [ffmpeg_path, "-hide_banner", "-filters"],
@@ -136,13 +164,24 @@ def _get_ffmpeg_filters(ffmpeg_path):
             check=True
         )
         filters = r.stdout.lower()
-        scale_cuda = "scale_cuda" in filters
-        scale_npp = "scale_npp" in filters
-        log_vid.info(f"FFmpeg supports scale_cuda: {scale_cuda}, scale_npp: {scale_npp}")
+        return {"scale_cuda": "scale_cuda" in filters, "scale_npp": "scale_npp" in filters}
     except Exception as e:
         log_vid.error(f"Failed to retrieve FFmpeg filters: {e}")
-        scale_cuda = False
-        scale_npp = False
+        return None
+
+
+def _get_ffmpeg_filters(ffmpeg_path):
+    """
+    Checks support for both scale_cuda and scale_npp filters once per process, the result is cached per binary.
+    """
+    global _filters_checked, scale_cuda, scale_npp
+    if _filters_checked:
+        return
+
+    filters = _cached_probe(ffmpeg_path, "scale_filters", lambda: _list_scale_filters(ffmpeg_path)) or {}
+    scale_cuda = filters.get("scale_cuda", False)
+    scale_npp = filters.get("scale_npp", False)
+    log_vid.info(f"FFmpeg supports scale_cuda: {scale_cuda}, scale_npp: {scale_npp}")
     _filters_checked = True
 
 
@@ -161,4 +200,7 @@ def supports_scale_cuda(state: "AppState"):
     return _supports_scale_acceleration(state) and scale_cuda
 
 def supports_scale_npp(state: "AppState"):
+    if not _filters_checked:
+        _get_ffmpeg_filters(state.ffmpeg_path)
+
     return _supports_scale_acceleration(state) and scale_npp
@@ -0,0 +1,109 @@
+import re
+
+import av
+import numpy as np
+
+from script_generator.debug.logger import log_vid
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.ffmpeg.filters import get_video_filters
+
+
+def parse_filter_chain(vf):
+    """
+    Splits a filter chain as built by get_video_filters ("[0:v]scale=...,crop=...") into (name, args) pairs.
+    """
+    filters = []
+    for part in re.split(r"(?<!\\),", vf.removeprefix("[0:v]")):
+        name, _, args = part.partition("=")
+        filters.append((name, args.replace("\\,", ",") or None))
+    return filters
+
+
+class PyAVFrameReader:
+    def __init__(self, video_info, video_reader, frame_start=0, frame_stride=1, disable_opengl=False):
+        """
+        Decodes in process through the libav bindings (PyAV) and runs the same scale/crop/v360/gamma chain as the
+        FFmpeg reader in libavfilter. Frames are copied from the filter output straight into the caller's buffer,
+        there is no pipe and no subprocess. Software decoding only.
+
+        :param frame_start: First frame to read, the seek is frame accurate.
+        :param frame_stride: Only every frame_stride-th frame is filtered and returned.
+        """
+        self.video_info = video_info
+        self.width, self.height = get_cropped_dimensions(video_info)
+        self.frame_stride = frame_stride
+        self.vf = get_video_filters(video_info, video_reader, None, self.width, self.height, disable_opengl)
+
+        self.container = av.open(video_info.path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"  # Frame and slice threading in the decoder
+        start_time = self.stream.start_time
+        self._start_seconds = float(start_time * self.stream.time_base) if start_time is not None else 0.0
+
+        self.graph = None
+        self._decoded = None
+        self.next_frame = frame_start
+        self.seek(frame_start)
+
+    def _build_graph(self):
+        graph = av.filter.Graph()
+        previous = graph.add_buffer(template=self.stream)
+        for name, args in parse_filter_chain(self.vf) + [("format", "bgr24")]:
+            node = graph.add(name, args)
+            previous.link_to(node)
+            previous = node
+        sink = graph.add("buffersink")
+        previous.link_to(sink)
+        graph.configure()
+        return graph
+
+    def _frame_index(self, frame):
+        if frame.time is None:
+            return None
+        return round((frame.time - self._start_seconds) * self.video_info.fps)
+
+    def seek(self, frame_pos):
+        """
+        Seeks to the keyframe before the frame, the frames up to it are decoded but not filtered.
+        """
+        target = self._start_seconds + frame_pos / self.video_info.fps
+        self.container.seek(int(target / self.stream.time_base), stream=self.stream, backward=True, any_frame=False)
+        self._decoded = self.container.decode(self.stream)
+        # The filter graph can hold frames from before the seek
+        self.graph = self._build_graph()
+        self.next_frame = frame_pos
+
+    def read_into(self, out):
+        """
+        Reads the next frame into a preallocated (height, width, 3) bgr buffer.
+        :return: The frame position or None at the end of the video.
+        """
+        for frame in self._decoded:
+            index = self._frame_index(frame)
+            if index is None:
+                index = self.next_frame
+            if index < self.next_frame:
+                continue  # Between the keyframe and the seek target, or skipped by the stride
+
+            self.graph.push(frame)
+            try:
+                filtered = self.graph.pull()
+            except (av.error.BlockingIOError, av.error.EOFError):
+                continue
+
+            self._copy_frame(filtered, out)
+            self.next_frame = index + self.frame_stride
+            return index
+        return None
+
+    def _copy_frame(self, frame, out):
+        # The rows of the plane are padded to line_size, copy the visible part without an intermediate array
+        plane = frame.planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(frame.height, plane.line_size)
+        np.copyto(out, rows[:, :frame.width * 3].reshape(frame.height, frame.width, 3))
+
+    def close(self):
+        log_vid.debug("Closing PyAV reader")
+        self.graph = None
+        self._decoded = None
+        self.container.close()
@@ -1,14 +1,25 @@
+import importlib.util
 import os
 import subprocess
+import threading
+
 import cv2
 import imageio
 import numpy as np
+
+from script_generator.constants import SEEK_RESTART_COST_FRAMES
 from script_generator.debug.logger import log
 from script_generator.state.app_state import AppState
 from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
+from script_generator.video.util.keyframes import load_or_build_keyframe_index
 
 class VideoReaderFFmpeg:
-    def __init__(self, state, start_frame=0):
+    def __init__(self, state, start_frame=0, use_keyframe_index=False):
+        """
+        :param use_keyframe_index: Load (or build) the keyframe index to decide how to seek, for random access like
+        the debug player. Seeks restart the reader until the index is available.
+        """
         self.state: AppState = state
         self.video_path = state.video_path
         self.start_frame = start_frame
@@ -18,6 +29,14 @@ class VideoReaderFFmpeg:
         self.frame_size = None
         self.width = None
         self.height = None
+        self.keyframe_index = None
+        self._skip_buffer = None
+
+        if use_keyframe_index:
+            threading.Thread(target=self._load_keyframe_index, daemon=True).start()
+
+    def _load_keyframe_index(self):
+        self.keyframe_index = load_or_build_keyframe_index(self.state, self.video_path)
 
     def _start_process(self, start_frame=0):
         self.current_frame_number = start_frame
@@ -60,12 +79,100 @@ class VideoReaderFFmpeg:
             return False, None
 
     def set_frame(self, frame_id):
-        self.start_frame = int(frame_id)
+        frame_id = int(frame_id)
+        self.start_frame = frame_id
+        if self.process and self._should_decode_forward(frame_id) and self._skip_frames(frame_id - self.current_frame_number):
+            return
         self._start_process(start_frame=frame_id)
 
+    def _should_decode_forward(self, frame_id):
+        """
+        Whether decoding forward in the running process to reach the frame is cheaper than restarting ffmpeg, which
+        has to decode from the keyframe before the frame.
+        """
+        distance = frame_id - self.current_frame_number
+        if distance < 0:
+            return False
+
+        if self.keyframe_index is None:
+            return distance <= SEEK_RESTART_COST_FRAMES
+
+        keyframe = self.keyframe_index.keyframe_before(frame_id)
+        if keyframe <= self.current_frame_number:
+            return True  # A restart would decode the same frames again
+        return distance <= frame_id - keyframe + SEEK_RESTART_COST_FRAMES
+
+    def _skip_frames(self, count):
+        """
+        Reads and drops frames of the running process.
+        :return: False when the end of the stream was reached.
+        """
+        if self._skip_buffer is None:
+            self._skip_buffer = np.empty(self.frame_size, dtype=np.uint8)
+        for _ in range(count):
+            if read_into(self.process.stdout, self._skip_buffer) < self.frame_size:
+                return False
+            self.current_frame_number += 1
+        return True
+
     def release(self):
         """Release resources and terminate the FFmpeg process."""
         if self.process:
             self.process.stdout.close()
             self.process.terminate()
             self.process = None
+
+
+class VideoReaderPyAV:
+    def __init__(self, state, start_frame=0):
+        """
+        Same interface as VideoReaderFFmpeg but decodes in process, every seek is frame accurate without restarting a
+        process so it doesn't need a keyframe index.
+        """
+        from script_generator.video.ffmpeg.pyav_reader import PyAVFrameReader  # Optional dependency
+
+        self.state: AppState = state
+        self.video_path = state.video_path
+        self.keyframe_index = None
+        self.reader = PyAVFrameReader(state.video_info, state.video_reader, start_frame, disable_opengl=True)
+        self.current_frame_number = start_frame
+        self.current_time = 0
+
+    def read(self):
+        """Read the next frame from the video."""
+        frame = np.empty((self.reader.height, self.reader.width, 3), dtype=np.uint8)
+        frame_pos = self.reader.read_into(frame)
+        if frame_pos is None:
+            log.warn("PyAV video reader could not read frame / end of file")
+            return False, None
+
+        self.current_frame_number = frame_pos + 1
+        self.current_time = (self.current_frame_number / self.state.video_info.fps) * 1000
+        return True, frame
+
+    def set_frame(self, frame_id):
+        frame_id = int(frame_id)
+        if frame_id != self.current_frame_number:
+            self.reader.seek(frame_id)
+            self.current_frame_number = frame_id
+
+    def release(self):
+        self.reader.close()
+
+
+def is_pyav_available():
+    """
+    PyAV is an optional dependency (pip install av), the PyAV reader falls back to FFmpeg without it.
+    """
+    return importlib.util.find_spec("av") is not None
+
+
+def create_video_reader(state, start_frame=0, use_keyframe_index=False):
+    """
+    Reader for random access (e.g. the debug player) that matches the state's video reader.
+    """
+    if state.video_reader == "PyAV":
+        if is_pyav_available():
+            return VideoReaderPyAV(state, start_frame)
+        log.warn("PyAV is not installed (pip install av), using the FFmpeg reader instead")
+    return VideoReaderFFmpeg(state, start_frame, use_keyframe_index)
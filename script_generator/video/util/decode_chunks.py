@@ -0,0 +1,110 @@
+import bisect
+import math
+import threading
+
+from script_generator.constants import DECODE_CHUNK_MIN_SECONDS
+from script_generator.debug.logger import log_vid
+from script_generator.video.util.keyframes import load_or_build_keyframe_index
+
+
+def split_decode_chunks(frame_start, frame_end, chunk_frames, stride=1, keyframes=None):
+    """
+    Splits a frame range into adjacent chunks for parallel decoders. A chunk starts at a keyframe when the keyframes
+    are known, so its decoder doesn't decode frames of the previous chunk, and on the stride so the strided frame
+    positions are the same as with a single decoder.
+
+    :param chunk_frames: Minimum chunk length, chunks are longer when the keyframes are further apart.
+    :param keyframes: Sorted keyframe frame numbers or None.
+    :return: List of (start, end) tuples, end is exclusive.
+    """
+    bounds = [frame_start]
+    target = frame_start + chunk_frames
+    while target < frame_end:
+        start = target
+        if keyframes:
+            i = bisect.bisect_left(keyframes, target)
+            if i == len(keyframes):
+                break
+            start = keyframes[i]
+        start = frame_start + math.ceil((start - frame_start) / stride) * stride
+        if start >= frame_end:
+            break
+        bounds.append(start)
+        target = start + chunk_frames
+    return list(zip(bounds, bounds[1:] + [frame_end]))
+
+
+class DecodeChunkScheduler:
+    def __init__(self, chunks, max_ahead):
+        """
+        Hands the chunks of a frame range to the decoder replicas in order. The frames are consumed in order, so
+        everything the decoders produce ahead of the earliest active chunk waits in a reorder buffer. A decoder that
+        isn't working on the earliest chunk waits when it gets more than max_ahead frames ahead of it, which keeps the
+        reorder buffer (and the frame buffers it holds) bounded. The decoder of the earliest chunk never waits.
+
+        :param chunks: (start, end) frame ranges as returned by split_decode_chunks.
+        :param max_ahead: Frames a decoder may run ahead of the earliest active chunk.
+        """
+        self.chunks = chunks
+        self.max_ahead = max_ahead
+        self._next_chunk = 0
+        self._positions = {}  # Next frame position per active chunk index
+        self._cond = threading.Condition()
+
+    def next_chunk(self):
+        """
+        :return: (chunk index, start, end) or None when all chunks are taken.
+        """
+        with self._cond:
+            if self._next_chunk >= len(self.chunks):
+                return None
+            index = self._next_chunk
+            self._next_chunk += 1
+            start, end = self.chunks[index]
+            self._positions[index] = start
+            return index, start, end
+
+    def wait_turn(self, index, frame_pos, stop_event):
+        """
+        Call before decoding the frame, blocks while the frame is too far ahead.
+        :return: False when stopped while waiting.
+        """
+        with self._cond:
+            self._positions[index] = frame_pos
+            self._cond.notify_all()
+            while not stop_event.is_set():
+                earliest = min(self._positions)
+                if index == earliest or frame_pos - self._positions[earliest] <= self.max_ahead:
+                    return True
+                self._cond.wait(timeout=1)
+            return False
+
+    def finish_chunk(self, index):
+        with self._cond:
+            self._positions.pop(index, None)
+            self._cond.notify_all()
+
+
+def create_decode_scheduler(state, replicas, max_pending):
+    """
+    Splits the job's frame range into chunks for the decoder replicas.
+
+    :param max_pending: Frames the reorder buffer behind the decoders holds at most.
+    """
+    stride = state.detection_stride
+    frame_start = state.frame_start or 0
+    frame_end = state.frame_end or state.video_info.total_frames
+    # Every replica holds a frame of its own while it waits for the reorder buffer
+    max_ahead = max(stride, (max_pending - replicas) * stride)
+    chunk_frames = max(max_ahead // replicas, math.ceil(DECODE_CHUNK_MIN_SECONDS * state.video_info.fps))
+    if chunk_frames * (replicas - 1) > max_ahead:
+        log_vid.warn(f"The memory budget only lets the decoders run {max_ahead} frames apart, raise it (--memory-budget) to decode {replicas} chunks at the same time")
+
+    keyframe_index = load_or_build_keyframe_index(state)
+    chunks = split_decode_chunks(frame_start, frame_end, chunk_frames, stride, keyframe_index.keyframes if keyframe_index else None)
+    if state.frame_end is None:
+        # The frame count in the header can be off, the last chunk reads to the end of the video
+        chunks[-1] = (chunks[-1][0], None)
+
+    log_vid.info(f"Decoding {len(chunks)} chunks of about {chunk_frames} frames with {replicas} decoders")
+    return DecodeChunkScheduler(chunks, max_ahead)
@@ -0,0 +1,119 @@
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def read_into(stream, buffer):
+    """
+    Fills a preallocated buffer from a (pipe) stream without allocating a new bytes object per read.
+
+    :param stream: Binary stream to read from (e.g. the stdout of an FFmpeg process).
+    :param buffer: Writable, C-contiguous buffer (e.g. a numpy frame).
+    :return: Number of bytes read, only smaller than the buffer size at the end of the stream.
+    """
+    view = memoryview(buffer).cast("B")
+    total = 0
+    while total < len(view):
+        n = stream.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def frames_for_budget(budget_bytes, shape, min_frames):
+    """
+    Number of frames of the given shape that fit in a memory budget.
+
+    :param min_frames: Lower bound, the pipeline needs at least a full inference batch in flight to make progress.
+    """
+    return max(min_frames, budget_bytes // int(np.prod(shape)))
+
+
+class FrameBufferPool:
+    def __init__(self, size, shape):
+        """
+        Fixed set of preallocated frames that is recycled between the decoder and the last pipeline stage.
+        Gives zero allocations per frame in steady state and a hard ceiling on the memory used by raw frames.
+
+        :param size: Number of frames in the pool.
+        :param shape: Shape of a single frame, e.g. (640, 640, 3).
+        """
+        self.size = size
+        self.frames = np.empty((size, *shape), dtype=np.uint8)
+        self._free = queue.Queue()
+        for index in range(size):
+            self._free.put(index)
+
+    def acquire(self, timeout=1):
+        """
+        Reserve a free buffer, blocks until one is handed back by a downstream stage.
+        :return: The buffer index or None when no buffer became available within the timeout.
+        """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, index):
+        self._free.put(index)
+
+    def available(self):
+        return self._free.qsize()
+
+
+class SharedFrameSlab:
+    def __init__(self, ctx, slots, shape):
+        """
+        Fixed number of frame slots in a single shared memory segment. Processes exchange slot indices
+        (frame descriptors) instead of pickling full frames.
+
+        :param ctx: Multiprocessing context used to create the free slot queue.
+        :param slots: Number of frames the slab can hold.
+        :param shape: Shape of a single frame, e.g. (640, 640, 3).
+        """
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.frame_nbytes = int(np.prod(self.shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * self.frame_nbytes)
+        self._owner = True
+        self._free = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {"slots": self.slots, "shape": self.shape, "name": self._shm.name, "free": self._free}
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.shape = state["shape"]
+        self.frame_nbytes = int(np.prod(self.shape))
+        # Child processes share the parent's resource tracker, the parent unlinks the segment in close()
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._free = state["free"]
+        self.frames = np.ndarray((self.slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+
+    def acquire(self, timeout=1):
+        """
+        Reserve a free slot, blocks until one is released by a downstream stage.
+        :return: The slot index or None when no slot became available within the timeout.
+        """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def close(self):
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # A frame view is still referenced somewhere, the segment is freed when the process exits
+        if self._owner:
+            self._shm.unlink()
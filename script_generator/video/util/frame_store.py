@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import time
+
+from script_generator.constants import FRAME_STORE_CRF
+from script_generator.debug.errors import FFMpegError
+from script_generator.debug.logger import log_vid
+from script_generator.utils.file import get_output_file_path
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.ffmpeg.filters import get_video_filters
+
+FRAME_STORE_VERSION = 1
+
+
+def get_frame_store_paths(video_path):
+    """
+    :return: (store video path, store metadata path)
+    """
+    path, _ = get_output_file_path(video_path, ".mkv", "frames")
+    meta_path, _ = get_output_file_path(video_path, ".json", "frames")
+    return path, meta_path
+
+
+def _get_frame_store_key(video):
+    """
+    Settings the stored frames depend on. The software filter graph holds the render resolution and the projection.
+    """
+    stat = os.stat(video.path)
+    width, height = get_cropped_dimensions(video)
+    return {
+        "version": FRAME_STORE_VERSION,
+        "size_bytes": stat.st_size,
+        "mtime": stat.st_mtime,
+        "filters": get_video_filters(video, "FFmpeg", None, width, height, disable_opengl=True),
+        "crf": FRAME_STORE_CRF,
+    }
+
+
+def get_valid_frame_store_path(video):
+    """
+    :return: The frame store of the video or None when there is none or it was made from another file or with other
+             settings.
+    """
+    path, meta_path = get_frame_store_paths(video.path)
+    if not os.path.exists(path) or not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except Exception as e:
+        log_vid.warn(f"Ignoring frame store with unreadable metadata {meta_path}: {e}")
+        return None
+
+    if meta != _get_frame_store_key(video):
+        log_vid.warn(f"Ignoring outdated frame store {path}, it was made from another file or with other settings")
+        return None
+    return path
+
+
+def build_frame_store(state):
+    """
+    Decodes and projects the video once and stores the frames, later detection runs read them instead of the source.
+    :return: The frame store path.
+    """
+    from script_generator.video.ffmpeg.commands import get_ffmpeg_frame_store_cmd
+
+    video = state.video_info
+    path, meta_path = get_frame_store_paths(video.path)
+    temp_path = path.replace(".mkv", ".tmp.mkv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    cmd = get_ffmpeg_frame_store_cmd(state, temp_path)
+    log_vid.info(f"Building frame store: {' '.join(cmd)}")
+    start_time = time.time()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        log_vid.error(f"FFMPEG could not build the frame store:\n{result.stderr.decode('utf-8', errors='replace')}")
+        raise FFMpegError("FFMPEG could not build the frame store. See the log for details.")
+
+    os.replace(temp_path, path)
+    with open(meta_path, "w") as f:
+        json.dump(_get_frame_store_key(video), f)
+
+    seconds = time.time() - start_time
+    log_vid.info(
+        f"Built frame store of {video.total_frames} frames in {seconds:.2f} s "
+        f"({video.total_frames / max(seconds, 1e-6):.1f} fps, {os.path.getsize(path) / 1024 / 1024:.0f} MB): {path}"
+    )
+    return path
+
+
+def get_or_build_frame_store(state):
+    return get_valid_frame_store_path(state.video_info) or build_frame_store(state)
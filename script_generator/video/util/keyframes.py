@@ -0,0 +1,126 @@
+import bisect
+import json
+import os
+import subprocess
+import time
+
+from script_generator.debug.logger import log_vid
+from script_generator.utils.file import get_output_file_path
+
+KEYFRAME_INDEX_VERSION = 2  # 2: frame numbers relative to the stream start time
+
+
+class KeyframeIndex:
+    def __init__(self, keyframes, size_bytes=-1, mtime=0.0):
+        """
+        Frame numbers of the keyframes of a video, a seek (ffmpeg -ss) has to decode from the keyframe before the target.
+
+        :param keyframes: Sorted keyframe frame numbers.
+        :param size_bytes: Size of the video file the index was built for.
+        :param mtime: Modification time of the video file the index was built for.
+        """
+        self.keyframes = keyframes
+        self.size_bytes = size_bytes
+        self.mtime = mtime
+
+    def keyframe_before(self, frame):
+        """
+        :return: The last keyframe at or before the frame, 0 when there is none.
+        """
+        i = bisect.bisect_right(self.keyframes, frame)
+        return self.keyframes[i - 1] if i else 0
+
+    def matches(self, video_path):
+        stat = os.stat(video_path)
+        return stat.st_size == self.size_bytes and stat.st_mtime == self.mtime
+
+    def to_dict(self):
+        return {"version": KEYFRAME_INDEX_VERSION, "size_bytes": self.size_bytes, "mtime": self.mtime, "keyframes": self.keyframes}
+
+    @staticmethod
+    def build(ffprobe_path, video_path, fps) -> "KeyframeIndex":
+        """
+        Reads the keyframe flags of the video packets with ffprobe, only demuxes the file so no frames are decoded.
+        """
+        start_time = time.time()
+        cmd = [
+            ffprobe_path,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=start_time:packet=pts_time,dts_time,flags",
+            "-of", "csv=p=1",  # Lines start with their section (stream or packet)
+            video_path,
+        ]
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode("utf-8")
+
+        stat = os.stat(video_path)
+        index = KeyframeIndex(KeyframeIndex.parse_keyframes(output, fps), stat.st_size, stat.st_mtime)
+        log_vid.info(f"Built keyframe index of {len(index.keyframes)} keyframes in {time.time() - start_time:.2f} s")
+        return index
+
+
+    @staticmethod
+    def parse_keyframes(output, fps):
+        """
+        :param output: ffprobe csv output with the stream start time and the packets.
+        :return: Sorted keyframe frame numbers, counted from the stream start like the reader's -ss and PyAV's frames.
+        """
+        stream_start = 0.0
+        timestamps = []
+        for line in output.splitlines():
+            section, *fields = line.split(",")
+            if section == "stream":
+                try:
+                    stream_start = float(fields[0])
+                except (IndexError, ValueError):
+                    pass  # N/A, the timestamps start at 0
+            elif section == "packet":
+                pts_time, dts_time, flags = (fields + ["", "", ""])[:3]
+                if "K" in flags:
+                    timestamps.append(pts_time if pts_time not in ("", "N/A") else dts_time)
+
+        keyframes = set()
+        for timestamp in timestamps:
+            try:
+                keyframes.add(max(0, round((float(timestamp) - stream_start) * fps)))
+            except ValueError:
+                continue
+        return sorted(keyframes)
+
+
+def get_keyframe_index_path(video_path):
+    path, _ = get_output_file_path(video_path, ".json", "keyframes")
+    return path
+
+
+def load_or_build_keyframe_index(state, video_path=None):
+    """
+    Loads the cached keyframe index beside the video's metadata or builds and caches it.
+    :return: The index or None when it could not be built (e.g. ffprobe failed).
+    """
+    video_path = video_path or state.video_path
+    path = get_keyframe_index_path(video_path)
+
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            index = KeyframeIndex(data["keyframes"], data["size_bytes"], data["mtime"])
+            if data.get("version") == KEYFRAME_INDEX_VERSION and index.matches(video_path):
+                return index
+        except Exception as e:
+            log_vid.warn(f"Ignoring unreadable keyframe index {path}: {e}")
+
+    try:
+        index = KeyframeIndex.build(state.ffprobe_path, video_path, state.video_info.fps)
+    except Exception as e:
+        log_vid.warn(f"Could not build the keyframe index of {video_path}: {e}")
+        return None
+
+    if not index.keyframes:
+        return None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(index.to_dict(), f)
+    return index
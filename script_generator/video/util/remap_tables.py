@@ -0,0 +1,121 @@
+import os
+import threading
+
+import numpy as np
+
+from script_generator.constants import CACHE_PATH, RENDER_RESOLUTION, VR_TO_2D_PITCH
+from script_generator.debug.logger import log_vid
+
+REMAP_TABLE_VERSION = 1
+REMAP_TABLE_PATH = os.path.join(CACHE_PATH, "remap")
+
+# Camera of the OpenGL renderer (VrTo2DWorker): 90° perspective from 0.5 in front of the dome center
+CAMERA_FOV = 90
+CAMERA_EYE = np.array([0.0, 0.0, 0.5])
+
+
+def get_view_rays(resolution, pitch):
+    """
+    Casts a ray through every output pixel like the OpenGL renderer and intersects it with the unit dome.
+
+    :return: (resolution, resolution, 3) points on the unit sphere in dome (model) coordinates, row 0 is the top.
+    """
+    half = np.tan(np.radians(CAMERA_FOV / 2))
+    # Pixel centers in normalized device coordinates, the renderer's output is flipped so the top row is +y
+    ndc = (np.arange(resolution, dtype=np.float64) + 0.5) / resolution * 2 - 1
+    x, y = np.meshgrid(ndc * half, -ndc * half)
+    directions = np.stack([x, y, -np.ones_like(x)], axis=-1)
+    directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+
+    # The eye is inside the unit sphere, so every ray hits it exactly once in front of the eye
+    b = directions @ CAMERA_EYE
+    t = -b + np.sqrt(b * b - (CAMERA_EYE @ CAMERA_EYE - 1))
+    points = CAMERA_EYE + directions * t[..., None]
+
+    # Undo the model transform of the dome: glRotatef(-(pitch + 90), 1, 0, 0) and the horizontal flip glScalef(-1, 1, 1)
+    angle = np.radians(-(pitch + 90))
+    cos, sin = np.cos(angle), np.sin(angle)
+    rotation = np.array([[1, 0, 0], [0, cos, -sin], [0, sin, cos]])
+    points = points @ rotation  # Row vectors times R is R^T applied to every point
+    points[..., 0] *= -1
+    return points
+
+
+def build_remap_tables(is_fisheye, fov, width, height, resolution=RENDER_RESOLUTION, pitch=VR_TO_2D_PITCH):
+    """
+    Source pixel of every output pixel for cv2.remap, pixels outside the source get a negative coordinate (black).
+
+    Half equirectangular frames are mapped like the texture coordinates of create_180_dome: u = phi / pi and
+    v = theta / pi, the dome covers y >= 0. Fisheye frames are mapped with the equidistant model around the dome's
+    axis (+y) with the same orientation, the image circle is inscribed in the frame.
+
+    :param width: Width of a source frame (one eye, as cropped by the decoder).
+    :param height: Height of a source frame.
+    :return: (map_x, map_y) float32 arrays of shape (resolution, resolution).
+    """
+    points = get_view_rays(resolution, pitch)
+    x, y, z = points[..., 0], points[..., 1], points[..., 2]
+
+    if is_fisheye:
+        alpha = np.arccos(np.clip(y, -1, 1))  # Angle from the optical axis
+        radius = alpha / np.radians(fov / 2)  # 1 at the edge of the image circle
+        norm = np.hypot(x, z)
+        norm[norm == 0] = 1
+        map_x = (0.5 - radius * x / norm * 0.5) * width
+        map_y = (0.5 - radius * z / norm * 0.5) * height
+        outside = radius > 1
+    else:
+        phi = np.arctan2(y, x)  # 0 to pi on the dome
+        theta = np.arccos(np.clip(z, -1, 1))
+        map_x = phi / np.pi * width
+        map_y = theta / np.pi * height
+        outside = y < 0
+
+    # Texel centers are at .5
+    map_x = map_x - 0.5
+    map_y = map_y - 0.5
+    map_x[outside] = -1
+    map_y[outside] = -1
+    return map_x.astype(np.float32), map_y.astype(np.float32)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def load_or_build_remap_tables(video, width, height, resolution=RENDER_RESOLUTION, pitch=VR_TO_2D_PITCH):
+    """
+    Remap tables of the video's projection in the fixed point format cv2.remap is fastest with. Cached in memory
+    and on disk per projection, fov, pitch, source size and output resolution.
+
+    :return: (map1, map2) as returned by cv2.convertMaps.
+    """
+    import cv2
+
+    key = f"{video.projection}_{'fisheye' if video.is_fisheye else 'he'}_{video.fov}_{pitch}_{width}x{height}_{resolution}_v{REMAP_TABLE_VERSION}"
+    with _tables_lock:
+        if key in _tables:
+            return _tables[key]
+
+        path = os.path.join(REMAP_TABLE_PATH, f"{key}.npz")
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    _tables[key] = data["map1"], data["map2"]
+                return _tables[key]
+            except Exception as e:
+                log_vid.warn(f"Ignoring unreadable remap table {path}: {e}")
+
+        map_x, map_y = build_remap_tables(video.is_fisheye, video.fov, width, height, resolution, pitch)
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        try:
+            os.makedirs(REMAP_TABLE_PATH, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(temp_path, map1=map1, map2=map2)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log_vid.warn(f"Could not cache the remap table {path}: {e}")
+
+        log_vid.info(f"Built remap table {key}")
+        _tables[key] = map1, map2
+        return _tables[key]
@@ -0,0 +1,29 @@
+import os
+from dataclasses import asdict, fields
+
+from script_generator.constants import CACHE_PATH
+from script_generator.utils.file_cache import FileKeyedCache
+from script_generator.video.data_classes.video_info import VideoInfo
+
+VIDEO_INFO_CACHE_VERSION = 1
+
+# Probed VideoInfo of every video that was opened, shared by the GUI, the CLI and the processes folder mode spawns
+_cache = FileKeyedCache(os.path.join(CACHE_PATH, "video_info"), VIDEO_INFO_CACHE_VERSION)
+
+
+def get_cached_video_info(video_path, exact_frames=False):
+    """
+    :param exact_frames: Only return an entry whose frame count was read from the header or counted.
+    :return: The cached VideoInfo or None when the video is unknown or changed.
+    """
+    entry = _cache.get(video_path)
+    if entry is None or (exact_frames and not entry["exact_frames"]):
+        return None
+
+    info = entry["info"]
+    # The projection is derived from the file name, so it follows a renamed file
+    return VideoInfo(**{f.name: info[f.name] for f in fields(VideoInfo) if f.init and f.name in info} | {"path": video_path})
+
+
+def cache_video_info(video_info, exact_frames):
+    _cache.put(video_info.path, {"exact_frames": exact_frames, "info": asdict(video_info)})
@@ -0,0 +1,69 @@
+import subprocess
+from time import perf_counter_ns
+
+from script_generator.debug.errors import FFMpegError
+from script_generator.debug.logger import log_vid
+from script_generator.tasks.workers.abstract_process_worker import AbstractProcessWorker
+from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_VIDEO, new_timings
+from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
+
+
+class VideoProcessWorker(AbstractProcessWorker):
+    process_type = TaskProcessorTypes.VIDEO
+
+    def __init__(self, state, ctx, slab, output_queue, failed_event=None):
+        super().__init__(state=state, ctx=ctx, output_queue=output_queue, failed_event=failed_event)
+        self.slab = slab
+
+    def stage_args(self):
+        # The command is built in the parent as it depends on the AppState
+        stride = self.state.detection_stride
+        cmd, frame_size, _, _ = get_ffmpeg_read_cmd(self.state, self.state.frame_start, frame_stride=stride, use_frame_store=self.state.use_frame_store)
+        return cmd, frame_size, self.state.frame_start, self.state.frame_end, stride, self.slab
+
+    @staticmethod
+    def stage_logic(cmd, frame_size, frame_start, frame_end, stride, slab, output_queue, stop_event):
+        log_vid.info(f"FFMPEG executing command: {' '.join(cmd)}")
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        current_frame = frame_start
+
+        try:
+            while not stop_event.is_set():
+                if frame_end is not None and current_frame >= frame_end:
+                    log_vid.info(f"FFMPEG reached frame end {frame_end}")
+                    break
+
+                slot = slab.acquire()
+                if slot is None:
+                    continue  # All slots are in use downstream
+
+                start_time = perf_counter_ns()
+                if read_into(process.stdout, slab.frames[slot]) < frame_size:
+                    slab.release(slot)
+                    if current_frame == frame_start:
+                        error_output = process.stderr.read().decode('utf-8', errors='replace')
+                        log_vid.error(f"FFMPEG could not read frames from this video\nFFMPEG command:\n{' '.join(cmd)}\nFFMPEG ERROR:\n{error_output}")
+                        raise FFMpegError(f"FFMPEG could not read frames from this video. See the log for details.")
+                    log_vid.info("FFMPEG received last frame")
+                    break
+
+                end_time = perf_counter_ns()
+                durations = new_timings()
+                durations[STAGE_VIDEO] = end_time - start_time
+                # perf_counter_ns is system wide, the end time doubles as the time the frame entered the pipeline
+                output_queue.put((current_frame, slot, durations, end_time))
+                current_frame += stride
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        output_queue.put(None)
+
+    def release(self):
+        log_vid.debug("Stopping FFmpeg reader process")
+        self.stop_process()
@@ -1,56 +1,54 @@
 import subprocess
+import threading
+from time import perf_counter_ns
 
-import numpy as np
-
+from script_generator.constants import PROJECTION_STAGE_READERS
 from script_generator.debug.errors import FFMpegError
 from script_generator.debug.logger import log_vid
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
-from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask, STAGE_VIDEO
 from script_generator.video.ffmpeg.commands import get_ffmpeg_read_cmd
+from script_generator.video.util.frame_buffers import read_into
 
 
 class VideoWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.VIDEO
+    stage_id = STAGE_VIDEO
+    # Replicas decode the chunks of the analyze task's decode scheduler, the frames are put back in order downstream
+    supports_replicas = True
     process = None
+    pyav_reader = None
     read_frames = True
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._end_lock = threading.Lock()
+        self._ended = False
+
     def task_logic(self):
         self.process = None
+        self.pyav_reader = None
         self.read_frames = True
 
-        cmd, frame_size, width, height = get_ffmpeg_read_cmd(
-            self.state,
-            self.state.frame_start
-        )
-        log_vid.info(f"FFMPEG executing command: {' '.join(cmd)}")
-
-        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        current_frame = self.state.frame_start
+        stride = self.state.detection_stride
+        scheduler = self.state.analyze_task.decode_scheduler
 
         try:
-            while self.read_frames:
-                in_bytes = self.process.stdout.read(frame_size)
-                if not in_bytes:
-                    if current_frame == self.state.frame_start:
-                        error_output = self.process.stderr.read().decode('utf-8', errors='replace')
-                        log_vid.error(f"FFMPEG could not read frames from this video\nFFMPEG command:\n{' '.join(cmd)}\nFFMPEG ERROR:\n{error_output}")
-                        raise FFMpegError(f"FFMPEG could not read frames from this video. See the log for details.")
-                    else:
-                        log_vid.info("FFMPEG received last frame")
-                    break
-
-                task = AnalyzeFrameTask(frame_pos=current_frame)
-                frame = np.frombuffer(in_bytes, np.uint8).reshape([height, width, 3])
-
-                if self.state.video_reader == "FFmpeg":
-                    task.rendered_frame = frame
+            if scheduler is None:
+                if self.state.video_reader == "PyAV":
+                    read_frame = self._open_pyav(stride)
                 else:
-                    task.preprocessed_frame = frame
-
-                task.end(str(self.process_type))
-
-                self.finish_task(task)
-                current_frame += 1
+                    read_frame = self._open_pipe(stride, self.state.frame_start)
+                self._decode(read_frame, self.state.frame_end)
+            else:
+                while self.read_frames and (chunk := scheduler.next_chunk()) is not None:
+                    index, start, end = chunk
+                    log_vid.debug(f"FFMPEG decoding chunk {index} ({start} to {end})")
+                    try:
+                        self._decode(self._open_pipe(stride, start), end, scheduler, index)
+                    finally:
+                        scheduler.finish_chunk(index)
+                        self._close_pipe()
 
         except Exception as e:
             # Suppress any errors when the thread is force closed
@@ -59,13 +57,111 @@ class VideoWorker(AbstractTaskProcessor):
                 raise e
 
         finally:
-            self.stop_process()
             self.release()
+            # Closed by the decoding thread only, closing it while a frame is decoded is unsafe
+            if self.pyav_reader:
+                self.pyav_reader.close()
+                self.pyav_reader = None
 
-    def release(self):
-        log_vid.debug("Stopping FFmpeg reader")
-        self.read_frames = False
-        self.stop_process()
+    def _decode(self, read_frame, frame_end, scheduler=None, chunk_index=None):
+        """
+        Reads frames into the frame pool and passes them on until the end of the stream or frame_end.
+
+        :param scheduler: Decode scheduler when this is one of several decoders, it holds the decoder back when it's
+                          too far ahead of the others.
+        """
+        frame_pool = self.state.analyze_task.frame_pool
+        first_frame = self.state.frame_start or 0
+        stride = self.state.detection_stride
+        is_first = True
+
+        while self.read_frames:
+            if scheduler and not scheduler.wait_turn(chunk_index, read_frame.next_frame, self._stop_event):
+                break
+
+            buffer_index = frame_pool.acquire()
+            if buffer_index is None:
+                continue  # All buffers are in use downstream
+
+            frame = frame_pool.frames[buffer_index]
+            start_time = perf_counter_ns()
+            # A chunk after the first can be empty when the frame count in the header is too high
+            frame_pos = read_frame(frame, is_first and not chunk_index)
+            is_first = False
+            if frame_pos is None:
+                frame_pool.release(buffer_index)
+                log_vid.info("FFMPEG received last frame")
+                break
+
+            if frame_end is not None and frame_pos >= frame_end:
+                frame_pool.release(buffer_index)
+                if scheduler is None:
+                    log_vid.info(f"FFMPEG reached frame end {frame_end}")
+                break
+
+            # Numbered by position, so the ids don't depend on which decoder read the frame
+            task = AnalyzeFrameTask(frame_pos=frame_pos, task_id=(frame_pos - first_frame) // stride)
+            task.buffer_index = buffer_index
+            task.start(self.stage_id, start_time)
+
+            if self.state.video_reader not in PROJECTION_STAGE_READERS:
+                task.rendered_frame = frame
+            else:
+                task.preprocessed_frame = frame
+
+            task.end(self.stage_id)
+
+            self.finish_task(task)
+
+    def _open_pipe(self, stride, frame_start):
+        """
+        Starts the FFmpeg subprocess.
+        :return: read_frame(frame, is_first) that fills the frame and returns its position, None at the end.
+                 read_frame.next_frame is the position of the frame it reads next.
+        """
+        cmd, frame_size, _, _ = get_ffmpeg_read_cmd(
+            self.state,
+            frame_start,
+            frame_stride=stride,
+            use_frame_store=self.state.use_frame_store
+        )
+        log_vid.info(f"FFMPEG executing command: {' '.join(cmd)}")
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process = self.process
+
+        def read_frame(frame, is_first):
+            if read_into(process.stdout, frame) < frame_size:
+                if is_first:
+                    error_output = process.stderr.read().decode('utf-8', errors='replace')
+                    log_vid.error(f"FFMPEG could not read frames from this video\nFFMPEG command:\n{' '.join(cmd)}\nFFMPEG ERROR:\n{error_output}")
+                    raise FFMpegError(f"FFMPEG could not read frames from this video. See the log for details.")
+                return None
+            frame_pos = read_frame.next_frame
+            read_frame.next_frame += stride
+            return frame_pos
+
+        read_frame.next_frame = frame_start or 0
+        return read_frame
+
+    def _open_pyav(self, stride):
+        """
+        Opens the in process PyAV decoder, frame positions come from the frame timestamps.
+        :return: read_frame(frame, is_first) that fills the frame and returns its position, None at the end.
+        """
+        from script_generator.video.ffmpeg.pyav_reader import PyAVFrameReader  # Optional dependency
+
+        self.pyav_reader = PyAVFrameReader(self.state.video_info, self.state.video_reader, self.state.frame_start, stride)
+        log_vid.info(f"PyAV decoding with filters: {self.pyav_reader.vf}")
+
+        def read_frame(frame, is_first):
+            frame_pos = self.pyav_reader.read_into(frame)
+            if frame_pos is None and is_first:
+                raise FFMpegError(f"PyAV could not read frames from this video")
+            return frame_pos
+
+        return read_frame
+
+    def _close_pipe(self):
         if self.process:
             self.process.terminate()
             try:
@@ -73,3 +169,17 @@ class VideoWorker(AbstractTaskProcessor):
             except subprocess.TimeoutExpired:
                 self.process.kill()
             self.process = None
+
+    def stop_process(self):
+        # Called by the decoding thread when it ends and by the analyze task when it's stopped, the end is sent once
+        with self._end_lock:
+            if self._ended:
+                return
+            self._ended = True
+        super().stop_process()
+
+    def release(self):
+        log_vid.debug("Stopping FFmpeg reader")
+        self.read_frames = False
+        self.stop_process()
+        self._close_pipe()
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+from script_generator.constants import RENDER_RESOLUTION
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_REMAP
+from script_generator.video.util.remap_tables import load_or_build_remap_tables
+
+
+class VrTo2DRemapWorker(AbstractTaskProcessor):
+    """
+    Projects the decoded VR frames on the CPU with precomputed cv2.remap tables, the same view as the OpenGL
+    renderer without needing an OpenGL context. Also handles fisheye videos.
+    """
+    process_type = TaskProcessorTypes.REMAP
+    stage_id = STAGE_REMAP
+    supports_replicas = True  # cv2.remap releases the GIL, so the replicas project frames in parallel
+
+    def task_logic(self):
+        analyze_task = self.state.analyze_task
+        frame_pool = analyze_task.frame_pool
+        height, width = frame_pool.frames.shape[1:3]
+        map1, map2 = load_or_build_remap_tables(self.state.video_info, width, height)
+        projected = np.empty((RENDER_RESOLUTION, RENDER_RESOLUTION, 3), dtype=np.uint8)
+
+        for task in self.get_task():
+            task.start(self.stage_id)
+
+            cv2.remap(task.preprocessed_frame, map1, map2, cv2.INTER_LINEAR, dst=projected, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+            # Hand the decoded buffer back before waiting for a new one, holding both can starve the decoder
+            task.preprocessed_frame = None
+            analyze_task.release_frame(task)
+
+            buffer_index = None
+            while buffer_index is None and not self._stop_event.is_set():
+                buffer_index = frame_pool.acquire()
+            if buffer_index is None:
+                break
+
+            task.buffer_index = buffer_index
+            task.rendered_frame = frame_pool.frames[buffer_index]
+            np.copyto(task.rendered_frame, projected)
+
+            task.end(self.stage_id)
+            self.finish_task(task)
@@ -1,3 +1,5 @@
+import threading
+
 import glfw
 import numpy as np
 from OpenGL.GL import *
@@ -5,24 +7,34 @@ from OpenGL.GLU import *
 
 from script_generator.constants import RENDER_RESOLUTION, VR_TO_2D_PITCH
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+from script_generator.video.analyse_frame_task import STAGE_OPENGL
 from script_generator.video.opengl.helpers import create_180_dome, render_dome
 
 
 class VrTo2DWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.OPENGL
+    stage_id = STAGE_OPENGL
+    supports_replicas = True  # Every replica renders in its own context
 
-    def task_logic(self):
+    # GLFW is initialized once per process, the last replica to finish terminates it
+    _glfw_lock = threading.Lock()
+    _glfw_users = 0
 
-        # Initialize off-screen GLFW context
-        if not glfw.init():
-            raise RuntimeError("Could not initialize GLFW")
+    def task_logic(self):
 
-        # Create invisible window
-        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
-        window = glfw.create_window(RENDER_RESOLUTION, RENDER_RESOLUTION, "Offscreen", None, None)
-        if not window:
-            glfw.terminate()
-            raise RuntimeError("Failed to create GLFW window")
+        with VrTo2DWorker._glfw_lock:
+            # Initialize off-screen GLFW context
+            if VrTo2DWorker._glfw_users == 0 and not glfw.init():
+                raise RuntimeError("Could not initialize GLFW")
+
+            # Create invisible window
+            glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+            window = glfw.create_window(RENDER_RESOLUTION, RENDER_RESOLUTION, "Offscreen", None, None)
+            if not window:
+                if VrTo2DWorker._glfw_users == 0:
+                    glfw.terminate()
+                raise RuntimeError("Failed to create GLFW window")
+            VrTo2DWorker._glfw_users += 1
         glfw.make_context_current(window)
 
         # OpenGL config
@@ -60,13 +72,20 @@ class VrTo2DWorker(AbstractTaskProcessor):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
+        analyze_task = self.state.analyze_task
+        frame_pool = analyze_task.frame_pool
+
         for task in self.get_task():
-            task.start(str(self.process_type))
+            task.start(self.stage_id)
 
             # Upload to texture
             h, w, _ = task.preprocessed_frame.shape
             glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, w, h, 0, GL_RGB, GL_UNSIGNED_BYTE, task.preprocessed_frame)
 
+            # The texture holds a copy, so the decoded buffer can be recycled and reused for the rendered frame
+            task.preprocessed_frame = None
+            analyze_task.release_frame(task)
+
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
             glBindTexture(GL_TEXTURE_2D, texture_id)
             glCallList(dome_display_list)
@@ -76,13 +95,19 @@ class VrTo2DWorker(AbstractTaskProcessor):
             rendered_frame = np.frombuffer(pixels, dtype=np.uint8).reshape(
                 RENDER_RESOLUTION, RENDER_RESOLUTION, 3
             )
-            rendered_frame = np.flipud(rendered_frame)
+
+            buffer_index = None
+            while buffer_index is None and not self._stop_event.is_set():
+                buffer_index = frame_pool.acquire()
+            if buffer_index is None:
+                break
 
             # Store result
-            task.rendered_frame = rendered_frame
-            task.preprocessed_frame = None
+            task.buffer_index = buffer_index
+            task.rendered_frame = frame_pool.frames[buffer_index]
+            np.copyto(task.rendered_frame, np.flipud(rendered_frame))
 
-            task.end(str(self.process_type))
+            task.end(self.stage_id)
 
             # Debug
             # output_path = os.path.join(DEBUG_PATH, f"frame_{task.id:05d}.png")
@@ -93,5 +118,8 @@ class VrTo2DWorker(AbstractTaskProcessor):
         # Cleanup
         glDeleteLists(dome_display_list, 1)
         glDeleteTextures([texture_id])
-        glfw.destroy_window(window)
-        glfw.terminate()
+        with VrTo2DWorker._glfw_lock:
+            glfw.destroy_window(window)
+            VrTo2DWorker._glfw_users -= 1
+            if VrTo2DWorker._glfw_users == 0:
+                glfw.terminate()
@@ -0,0 +1,99 @@
+import io
+from types import SimpleNamespace
+
+import numpy as np
+
+from script_generator.constants import RENDER_RESOLUTION, YOLO_BATCH_SIZE
+from script_generator.scripts import analyze_videos_batched
+from script_generator.scripts.analyze_videos_batched import BatchedVideo, analyze_videos_batched as run
+
+FRAME_SIZE = RENDER_RESOLUTION * RENDER_RESOLUTION * 3
+
+
+class FakeProcess:
+    def __init__(self, frames):
+        self.stdout = io.BytesIO(frames)
+        self.stderr = io.BytesIO(b"invalid data")
+
+    def terminate(self):
+        pass
+
+    def wait(self, timeout=None):
+        pass
+
+    def kill(self):
+        pass
+
+
+def setup_videos(monkeypatch, videos):
+    """
+    :param videos: {video path: number of frames}, every frame of a video is filled with its index in the dict + 1.
+    """
+    stream = {
+        path: np.full(frames * FRAME_SIZE, index + 1, dtype=np.uint8).tobytes()
+        for index, (path, frames) in enumerate(videos.items())
+    }
+    monkeypatch.setattr(analyze_videos_batched, "get_video_info", lambda path: SimpleNamespace(path=path, fps=30, total_frames=videos[path]))
+    monkeypatch.setattr(analyze_videos_batched, "get_ffmpeg_read_cmd", lambda state, frame_start, video_info, **kwargs: (["ffmpeg", video_info.path], FRAME_SIZE, None, None))
+    monkeypatch.setattr(analyze_videos_batched.subprocess, "Popen", lambda cmd, **kwargs: FakeProcess(stream[cmd[-1]]))
+
+    # Only the end of a video runs a batch that isn't full
+    monkeypatch.setattr(analyze_videos_batched, "BATCH_FILL_TIMEOUT", 10)
+
+    events = []
+    monkeypatch.setattr(BatchedVideo, "add_result", lambda video, frame_pos, detections: events.append(("result", video.video_path, frame_pos, detections)))
+    monkeypatch.setattr(BatchedVideo, "save", lambda video: events.append(("save", video.video_path)))
+    return events
+
+
+def create_state(model_path="model.pt"):
+    return SimpleNamespace(
+        yolo_model=object(), yolo_model_path=model_path, detection_stride=1, frame_start=0, frame_end=None,
+        queue_memory_budget_mb=0, use_frame_store=False
+    )
+
+
+def detect_frame_values(batches):
+    # The "detections" of a frame are the value it is filled with, which tells the video it came from
+    def detect(model, frames):
+        batches.append(len(frames))
+        return [int(frame[0, 0, 0]) for frame in frames]
+    return detect
+
+
+def test_results_are_routed_to_their_video_and_flushed_before_it_is_saved(monkeypatch):
+    events = setup_videos(monkeypatch, {"a.mp4": 3, "b.mp4": 5})
+    batches = []
+    monkeypatch.setattr(analyze_videos_batched, "detect", detect_frame_values(batches))
+
+    done = run(create_state(), ["a.mp4", "b.mp4"])
+
+    assert sorted(done) == ["a.mp4", "b.mp4"]
+    for index, (path, frames) in enumerate([("a.mp4", 3), ("b.mp4", 5)]):
+        results = [event for event in events if event[0] == "result" and event[1] == path]
+        assert [frame_pos for _, _, frame_pos, _ in results] == list(range(frames))
+        assert all(detections == index + 1 for _, _, _, detections in results)
+        # Every frame of the video is tracked before its records are saved
+        assert events.index(("save", path)) > events.index(results[-1])
+    assert sum(batches) == 8
+
+
+def test_fixed_batch_engines_get_padded_batches(monkeypatch):
+    setup_videos(monkeypatch, {"a.mp4": 2})
+    batches = []
+    monkeypatch.setattr(analyze_videos_batched, "detect", detect_frame_values(batches))
+
+    assert run(create_state("model.engine"), ["a.mp4"]) == ["a.mp4"]
+    assert batches == [YOLO_BATCH_SIZE]
+
+
+def test_a_failing_decoder_does_not_stop_the_other_videos(monkeypatch):
+    events = setup_videos(monkeypatch, {"broken.mp4": 0, "b.mp4": 4})
+    monkeypatch.setattr(analyze_videos_batched, "detect", detect_frame_values([]))
+
+    done = run(create_state(), ["broken.mp4", "b.mp4"])
+
+    assert done == ["b.mp4"]
+    assert ("save", "broken.mp4") not in events
+    assert [event[2] for event in events if event[0] == "result"] == [0, 1, 2, 3]
+    assert all(event[1] == "b.mp4" for event in events if event[0] == "result")
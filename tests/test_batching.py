@@ -0,0 +1,130 @@
+import queue
+
+import numpy as np
+
+from script_generator.object_detection.util.batching import AdaptiveBatchSizer, SAMPLES_PER_SIZE
+from script_generator.object_detection.workers import yolo_process_worker
+from script_generator.object_detection.workers.yolo_process_worker import YoloProcessWorker
+
+
+def batch_seconds(size):
+    # Fixed overhead per batch, bigger batches have a better throughput
+    return 0.02 + size * 0.002
+
+
+def run_full_batches(sizer, count, queued=1000, seconds=batch_seconds):
+    for _ in range(count):
+        sizer.record(sizer.size, seconds(sizer.size), queued)
+
+
+def test_climbs_while_bigger_batches_are_faster():
+    sizer = AdaptiveBatchSizer(max_size=128, max_latency=10)
+    start = sizer.size
+
+    run_full_batches(sizer, SAMPLES_PER_SIZE)
+    assert sizer.size > start
+
+    run_full_batches(sizer, SAMPLES_PER_SIZE * 20)
+    assert sizer.size == 128
+
+
+def test_only_climbs_when_enough_frames_are_queued():
+    sizer = AdaptiveBatchSizer(max_size=128, max_latency=10)
+    start = sizer.size
+
+    run_full_batches(sizer, SAMPLES_PER_SIZE * 3, queued=start)
+    assert sizer.size == start
+
+
+def test_partial_batches_are_not_measured():
+    sizer = AdaptiveBatchSizer(max_size=128, max_latency=10)
+    start = sizer.size
+    for _ in range(SAMPLES_PER_SIZE * 3):
+        sizer.record(start // 2, batch_seconds(start // 2), 1000)
+
+    assert sizer.size == start
+    assert sizer.fps == {}
+    assert sizer.frames == start // 2 * SAMPLES_PER_SIZE * 3
+
+
+def test_backs_off_when_a_batch_takes_too_long():
+    sizer = AdaptiveBatchSizer(max_size=128, max_latency=0.1)
+    start = sizer.size
+
+    sizer.record(start, 0.5, 1000)
+
+    assert sizer.size < start
+    assert start in sizer.too_slow
+    # The too slow size isn't tried again
+    run_full_batches(sizer, SAMPLES_PER_SIZE * 5, seconds=lambda size: 0.05)
+    assert sizer.size < start
+
+
+def test_steps_back_down_when_the_smaller_size_was_faster():
+    sizer = AdaptiveBatchSizer(max_size=128, max_latency=10)
+    start = sizer.size
+    run_full_batches(sizer, SAMPLES_PER_SIZE)
+    bigger = sizer.size
+
+    # The bigger batch turns out slower per frame
+    run_full_batches(sizer, SAMPLES_PER_SIZE, seconds=lambda size: size * 0.1)
+    assert sizer.size == start
+    assert bigger in sizer.fps
+
+
+def test_max_size_bounds_the_sizes():
+    sizer = AdaptiveBatchSizer(max_size=10, max_latency=10)
+    run_full_batches(sizer, SAMPLES_PER_SIZE * 20)
+    assert sizer.size == 8
+
+
+def test_fixed_size_never_changes():
+    sizer = AdaptiveBatchSizer(fixed_size=30, max_size=128, max_latency=0.01)
+    run_full_batches(sizer, SAMPLES_PER_SIZE * 5, seconds=lambda size: 1.0)
+    sizer.record(3, 1.0, 1000)
+
+    assert sizer.size == 30
+    assert sizer.to_dict()["fixed"]
+    assert sizer.to_dict()["batches_per_size"] == {"3": 1, "30": SAMPLES_PER_SIZE * 5}
+
+
+class FakeSlab:
+    def __init__(self, slots):
+        self.frames = np.zeros((slots, 4, 4, 3), dtype=np.uint8)
+        self.released = []
+
+    def release(self, slot):
+        self.released.append(slot)
+
+
+def test_fixed_batch_models_always_get_a_padded_full_batch(monkeypatch):
+    batches = []
+
+    def detect(model, frames):
+        batches.append(len(frames))
+        return [f"detections {i}" for i in range(len(frames))]
+
+    monkeypatch.setattr(yolo_process_worker, "detect", detect)
+    slab = FakeSlab(8)
+    output_queue = queue.Queue()
+    sizer = AdaptiveBatchSizer(fixed_size=5)
+    batch = [(frame_pos, slot, {}, 0) for slot, frame_pos in enumerate([10, 11, 12])]
+
+    YoloProcessWorker.process_batch(object(), sizer, slab, batch, queue.Queue(), output_queue)
+
+    assert batches == [5]
+    assert slab.released == [0, 1, 2]
+    results = [output_queue.get_nowait() for _ in range(output_queue.qsize())]
+    assert [(frame_pos, detections) for frame_pos, detections, _, _ in results] == [(10, "detections 0"), (11, "detections 1"), (12, "detections 2")]
+
+
+def test_dynamic_batch_models_are_not_padded(monkeypatch):
+    batches = []
+    monkeypatch.setattr(yolo_process_worker, "detect", lambda model, frames: batches.append(len(frames)) or [None] * len(frames))
+    sizer = AdaptiveBatchSizer()
+    batch = [(frame_pos, frame_pos, {}, 0) for frame_pos in range(3)]
+
+    YoloProcessWorker.process_batch(object(), sizer, FakeSlab(8), batch, queue.Queue(), queue.Queue())
+
+    assert batches == [3]
+    assert sizer.batches == {3: 1}
@@ -0,0 +1,108 @@
+import numpy as np
+
+from script_generator.object_detection.data_classes.detections import Detections
+from script_generator.object_detection.util.byte_tracker import ByteTracker, assign, box_iou_matrix
+
+
+def detections(*boxes):
+    """
+    :param boxes: (x1, y1, x2, y2, score, cls) per detection.
+    """
+    if not boxes:
+        return Detections(xywh=np.empty((0, 4), dtype=np.float32), cls=np.empty(0, dtype=np.int32), conf=np.empty(0, dtype=np.float32))
+    b = np.array(boxes, dtype=np.float32)
+    return Detections(
+        xywh=np.stack([(b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2, b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]], axis=1),
+        cls=b[:, 5].astype(np.int32),
+        conf=b[:, 4]
+    )
+
+
+def test_box_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    np.testing.assert_allclose(box_iou_matrix(a, b), [[1, 1 / 3, 0]], atol=1e-6)
+
+
+def test_assign_matches_the_lowest_cost_first():
+    cost = np.array([[0.1, 0.2], [0.15, 0.9]])
+    assert assign(cost, 0.5) == ([(0, 0)], [1], [1])
+
+
+def test_keeps_the_ids_of_moving_objects():
+    tracker = ByteTracker()
+    ids = []
+    for frame in range(10):
+        result = tracker.update(detections((100 + frame * 2, 100, 200 + frame * 2, 200, 0.9, 0), (400, 100, 500, 200, 0.8, 1)))
+        ids.append(result.ids.tolist())
+
+    assert ids[0] == [1, 2]
+    assert all(frame_ids == [1, 2] for frame_ids in ids)
+    np.testing.assert_allclose(result.xyxy[0], [118, 100, 218, 200], atol=2)
+
+
+def test_finds_a_lost_track_again_within_the_track_buffer():
+    tracker = ByteTracker(frame_rate=30)
+    box = (100, 100, 200, 200, 0.9, 0)
+    for _ in range(5):
+        tracker.update(detections(box))
+
+    for _ in range(20):
+        assert len(tracker.update(detections())) == 0
+    assert len(tracker.lost) == 1
+
+    assert tracker.update(detections(box)).ids.tolist() == [1]
+
+
+def test_removes_a_track_lost_for_longer_than_the_track_buffer():
+    # Half the frame rate, the track buffer is 15 frames
+    tracker = ByteTracker(frame_rate=15)
+    box = (100, 100, 200, 200, 0.9, 0)
+    for _ in range(5):
+        tracker.update(detections(box))
+
+    for _ in range(20):
+        tracker.update(detections())
+    assert tracker.lost == []
+
+    # A new track is only confirmed by its second detection
+    assert len(tracker.update(detections(box))) == 0
+    assert tracker.update(detections(box)).ids.tolist() == [2]
+
+
+def test_continues_a_track_with_a_low_confidence_detection():
+    tracker = ByteTracker()
+    for _ in range(3):
+        tracker.update(detections((100, 100, 200, 200, 0.9, 0)))
+
+    result = tracker.update(detections((102, 100, 202, 200, 0.15, 0)))
+
+    assert result.ids.tolist() == [1]
+    np.testing.assert_allclose(result.conf, [0.15])
+
+
+def test_low_confidence_detections_do_not_start_tracks():
+    tracker = ByteTracker()
+    for _ in range(3):
+        assert len(tracker.update(detections((100, 100, 200, 200, 0.15, 0)))) == 0
+    assert tracker.tracked == []
+
+
+def test_empty_detections():
+    tracker = ByteTracker()
+    result = tracker.update(detections())
+
+    assert len(result) == 0
+    assert result.xywh.shape == (0, 4)
+    assert result.ids.shape == (0,)
+
+    # Tracking starts normally after an empty frame, the new track is confirmed by its second detection
+    tracker.update(detections((0, 0, 50, 50, 0.9, 0)))
+    assert tracker.update(detections((0, 0, 50, 50, 0.9, 0))).ids.tolist() == [1]
+
+
+def test_reset_starts_the_ids_over():
+    tracker = ByteTracker()
+    tracker.update(detections((0, 0, 50, 50, 0.9, 0)))
+    tracker.reset()
+    assert tracker.update(detections((300, 300, 350, 350, 0.9, 0))).ids.tolist() == [1]
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from script_generator.object_detection.util import checkpoint as checkpoint_module
+from script_generator.object_detection.util.checkpoint import YoloCheckpoint
+from script_generator.utils import msgpack_utils
+
+
+def record(frame_pos, track_id=1):
+    return [frame_pos, 0, 0.9, 0, 0, 50, 50, track_id]
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    path = str(tmp_path / "video_rawyolo_checkpoint.msgpack")
+    monkeypatch.setattr(checkpoint_module, "get_raw_yolo_checkpoint_path", lambda state: path)
+    return SimpleNamespace(frame_start=None, frame_end=None, yolo_model_path="model.pt", detection_stride=1)
+
+
+def run(state, records, last_frame, run_start=0):
+    checkpoint = YoloCheckpoint.load_or_create(state)
+    checkpoint.start_run(run_start)
+    checkpoint.save(records, last_frame)
+    return checkpoint
+
+
+def test_resumes_the_saved_records(state):
+    records = [record(f) for f in range(10)]
+    checkpoint = YoloCheckpoint.load_or_create(state)
+    checkpoint.start_run(0)
+    checkpoint.save(records[:5], 4)
+    checkpoint.save(records, 9)
+
+    resumed = YoloCheckpoint.load_or_create(state)
+
+    assert resumed.next_frame == 10
+    assert [r[0] for r in resumed.parts[0]["data"]] == list(range(10))
+
+
+def test_ignores_a_checkpoint_of_another_detection_stride(state):
+    run(state, [record(f) for f in range(10)], 9)
+
+    state.detection_stride = 2
+    assert YoloCheckpoint.load_or_create(state).parts == []
+
+
+def test_a_crash_while_rewriting_keeps_the_previous_parts(state, monkeypatch):
+    checkpoint = run(state, [record(f) for f in range(10)], 9)
+    # A crash while appending left an incomplete chunk behind
+    with open(checkpoint.path, "ab") as f:
+        f.write(b"\x83\xa4part")
+    resumed = YoloCheckpoint.load_or_create(state)
+    assert resumed.next_frame == 10
+    resumed.start_run(8)
+
+    def crash(src, dst):
+        raise OSError("crashed")
+
+    # The first save of the resumed run writes the whole stream, the crash happens before it replaces the file
+    replace = msgpack_utils.os.replace
+    monkeypatch.setattr(msgpack_utils.os, "replace", crash)
+    with pytest.raises(OSError):
+        resumed.save([record(f) for f in range(8, 20)], 19)
+    monkeypatch.setattr(msgpack_utils.os, "replace", replace)
+
+    assert YoloCheckpoint.load_or_create(state).next_frame == 10
+
+
+def test_later_saves_only_append(state):
+    checkpoint = run(state, [record(f) for f in range(10)], 9)
+    size = os.path.getsize(checkpoint.path)
+
+    checkpoint.save([record(f) for f in range(11)], 10)
+
+    assert os.path.getsize(checkpoint.path) - size < size
+    assert YoloCheckpoint.load_or_create(state).next_frame == 11
@@ -0,0 +1,120 @@
+import threading
+from types import SimpleNamespace
+
+from script_generator.video.util import decode_chunks
+from script_generator.video.util.decode_chunks import DecodeChunkScheduler, split_decode_chunks
+
+
+def test_split_covers_the_range_with_a_partial_last_chunk():
+    assert split_decode_chunks(0, 250, 100) == [(0, 100), (100, 200), (200, 250)]
+
+
+def test_split_single_chunk_when_the_range_is_shorter():
+    assert split_decode_chunks(10, 50, 100) == [(10, 50)]
+
+
+def test_split_aligns_the_chunk_starts_on_the_stride():
+    chunks = split_decode_chunks(5, 300, 100, stride=3)
+
+    assert chunks == [(5, 107), (107, 209), (209, 300)]
+    # Every chunk decodes the same frame positions a single decoder would
+    positions = [pos for start, end in chunks for pos in range(start, end, 3)]
+    assert positions == list(range(5, 300, 3))
+
+
+def test_split_starts_the_chunks_at_keyframes():
+    keyframes = [0, 90, 130, 250, 380]
+    assert split_decode_chunks(0, 400, 100, keyframes=keyframes) == [(0, 130), (130, 250), (250, 380), (380, 400)]
+
+
+def test_split_keeps_the_stride_when_a_keyframe_is_off_it():
+    assert split_decode_chunks(0, 300, 100, stride=4, keyframes=[0, 101, 250]) == [(0, 104), (104, 252), (252, 300)]
+
+
+def test_split_ends_at_the_last_keyframe():
+    # No keyframe after frame 150, the last decoder reads on to the end
+    assert split_decode_chunks(0, 1000, 100, keyframes=[0, 150]) == [(0, 150), (150, 1000)]
+
+
+def test_split_drops_a_chunk_that_would_start_at_the_end():
+    assert split_decode_chunks(0, 200, 100, stride=3) == [(0, 102), (102, 200)]
+    assert split_decode_chunks(0, 101, 100, stride=3) == [(0, 101)]
+
+
+def test_scheduler_hands_out_the_chunks_in_order():
+    scheduler = DecodeChunkScheduler([(0, 10), (10, 20)], max_ahead=5)
+    assert scheduler.next_chunk() == (0, 0, 10)
+    assert scheduler.next_chunk() == (1, 10, 20)
+    assert scheduler.next_chunk() is None
+
+
+def test_scheduler_holds_a_decoder_that_runs_too_far_ahead():
+    scheduler = DecodeChunkScheduler([(0, 100), (100, 200)], max_ahead=50)
+    stop_event = threading.Event()
+    scheduler.next_chunk()
+    scheduler.next_chunk()
+
+    # The decoder of the earliest chunk never waits
+    assert scheduler.wait_turn(0, 0, stop_event)
+
+    result = []
+    waiting = threading.Thread(target=lambda: result.append(scheduler.wait_turn(1, 100, stop_event)))
+    waiting.start()
+    waiting.join(timeout=0.2)
+    assert waiting.is_alive()
+
+    scheduler.wait_turn(0, 50, stop_event)
+    waiting.join(timeout=5)
+    assert result == [True]
+
+
+def test_scheduler_releases_the_waiting_decoders_when_a_chunk_finishes():
+    scheduler = DecodeChunkScheduler([(0, 100), (100, 200)], max_ahead=10)
+    stop_event = threading.Event()
+    scheduler.next_chunk()
+    scheduler.next_chunk()
+    scheduler.wait_turn(0, 0, stop_event)
+
+    result = []
+    waiting = threading.Thread(target=lambda: result.append(scheduler.wait_turn(1, 150, stop_event)))
+    waiting.start()
+    scheduler.finish_chunk(0)
+    waiting.join(timeout=5)
+    assert result == [True]
+
+
+def test_scheduler_wait_returns_false_when_stopped():
+    scheduler = DecodeChunkScheduler([(0, 100), (100, 200)], max_ahead=10)
+    stop_event = threading.Event()
+    scheduler.next_chunk()
+    scheduler.next_chunk()
+    scheduler.wait_turn(0, 0, stop_event)
+
+    stop_event.set()
+    assert not scheduler.wait_turn(1, 150, stop_event)
+
+
+def create_state(frame_end=None, total_frames=1000, stride=1):
+    return SimpleNamespace(
+        detection_stride=stride, frame_start=None, frame_end=frame_end,
+        video_info=SimpleNamespace(total_frames=total_frames, fps=30)
+    )
+
+
+def test_create_scheduler_reads_the_last_chunk_to_the_end_of_the_video(monkeypatch):
+    monkeypatch.setattr(decode_chunks, "load_or_build_keyframe_index", lambda state: None)
+
+    scheduler = decode_chunks.create_decode_scheduler(create_state(), replicas=2, max_pending=64)
+
+    assert scheduler.chunks[0][0] == 0
+    assert scheduler.chunks[-1][1] is None
+    assert all(a[1] == b[0] for a, b in zip(scheduler.chunks, scheduler.chunks[1:]))
+
+
+def test_create_scheduler_ends_at_the_requested_frame(monkeypatch):
+    monkeypatch.setattr(decode_chunks, "load_or_build_keyframe_index", lambda state: None)
+
+    scheduler = decode_chunks.create_decode_scheduler(create_state(frame_end=500, stride=2), replicas=2, max_pending=64)
+
+    assert scheduler.chunks[-1][1] == 500
+    assert all(start % 2 == 0 for start, _ in scheduler.chunks)
@@ -0,0 +1,56 @@
+import os
+
+from script_generator.utils.file_cache import FileKeyedCache
+
+
+def create_file(tmp_path, name, content=b"video"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_returns_the_value_of_an_unchanged_file(tmp_path):
+    cache = FileKeyedCache(str(tmp_path / "cache"), version=1)
+    video = create_file(tmp_path, "a.mp4")
+    cache.put(video, {"fps": 30})
+
+    assert cache.get(video) == {"fps": 30}
+    # Another process opening the same cache sees the entry
+    assert FileKeyedCache(str(tmp_path / "cache"), version=1).get(video) == {"fps": 30}
+
+
+def test_ignores_the_entry_of_a_changed_file(tmp_path):
+    cache = FileKeyedCache(str(tmp_path / "cache"), version=1)
+    video = create_file(tmp_path, "a.mp4")
+    cache.put(video, {"fps": 30})
+
+    create_file(tmp_path, "a.mp4", b"re-encoded video")
+    assert cache.get(video) is None
+
+
+def test_ignores_entries_of_another_version(tmp_path):
+    video = create_file(tmp_path, "a.mp4")
+    FileKeyedCache(str(tmp_path / "cache"), version=1).put(video, {"fps": 30})
+
+    assert FileKeyedCache(str(tmp_path / "cache"), version=2).get(video) is None
+
+
+def test_writes_one_file_per_entry(tmp_path):
+    cache = FileKeyedCache(str(tmp_path / "cache"), version=1)
+    videos = [create_file(tmp_path, f"{i}.mp4") for i in range(3)]
+    for i, video in enumerate(videos):
+        cache.put(video, i)
+
+    assert len(os.listdir(tmp_path / "cache")) == 3
+    assert [cache.get(video) for video in videos] == [0, 1, 2]
+
+
+def test_ignores_an_unreadable_entry(tmp_path):
+    cache = FileKeyedCache(str(tmp_path / "cache"), version=1)
+    video = create_file(tmp_path, "a.mp4")
+    cache.put(video, 1)
+    entry_path = os.path.join(tmp_path, "cache", os.listdir(tmp_path / "cache")[0])
+    with open(entry_path, "w") as f:
+        f.write("{")
+
+    assert cache.get(video) is None
@@ -0,0 +1,40 @@
+from script_generator.object_detection.util.interpolation import BoxInterpolator, is_synthetic_record
+
+
+def record(frame_pos, x1, track_id=1, cls=0, conf=0.8):
+    return [frame_pos, cls, conf, x1, 0, x1 + 10, 10, track_id]
+
+
+def test_interpolates_tracks_between_detected_frames():
+    interpolator = BoxInterpolator(stride=3)
+    assert interpolator.interpolate(0, [record(0, 0)]) == []
+
+    synthetic = interpolator.interpolate(3, [record(3, 30), record(3, 50, track_id=2)])
+
+    assert [r[0] for r in synthetic] == [1, 2]
+    assert [r[3] for r in synthetic] == [10, 20]
+    assert all(is_synthetic_record(r) and r[7] == 1 for r in synthetic)
+
+
+def test_does_not_fill_gaps_larger_than_the_stride():
+    interpolator = BoxInterpolator(stride=2)
+    interpolator.interpolate(0, [record(0, 0)])
+    assert interpolator.interpolate(10, [record(10, 100)]) == []
+
+
+def test_flush_holds_the_last_boxes_until_the_end_of_the_run():
+    interpolator = BoxInterpolator(stride=3)
+    interpolator.interpolate(0, [record(0, 0)])
+    interpolator.interpolate(3, [record(3, 30)])
+
+    tail = interpolator.flush(end_frame=10)
+
+    assert [r[0] for r in tail] == [4, 5]
+    assert all(r[3] == 30 and is_synthetic_record(r) for r in tail)
+
+
+def test_flush_stops_at_the_end_frame():
+    interpolator = BoxInterpolator(stride=3)
+    interpolator.interpolate(6, [record(6, 0)])
+    assert [r[0] for r in interpolator.flush(end_frame=8)] == [7]
+    assert interpolator.flush(end_frame=8) == []
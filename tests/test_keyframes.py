@@ -0,0 +1,44 @@
+from script_generator.video.util.keyframes import KeyframeIndex
+
+
+def test_keyframe_before():
+    index = KeyframeIndex([0, 30, 60])
+    assert index.keyframe_before(0) == 0
+    assert index.keyframe_before(29) == 0
+    assert index.keyframe_before(30) == 30
+    assert index.keyframe_before(45) == 30
+    assert index.keyframe_before(1000) == 60
+
+
+def test_keyframe_before_without_a_keyframe_at_the_start():
+    assert KeyframeIndex([12, 42]).keyframe_before(5) == 0
+
+
+def test_parse_keyframes_only_takes_keyframe_packets():
+    output = "\n".join([
+        "packet,0.000000,0.000000,K__",
+        "packet,0.033333,0.033333,___",
+        "packet,1.000000,1.000000,K__",
+        "packet,N/A,2.000000,K__",
+        "stream,0.000000",
+    ])
+    assert KeyframeIndex.parse_keyframes(output, fps=30) == [0, 30, 60]
+
+
+def test_parse_keyframes_counts_from_the_stream_start():
+    # Streams that don't start at 0 (e.g. cut transport streams) would otherwise shift every keyframe
+    output = "\n".join([
+        "packet,1.400000,1.400000,K__",
+        "packet,2.400000,2.400000,K__",
+        "packet,3.400000,3.400000,K__",
+        "stream,1.400000",
+    ])
+    index = KeyframeIndex(KeyframeIndex.parse_keyframes(output, fps=30))
+
+    assert index.keyframes == [0, 30, 60]
+    assert index.keyframe_before(59) == 30
+
+
+def test_parse_keyframes_without_a_stream_start():
+    output = "packet,0.500000,0.500000,K__\nstream,N/A"
+    assert KeyframeIndex.parse_keyframes(output, fps=30) == [15]
@@ -0,0 +1,115 @@
+import numpy as np
+
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine, _greedy_nms, get_letterbox, non_max_suppression
+
+
+def make_prediction(frames, classes=2, anchors=8):
+    """
+    :param frames: Per frame a list of (center x, center y, width, height, class, score).
+    :return: Raw (batch, 4 + classes, anchors) detection head output, unused anchors score 0.
+    """
+    prediction = np.zeros((len(frames), 4 + classes, anchors), dtype=np.float32)
+    for i, boxes in enumerate(frames):
+        for anchor, (x, y, w, h, cls, score) in enumerate(boxes):
+            prediction[i, :4, anchor] = x, y, w, h
+            prediction[i, 4 + cls, anchor] = score
+    return prediction
+
+
+def test_greedy_nms_keeps_boxes_in_score_order():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], dtype=np.float32)
+    assert _greedy_nms(boxes, 0.5).tolist() == [0, 2]
+    # The overlap of the first two boxes is 81 / 119, below this threshold both stay
+    assert _greedy_nms(boxes, 0.7).tolist() == [0, 1, 2]
+
+
+def test_nms_suppresses_overlapping_boxes_of_the_same_class_only():
+    prediction = make_prediction([[
+        (50, 50, 20, 20, 0, 0.9),
+        (51, 51, 20, 20, 0, 0.8),  # Same object, same class
+        (50, 50, 20, 20, 1, 0.7),  # Same place, other class
+    ]])
+
+    [det] = non_max_suppression(prediction, conf_threshold=0.3, iou_threshold=0.5)
+
+    assert det[:, 5].tolist() == [0, 1]
+    np.testing.assert_allclose(det[:, 4], [0.9, 0.7])
+    np.testing.assert_allclose(det[0, :4], [40, 40, 60, 60])
+
+
+def test_nms_drops_boxes_below_the_confidence_threshold():
+    prediction = make_prediction([
+        [(50, 50, 20, 20, 0, 0.9), (150, 150, 20, 20, 1, 0.2)],
+        [(50, 50, 20, 20, 0, 0.1)],
+    ])
+
+    first, second = non_max_suppression(prediction, conf_threshold=0.3, iou_threshold=0.5)
+
+    assert len(first) == 1 and first[0, 4] > 0.3
+    assert second.shape == (0, 6)
+
+
+def test_nms_keeps_at_most_max_det_boxes_with_the_highest_confidence():
+    boxes = [(i * 30 + 15, 15, 20, 20, 0, 0.4 + i * 0.1) for i in range(5)]
+    [det] = non_max_suppression(make_prediction([boxes]), conf_threshold=0.3, iou_threshold=0.5, max_det=2)
+
+    np.testing.assert_allclose(det[:, 4], [0.8, 0.7])
+
+
+def test_letterbox_fits_the_frame_into_the_square_input():
+    assert get_letterbox((720, 1280, 3), 640) == (0.5, 0, 140, 640, 360)
+    assert get_letterbox((640, 640, 3), 640) == (1, 0, 0, 640, 640)
+
+
+class FakeSession:
+    def __init__(self, prediction):
+        self.prediction = prediction
+        self.batches = []
+
+    def run(self, outputs, feed):
+        batch = next(iter(feed.values()))
+        self.batches.append(batch.shape)
+        return [self.prediction[:len(batch)]]
+
+
+def create_engine(prediction, batch_size=None, imgsz=640):
+    # Skips the onnxruntime session, the engine only needs its run method
+    engine = OnnxYoloEngine.__new__(OnnxYoloEngine)
+    engine.session = FakeSession(prediction)
+    engine.input_name = "images"
+    engine.batch_size = batch_size
+    engine.imgsz = imgsz
+    engine.conf, engine.iou, engine.max_det = 0.3, 0.7, 300
+    engine._frames = engine._input = None
+    return engine
+
+
+def test_predict_maps_the_boxes_back_to_the_frame():
+    # Box (100, 100) - (300, 200) of a 1280x720 frame is (50, 190) - (150, 240) in the letterboxed input
+    engine = create_engine(make_prediction([[(100, 215, 100, 50, 1, 0.9)]]))
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    [det] = engine.predict([frame])
+
+    np.testing.assert_allclose(det.xyxy, [[100, 100, 300, 200]], atol=1e-4)
+    assert det.cls.tolist() == [1]
+    assert det.ids is None
+
+
+def test_predict_clips_the_boxes_to_the_frame():
+    engine = create_engine(make_prediction([[(10, 150, 40, 40, 0, 0.9)]]))
+
+    [det] = engine.predict([np.zeros((720, 1280, 3), dtype=np.uint8)])
+
+    np.testing.assert_allclose(det.xyxy, [[0, 0, 60, 60]], atol=1e-4)
+
+
+def test_predict_runs_fixed_batch_models_in_full_batches():
+    prediction = make_prediction([[(320, 320, 40, 40, 0, 0.9)]] * 2)
+    engine = create_engine(prediction, batch_size=2)
+    frames = [np.zeros((640, 640, 3), dtype=np.uint8)] * 3
+
+    detections = engine.predict(frames)
+
+    assert len(detections) == 3
+    assert engine.session.batches == [(2, 3, 640, 640), (2, 3, 640, 640)]
@@ -0,0 +1,151 @@
+import queue
+import threading
+
+from script_generator.tasks.util.pipeline_graph import PipelineGraph, ReorderChannel, ResultSink, Stage, StageChannel
+
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+def create_channel(producers=1, consumers=1, first_key=0, step=1, max_pending=64, on_drop=None, maxsize=0):
+    inner = queue.Queue(maxsize=maxsize)
+    channel = ReorderChannel(inner, producers, consumers, first_key, step, max_pending, key=lambda item: item, on_drop=on_drop)
+    return channel, inner
+
+
+def test_reorders_out_of_order_items():
+    channel, inner = create_channel(step=2)
+    for item in [4, 2, 0, 8, 6]:
+        channel.put(item)
+    assert drain(inner) == [0, 2, 4, 6, 8]
+
+
+def test_holds_items_until_the_missing_one_arrives():
+    channel, inner = create_channel()
+    channel.put(1)
+    channel.put(2)
+    assert drain(inner) == []
+    assert channel.qsize() == 2
+
+    channel.put(0)
+    assert drain(inner) == [0, 1, 2]
+
+
+def test_skips_a_missing_item_when_too_many_are_pending():
+    channel, inner = create_channel(max_pending=2)
+    channel.put(1)
+    channel.put(2)
+    assert drain(inner) == []
+
+    channel.put(3)  # 0 is assumed lost
+    assert drain(inner) == [1, 2, 3]
+
+
+def test_drops_an_item_that_arrives_after_it_was_skipped():
+    dropped = []
+    channel, inner = create_channel(max_pending=2, on_drop=dropped.append)
+    for item in [1, 2, 3]:
+        channel.put(item)
+    drain(inner)
+
+    channel.put(0)
+    assert drain(inner) == []
+    assert dropped == [0]
+
+
+def test_sentinel_flushes_pending_items_once_all_producers_are_done():
+    channel, inner = create_channel(producers=2, consumers=3)
+    channel.put(1)
+    channel.put(3)
+    channel.put(None)
+    assert drain(inner) == []  # One producer is still running
+
+    channel.put(None)
+    assert drain(inner) == [1, 3, None, None, None]
+
+
+def test_concurrent_producers_keep_the_order():
+    # The frame pool bounds how far a producer runs ahead in the pipeline, here max_pending has to
+    channel, inner = create_channel(producers=4, max_pending=400, maxsize=8)
+    received = []
+
+    def consume():
+        while True:
+            item = inner.get()
+            if item is None:
+                return
+            received.append(item)
+
+    def produce(offset):
+        for item in range(offset, 400, 4):
+            channel.put(item)
+        channel.put(None)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    producers = [threading.Thread(target=produce, args=(offset,)) for offset in range(4)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join(timeout=10)
+    consumer.join(timeout=10)
+
+    assert received == list(range(400))
+
+
+def test_stage_channel_passes_the_end_on_after_the_last_producer():
+    inner = queue.Queue()
+    channel = StageChannel(inner, producers=2, consumers=2)
+    channel.put("a")
+    channel.put(None)
+    assert drain(inner) == ["a"]
+    channel.put(None)
+    assert drain(inner) == [None, None]
+
+
+class FakeWorker:
+    supports_replicas = True
+
+    def __init__(self, state, output_queue, input_queue=None):
+        self.name = "worker"
+
+
+def build_graph(*stages):
+    graph = PipelineGraph(state=None, stages=list(stages))
+    graph.build(lambda stage: queue.Queue(), ResultSink(), first_key=0)
+    return graph
+
+
+def test_only_the_first_ordered_stage_after_replicated_stages_reorders():
+    graph = build_graph(
+        Stage("decode", FakeWorker, replicas=2),
+        Stage("yolo", FakeWorker),
+        Stage("tracking", FakeWorker, ordered=True),
+        Stage("analysis", FakeWorker, ordered=True),
+    )
+
+    assert type(graph.channels["yolo"]) is StageChannel
+    assert type(graph.channels["tracking"]) is ReorderChannel
+    # The single tracking worker passes its frames on in order
+    assert type(graph.channels["analysis"]) is StageChannel
+
+
+def test_a_replicated_stage_after_a_reorder_buffer_needs_another_one():
+    graph = build_graph(
+        Stage("decode", FakeWorker, replicas=2),
+        Stage("tracking", FakeWorker, ordered=True),
+        Stage("remap", FakeWorker, replicas=3),
+        Stage("analysis", FakeWorker, ordered=True),
+    )
+
+    assert type(graph.channels["tracking"]) is ReorderChannel
+    assert type(graph.channels["analysis"]) is ReorderChannel
+
+
+def test_no_reorder_buffer_without_replicated_stages():
+    graph = build_graph(Stage("decode", FakeWorker), Stage("tracking", FakeWorker, ordered=True))
+    assert type(graph.channels["tracking"]) is StageChannel
@@ -0,0 +1,27 @@
+from script_generator.debug import pipeline_profile
+from script_generator.debug.pipeline_profile import LatencyHistogram, PipelineProfiler
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+
+    assert histogram.count == 100
+    assert 0.050 <= histogram.percentile(50) <= 0.050 * 1.1
+    assert histogram.percentile(100) == 0.1
+
+
+def test_queue_samples_are_thinned_out_over_a_long_run(monkeypatch):
+    monkeypatch.setattr(pipeline_profile, "MAX_QUEUE_SAMPLES", 10)
+    profiler = PipelineProfiler()
+
+    for i in range(1000):
+        profiler.sample_queues({"YOLO": i})
+
+    samples = [sample["YOLO"] for sample in profiler.to_dict()["queue_depths"]]
+    assert len(samples) < 10
+    # Still spread evenly over the whole run
+    assert samples[0] == 0
+    assert len({b - a for a, b in zip(samples, samples[1:])}) == 1
+    assert samples[-1] > 1000 - 2 * (samples[1] - samples[0])
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from script_generator.object_detection.util import quantization
+from script_generator.object_detection.util.onnx_engine import OnnxYoloEngine
+from script_generator.object_detection.util.quantization import CalibrationReader
+
+
+def create_engine(batch_size):
+    # Skips the onnxruntime session, calibration only preprocesses the frames
+    engine = OnnxYoloEngine.__new__(OnnxYoloEngine)
+    engine.input_name = "images"
+    engine.batch_size = batch_size
+    engine.imgsz = 32
+    engine._frames = engine._input = None
+    return engine
+
+
+def frames(count):
+    # Every frame has its own gray level to tell them apart in the batches
+    return [np.full((32, 32, 3), i, dtype=np.uint8) for i in range(count)]
+
+
+def read_all(reader):
+    batches = []
+    while (batch := reader.get_next()) is not None:
+        batches.append(batch["images"])
+    return batches
+
+
+def test_fixed_batch_models_only_get_full_batches(monkeypatch):
+    monkeypatch.setattr(quantization, "OnnxYoloEngine", lambda model_path: create_engine(4))
+
+    batches = read_all(CalibrationReader("model.onnx", frames(10)))
+
+    assert [len(b) for b in batches] == [4, 4]
+    # Every frame is fed once, the 2 frames beyond the last full batch are dropped
+    levels = [round(float(frame[0, 0, 0]) * 255) for batch in batches for frame in batch]
+    assert levels == list(range(8))
+
+
+def test_dynamic_batch_models_get_every_frame(monkeypatch):
+    monkeypatch.setattr(quantization, "OnnxYoloEngine", lambda model_path: create_engine(None))
+
+    reader = CalibrationReader("model.onnx", frames(3))
+    assert [len(b) for b in read_all(reader)] == [1, 1, 1]
+
+    reader.rewind()
+    assert len(read_all(reader)) == 3
+
+
+def test_too_few_frames_for_a_batch(monkeypatch):
+    monkeypatch.setattr(quantization, "OnnxYoloEngine", lambda model_path: create_engine(4))
+
+    with pytest.raises(ValueError):
+        CalibrationReader("model.onnx", frames(3))
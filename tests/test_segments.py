@@ -0,0 +1,57 @@
+from collections import Counter
+
+from script_generator.object_detection.util.segments import split_frame_range, stitch_segment_records
+
+
+def record(frame_pos, track_id, x1=0, cls=0):
+    return [frame_pos, cls, 0.9, x1, 0, x1 + 50, 50, track_id]
+
+
+def test_split_frame_range_overlaps_the_later_segments():
+    assert split_frame_range(0, 100, 3, overlap=10) == [(0, 34), (24, 68), (58, 100)]
+
+
+def test_split_frame_range_drops_empty_segments():
+    assert split_frame_range(0, 2, 4, overlap=0) == [(0, 1), (1, 2)]
+
+
+def test_stitch_maps_track_ids_across_the_overlap():
+    # Segment 1 covers 0-10, segment 2 starts 4 frames early to warm up and calls the same object track 7
+    first = [record(f, 3, x1=f) for f in range(10)]
+    second = [record(f, 7, x1=f) for f in range(6, 20)]
+
+    merged = stitch_segment_records([first, second], [(0, 10), (6, 20)])
+
+    assert {r[7] for r in merged} == {1}
+
+
+def test_stitch_takes_the_overlapping_frames_from_the_earlier_segment_only():
+    first = [record(f, 3, x1=f) for f in range(10)]
+    second = [record(f, 7, x1=f + 1) for f in range(6, 20)]
+
+    merged = stitch_segment_records([first, second], [(0, 10), (6, 20)])
+
+    frames = Counter(r[0] for r in merged)
+    assert sorted(frames) == list(range(20))
+    assert set(frames.values()) == {1}
+    assert [r[3] for r in merged if 6 <= r[0] < 10] == [6, 7, 8, 9]
+
+
+def test_stitch_gives_unmatched_tracks_a_new_id():
+    first = [record(f, 1, x1=0) for f in range(10)]
+    # Track 1 of the second segment matches, track 2 is a new object far away
+    second = [record(f, 1, x1=0) for f in range(6, 20)] + [record(f, 2, x1=500) for f in range(10, 20)]
+
+    merged = stitch_segment_records([first, second], [(0, 10), (6, 20)])
+
+    assert {r[7] for r in merged if r[3] == 0} == {1}
+    assert {r[7] for r in merged if r[3] == 500} == {2}
+
+
+def test_stitch_keeps_untracked_records():
+    first = [record(0, 0)]
+    second = [record(12, 0)]
+
+    merged = stitch_segment_records([first, second], [(0, 10), (6, 20)])
+
+    assert [r[7] for r in merged] == [0, 0]
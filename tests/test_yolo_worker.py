@@ -0,0 +1,73 @@
+import queue
+from types import SimpleNamespace
+
+import numpy as np
+
+from script_generator.object_detection.data_classes.detections import Detections
+from script_generator.object_detection.workers import yolo_worker
+from script_generator.object_detection.workers.yolo_worker import YoloWorker
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+
+
+class FakeAnalyzeTask:
+    def __init__(self):
+        self.frame_pool = SimpleNamespace(size=16)
+        self.profiler = SimpleNamespace(set_info=lambda key, value: None)
+        self.released = []
+
+    def start(self, process_type):
+        pass
+
+    def end(self, process_type):
+        pass
+
+    def release_frame(self, task):
+        self.released.append(task.frame_pos)
+        task.buffer_index = None
+
+
+def create_task(frame_pos, has_frame=True):
+    task = AnalyzeFrameTask(frame_pos)
+    task.buffer_index = frame_pos
+    if has_frame:
+        task.rendered_frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    return task
+
+
+def test_a_task_without_frame_releases_its_buffer_and_is_passed_on_in_order(monkeypatch):
+    monkeypatch.setattr(yolo_worker, "detect", lambda model, frames: [Detections.empty() for _ in frames])
+    analyze_task = FakeAnalyzeTask()
+    state = SimpleNamespace(yolo_model=object(), yolo_model_path="model.pt", analyze_task=analyze_task)
+    input_queue, output_queue = queue.Queue(), queue.Queue()
+    for task in [create_task(0), create_task(1), create_task(2, has_frame=False), create_task(3)]:
+        input_queue.put(task)
+    input_queue.put(None)
+
+    worker = YoloWorker(state=state, input_queue=input_queue, output_queue=output_queue)
+    worker.start()
+    worker.join(timeout=10)
+    worker.check_exception()
+
+    results = [output_queue.get_nowait() for _ in range(output_queue.qsize())]
+    assert [task.frame_pos for task in results[:-1]] == [0, 1, 2, 3]
+    assert results[-1] is None
+    assert analyze_task.released == [2]
+    assert len(results[2].yolo_results) == 0
+
+
+def test_the_last_partial_batch_is_passed_on_before_the_end(monkeypatch):
+    monkeypatch.setattr(yolo_worker, "detect", lambda model, frames: [Detections.empty() for _ in frames])
+    # A fixed batch engine waits for a full batch, the last frames only go out when the end arrives
+    state = SimpleNamespace(yolo_model=object(), yolo_model_path="model.engine", analyze_task=FakeAnalyzeTask())
+    input_queue, output_queue = queue.Queue(), queue.Queue()
+    for frame_pos in range(3):
+        input_queue.put(create_task(frame_pos))
+    input_queue.put(None)
+
+    worker = YoloWorker(state=state, input_queue=input_queue, output_queue=output_queue)
+    worker.start()
+    worker.join(timeout=10)
+    worker.check_exception()
+
+    results = [output_queue.get_nowait() for _ in range(output_queue.qsize())]
+    assert [task.frame_pos if task else None for task in results] == [0, 1, 2, None]